@@ -0,0 +1,213 @@
+# compiled matcher for blacklisted_events.txt, used to drop calendar events
+# (open houses, drills, ...) that shouldn't be listed
+#
+# one rule per line, case-insensitive; blank lines and lines starting with # are ignored
+#   open house                 substring of the title (the original format)
+#   word:battle 101            whole words only
+#   re:^beg(inner)?\.? house   regular expression
+#   description:rep session    any of the above scoped to title:, description: or location:
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+FIELDS = {"title": "summary", "description": "description", "location": "location"}
+KINDS = ("word", "re")
+
+
+class BlacklistError(ValueError):
+    """Raised when a blacklist line can't be compiled; the message names the line."""
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One line of the blacklist file."""
+    field: str
+    kind: str
+    pattern: str
+    line: int
+
+    def __str__(self):
+        return f"line {self.line}: {self.field}:{self.kind}:{self.pattern}"
+
+
+def parse_rule(text: str, line: int = 0) -> Optional[Rule]:
+    """Parse a blacklist line into a Rule, or None for blank/comment lines."""
+    text = text.strip()
+    if not text or text.startswith("#"):
+        return None
+    field, kind = "title", "substring"
+    prefix, sep, rest = text.partition(":")
+    if sep and prefix.strip().lower() in FIELDS:
+        field, text = prefix.strip().lower(), rest.strip()
+        prefix, sep, rest = text.partition(":")
+    if sep and prefix.strip().lower() in KINDS:
+        kind, text = prefix.strip().lower(), rest.strip()
+    if not text:
+        return None
+    return Rule(field, kind, text if kind == "re" else text.lower(), line)
+
+
+class _Automaton:
+    """Aho-Corasick automaton over lowercase literals: one pass per text, however many rules."""
+
+    def __init__(self, rules: list[Rule]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[list[Rule]] = [[]]
+        for rule in rules:
+            state = 0
+            for char in rule.pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.out[state].append(rule)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def search(self, text: str) -> Optional[Rule]:
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for rule in self.out[state]:
+                if rule.kind == "substring" or _is_whole_word(text, end + 1 - len(rule.pattern), end + 1):
+                    return rule
+        return None
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    # only require a boundary where the pattern itself starts/ends with a word character
+    return (not _is_word_char(text[start]) or not _is_word_char(before)) and \
+        (not _is_word_char(text[end - 1]) or not _is_word_char(after))
+
+
+# constructs that change meaning inside the combined alternation: global inline
+# flags like (?i), numbered or named backreferences, and named groups
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?[aiLmsux]+\)")
+
+
+class _FieldMatcher:
+    def __init__(self, rules: list[Rule]):
+        literals = [rule for rule in rules if rule.kind != "re"]
+        regexes = [rule for rule in rules if rule.kind == "re"]
+        merged = [rule for rule in regexes if not _UNMERGEABLE.search(rule.pattern)]
+        self.automaton = _Automaton(literals) if literals else None
+        self.regex_rules = {f"r{index}": rule for index, rule in enumerate(merged)}
+        self.regex = re.compile(
+            "|".join(f"(?P<{name}>{rule.pattern})" for name, rule in self.regex_rules.items()),
+            re.IGNORECASE,
+        ) if merged else None
+        # the rest are compiled and searched one by one
+        self.separate = [
+            (re.compile(rule.pattern, re.IGNORECASE), rule) for rule in regexes if rule not in merged
+        ]
+
+    def search(self, text: str) -> Optional[Rule]:
+        if self.automaton is not None:
+            rule = self.automaton.search(text.lower())
+            if rule is not None:
+                return rule
+        if self.regex is not None:
+            match = self.regex.search(text)
+            if match is not None:
+                return self.regex_rules[match.lastgroup]
+        for regex, rule in self.separate:
+            if regex.search(text):
+                return rule
+        return None
+
+
+class Blacklist:
+    """
+    Blacklist compiled once into one matcher per field.
+
+    When built from a file the file's mtime is checked on every match() and the
+    rules are recompiled if it changed, so edits apply without a restart. A
+    missing file matches nothing. A bad rule raises BlacklistError on the first
+    load; on a reload it's printed and the previous rules stay in use.
+    """
+
+    def __init__(self, path=None, lines: Optional[list[str]] = None):
+        self.path = path
+        self._mtime = None
+        self.rules: list[Rule] = []
+        self._matchers: dict[str, _FieldMatcher] = {}
+        self._loaded = False
+        if lines is not None:
+            self._compile(lines)
+        else:
+            self.reload_if_changed()
+        self._loaded = True
+
+    def _compile(self, lines: list[str]):
+        rules = [rule for number, text in enumerate(lines, start=1) if (rule := parse_rule(text, number))]
+        for rule in rules:
+            if rule.kind == "re":
+                # fail on the bad line rather than in the combined pattern
+                try:
+                    re.compile(rule.pattern)
+                except re.error as exc:
+                    raise BlacklistError(f"line {rule.line}: invalid regex {rule.pattern!r} ({exc})") from exc
+        matchers = {
+            field: _FieldMatcher([rule for rule in rules if rule.field == field])
+            for field in FIELDS
+            if any(rule.field == field for rule in rules)
+        }
+        self.rules, self._matchers = rules, matchers
+
+    def reload_if_changed(self) -> bool:
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            # a missing file is an empty blacklist until it's created
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        lines = []
+        if mtime is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        # recorded first so a bad edit is reported once, not on every match()
+        self._mtime = mtime
+        try:
+            self._compile(lines)
+        except BlacklistError as exc:
+            if not self._loaded:
+                raise
+            print(f"Not reloading {self.path}, keeping the previous rules: {exc}")
+            return False
+        return True
+
+    def match(self, event: dict) -> Optional[Rule]:
+        """Return the first rule matching a calendar event, or None."""
+        self.reload_if_changed()
+        for field, matcher in self._matchers.items():
+            text = event.get(FIELDS[field]) or ""
+            if text:
+                rule = matcher.search(text)
+                if rule is not None:
+                    return rule
+        return None
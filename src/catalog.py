@@ -0,0 +1,439 @@
+# in-memory catalog of venues, hosts and events with hash indexes, so lookups
+# during an ingest don't have to scan the dataframes column by column
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Protocol
+import pandas as pd
+from fuzzy_match import FuzzyIndex
+from event_diff import canonical, content_hash
+from schema import SCHEMAS, apply_column, apply_schema, format_frame, read_table
+from utils import CsvJournal, recover
+
+TABLES = ("venues", "hosts", "events")
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "dance_dispatch" / "data" / "csv_files"
+
+
+def normalize_key(value) -> str:
+    """Lowercase and collapse whitespace so index lookups ignore formatting noise."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return " ".join(str(value).split()).lower()
+
+
+def normalize_keys(values: pd.Series) -> pd.Series:
+    """normalize_key over a whole column."""
+    return values.fillna("").astype(str).str.split().str.join(" ").str.lower()
+
+
+class CatalogBackend(Protocol):
+    """
+    What data_pipeline needs from a catalog. Catalog keeps the CSVs in dataframes
+    with dict indexes; sqlite_catalog.SqliteCatalog keeps them in a SQLite file.
+    Row values come in and go out the same way for both (lists, ints, dates).
+    """
+
+    venues: pd.DataFrame
+    hosts: pd.DataFrame
+    events: pd.DataFrame
+    fuzzy_venues: FuzzyIndex
+    fuzzy_hosts: FuzzyIndex
+
+    def find_venue(self, name, address): ...
+    def find_host(self, name): ...
+    def match_venues(self, names: pd.Series, addresses: pd.Series) -> pd.Series: ...
+    def match_hosts(self, names: pd.Series) -> pd.Series: ...
+    def has_event(self, event_id) -> bool: ...
+    def has_events(self, event_ids: pd.Series) -> pd.Series: ...
+    def event_count(self) -> int: ...
+    def max_start_date(self): ...
+    def get_row(self, table, row_id) -> dict | None: ...
+    def row_hash(self, table, row_id, columns) -> str | None: ...
+    def next_venue_id(self): ...
+    def next_host_id(self): ...
+    def add_venue(self, row: dict): ...
+    def add_host(self, row: dict): ...
+    def add_event(self, row: dict): ...
+    def add_events(self, rows: list[dict]): ...
+    def update_row(self, table, row_id, values: dict) -> bool: ...
+    def flush(self): ...
+    def write_session(self, flush_every: int | None = None): ...
+
+
+class Catalog:
+    """Venues, hosts and events loaded once, with dict indexes kept in sync on insert.
+
+    New rows and changed cells are buffered and, on flush, journaled under a
+    file lock (see utils.CsvJournal): new rows are appended to the CSV right
+    away, while changed rows wait in the journal for a periodic checkpoint that
+    rewrites the file once for all of them (or for close()). Outside of a
+    write_session() every write is flushed straight away.
+    """
+
+    def __init__(self, venues: pd.DataFrame, hosts: pd.DataFrame, events: pd.DataFrame, paths: dict | None = None):
+        self._frames = {"venues": venues, "hosts": hosts, "events": events}
+        self.paths = paths or {}
+        # rows not yet concatenated into the dataframes / not yet written to disk
+        self._unmerged = {table: [] for table in TABLES}
+        self._unwritten = {table: [] for table in TABLES}
+        # changed cells per row ID, not yet written to disk
+        self._updated = {table: {} for table in TABLES}
+        self._buffering = False
+        self._flush_every = None
+        # content hashes of stored rows, computed on first comparison
+        self._row_hashes: dict[tuple, str] = {}
+        self._build_indexes()
+
+    @classmethod
+    def from_csv(cls, venues_path, hosts_path, events_path) -> "Catalog":
+        """Load the CSVs with the column types from schema.py, printing any validation problems."""
+        paths = {"venues": venues_path, "hosts": hosts_path, "events": events_path}
+        frames = []
+        for table in TABLES:
+            recover(paths[table])
+            frame, report = read_table(paths[table], table)
+            if not report.ok:
+                print(report)
+            frames.append(frame)
+        return cls(*frames, paths=paths)
+
+    def _build_indexes(self):
+        self.venue_ids: set = set()
+        self.venue_by_name: dict[str, object] = {}
+        self.venue_by_address: dict[str, object] = {}
+        self.host_ids: set = set()
+        self.host_by_name: dict[str, object] = {}
+        self.event_ids: set = set()
+        # row position of each ID in its dataframe (first row wins), for get_row / update_row
+        self._positions: dict[str, dict] = {}
+        self._max_venue_id = None
+        self._max_host_id = None
+        self._fuzzy_venues: FuzzyIndex | None = None
+        self._fuzzy_hosts: FuzzyIndex | None = None
+
+        venues, hosts, events = self.venues, self.hosts, self.events
+        for vid, name, address in zip(venues["ID"], venues["Name"], venues["Address"]):
+            self._index_venue(vid, name, address)
+        for hid, name in zip(hosts["ID"], hosts["Name"]):
+            self._index_host(hid, name)
+        self.event_ids.update(events["ID"])
+        for table, frame in (("venues", venues), ("hosts", hosts), ("events", events)):
+            self._positions[table] = {}
+            self._index_positions(table, frame["ID"], 0)
+
+    def _index_positions(self, table, ids, start):
+        positions = self._positions[table]
+        for position, row_id in enumerate(ids, start):
+            if not pd.isna(row_id):
+                positions.setdefault(row_id, position)
+
+    def _index_venue(self, vid, name, address):
+        self.venue_ids.add(vid)
+        # first row wins, matching the old "first match of the boolean mask" behaviour
+        name_key, address_key = normalize_key(name), normalize_key(address)
+        if name_key:
+            self.venue_by_name.setdefault(name_key, vid)
+        if address_key:
+            self.venue_by_address.setdefault(address_key, vid)
+        if self._max_venue_id is None or vid > self._max_venue_id:
+            self._max_venue_id = vid
+        if self._fuzzy_venues is not None:
+            self._fuzzy_venues.add(vid, name)
+            self._fuzzy_venues.add(vid, address)
+
+    def _index_host(self, hid, name):
+        self.host_ids.add(hid)
+        name_key = normalize_key(name)
+        if name_key:
+            self.host_by_name.setdefault(name_key, hid)
+        if self._max_host_id is None or hid > self._max_host_id:
+            self._max_host_id = hid
+        if self._fuzzy_hosts is not None:
+            self._fuzzy_hosts.add(hid, name)
+
+    # dataframes, with any buffered rows concatenated in one go on access
+
+    def _frame(self, table) -> pd.DataFrame:
+        if self._unmerged[table]:
+            new_rows = apply_schema(pd.DataFrame(self._unmerged[table]), table)
+            merged = pd.concat([self._frames[table], new_rows], ignore_index=True)
+            # categories from both sides, rather than concat falling back to object
+            for column, kind in SCHEMAS[table].items():
+                if kind == "category" and column in merged.columns:
+                    merged[column] = merged[column].astype("category")
+            self._frames[table] = merged
+            self._unmerged[table] = []
+        return self._frames[table]
+
+    @property
+    def venues(self) -> pd.DataFrame:
+        return self._frame("venues")
+
+    @property
+    def hosts(self) -> pd.DataFrame:
+        return self._frame("hosts")
+
+    @property
+    def events(self) -> pd.DataFrame:
+        return self._frame("events")
+
+    def _row_count(self, table) -> int:
+        return len(self._frames[table]) + len(self._unmerged[table])
+
+    def event_count(self) -> int:
+        return self._row_count("events")
+
+    # lookups
+
+    def find_venue(self, name, address):
+        """Return the ID of a venue matching name or address, or None."""
+        vid = self.venue_by_name.get(normalize_key(name))
+        if vid is None:
+            vid = self.venue_by_address.get(normalize_key(address))
+        return vid
+
+    def find_host(self, name):
+        return self.host_by_name.get(normalize_key(name))
+
+    def match_venues(self, names: pd.Series, addresses: pd.Series) -> pd.Series:
+        """Venue IDs for whole columns of names and addresses (a name match first), NA if neither is known."""
+        ids = normalize_keys(names).map(self.venue_by_name).astype("Int64")
+        return ids.fillna(normalize_keys(addresses).map(self.venue_by_address).astype("Int64"))
+
+    def match_hosts(self, names: pd.Series) -> pd.Series:
+        return normalize_keys(names).map(self.host_by_name).astype("Int64")
+
+    @property
+    def fuzzy_venues(self) -> FuzzyIndex:
+        """Trigram index over venue names and addresses, built on first use."""
+        if self._fuzzy_venues is None:
+            venues = self.venues
+            self._fuzzy_venues = FuzzyIndex(
+                [*zip(venues["ID"], venues["Name"]), *zip(venues["ID"], venues["Address"])]
+            )
+        return self._fuzzy_venues
+
+    @property
+    def fuzzy_hosts(self) -> FuzzyIndex:
+        if self._fuzzy_hosts is None:
+            hosts = self.hosts
+            self._fuzzy_hosts = FuzzyIndex(zip(hosts["ID"], hosts["Name"]))
+        return self._fuzzy_hosts
+
+    def has_event(self, event_id) -> bool:
+        return event_id in self.event_ids
+
+    def has_events(self, event_ids: pd.Series) -> pd.Series:
+        return event_ids.isin(self.event_ids)
+
+    def max_start_date(self):
+        """The latest StartDate, or None if there are no dated events."""
+        latest = self.events["StartDate"].max() if "StartDate" in self.events.columns else None
+        return None if latest is None or pd.isna(latest) else pd.Timestamp(latest)
+
+    def get_row(self, table, row_id) -> dict | None:
+        position = self._positions[table].get(row_id)
+        return self._frame(table).iloc[position].to_dict() if position is not None else None
+
+    def row_hash(self, table, row_id, columns) -> str | None:
+        """Content hash of a stored row over `columns`, cached until the row is updated."""
+        key = (table, row_id, tuple(columns))
+        if key not in self._row_hashes:
+            row = self.get_row(table, row_id)
+            if row is None:
+                return None
+            self._row_hashes[key] = content_hash(row, columns)
+        return self._row_hashes[key]
+
+    def next_venue_id(self):
+        return self._max_venue_id + 1 if self._max_venue_id is not None else 0
+
+    def next_host_id(self):
+        return self._max_host_id + 1 if self._max_host_id is not None else 0
+
+    # inserts and updates
+
+    def _insert(self, table, row: dict):
+        self._insert_many(table, [row])
+
+    def _insert_many(self, table, rows: list[dict]):
+        rows = [{column: _plain_list(value) if isinstance(value, (list, tuple)) else value
+                 for column, value in row.items()} for row in rows]
+        self._index_positions(table, (row.get("ID") for row in rows), self._row_count(table))
+        self._unmerged[table].extend(rows)
+        self._unwritten[table].extend(rows)
+        self._after_write()
+
+    def add_venue(self, row: dict):
+        self._insert("venues", row)
+        self._index_venue(row["ID"], row.get("Name"), row.get("Address"))
+
+    def add_host(self, row: dict):
+        self._insert("hosts", row)
+        self._index_host(row["ID"], row.get("Name"))
+
+    def add_event(self, row: dict):
+        self._insert("events", row)
+        self.event_ids.add(row["ID"])
+
+    def add_events(self, rows: list[dict]):
+        """Insert many events at once; outside a write_session they're appended in one write."""
+        self._insert_many("events", rows)
+        self.event_ids.update(row["ID"] for row in rows)
+
+    def update_row(self, table, row_id, values: dict) -> bool:
+        """Update columns of an existing row; returns False if nothing actually changed."""
+        position = self._positions[table].get(row_id)
+        if position is None:
+            raise KeyError(f"No row with ID {row_id} in {table}")
+        frame = self._frame(table)
+        current = frame.iloc[position]
+        changed = {
+            column: value for column, value in values.items()
+            if column not in frame.columns or not _same_value(current[column], value)
+        }
+        if not changed:
+            return False
+        self._row_hashes = {key: value for key, value in self._row_hashes.items() if key[:2] != (table, row_id)}
+        index = frame.index[position]
+        for column, value in changed.items():
+            kind = SCHEMAS[table].get(column)
+            if kind is not None:
+                value = apply_column(pd.Series([value], dtype=object), kind).iloc[0]
+            elif isinstance(value, (list, tuple)):
+                value = _plain_list(value)
+            if column not in frame.columns or (kind is None and frame[column].dtype != object):
+                frame[column] = frame[column].astype(object) if column in frame.columns else None
+            elif isinstance(frame[column].dtype, pd.CategoricalDtype) and not pd.isna(value) \
+                    and value not in frame[column].cat.categories:
+                frame[column] = frame[column].cat.add_categories([value])
+            frame.at[index, column] = value
+            self._updated[table].setdefault(row_id, {})[column] = value
+        self._after_write()
+        return True
+
+    # persistence
+
+    def _after_write(self):
+        if not self._buffering:
+            self.flush()
+        elif self._flush_every and sum(len(rows) for rows in self._unwritten.values()) >= self._flush_every:
+            self.flush()
+
+    def _journal_entries(self, table) -> list[dict]:
+        entries = [{"op": "insert", "row": row} for row in _csv_cells(self._unwritten[table], table)]
+        for row_id, values in self._updated[table].items():
+            entries.append({"op": "update", "key": _cell(row_id), "values": _csv_cells([values], table)[0]})
+        return entries
+
+    def flush(self):
+        """Journal buffered inserts and updates, checkpointing them into the CSVs when due."""
+        for table in TABLES:
+            path = self.paths.get(table)
+            if path is not None and (self._unwritten[table] or self._updated[table]):
+                journal = CsvJournal(path)
+                journal.record(self._journal_entries(table))
+                journal.checkpoint_if_due()
+            self._unwritten[table] = []
+            self._updated[table] = {}
+
+    def checkpoint(self):
+        """Apply everything journaled so far to the CSVs."""
+        self.flush()
+        for path in self.paths.values():
+            CsvJournal(path).checkpoint()
+
+    def close(self):
+        self.checkpoint()
+
+    @contextmanager
+    def write_session(self, flush_every: int | None = None):
+        """Buffer writes and flush them on exit, or every `flush_every` new rows."""
+        previous = (self._buffering, self._flush_every)
+        self._buffering, self._flush_every = True, flush_every
+        try:
+            yield self
+        finally:
+            self._buffering, self._flush_every = previous
+            if not self._buffering:
+                self.flush()
+
+
+class CatalogStore:
+    """Loads the Catalog from a data directory on first access rather than at import.
+
+    The directory defaults to the repo's csv_files folder regardless of the working
+    directory; tests and tools can point a store at their own copy of the CSVs, or
+    at a SQLite catalog with use_database().
+    """
+
+    def __init__(self, data_dir=None, db_path=None):
+        self.data_dir = Path(data_dir) if data_dir is not None else DEFAULT_DATA_DIR
+        self.db_path = Path(db_path) if db_path is not None else None
+        self._catalog: CatalogBackend | None = None
+
+    @property
+    def paths(self) -> dict:
+        return {table: self.data_dir / f"{table}.csv" for table in TABLES}
+
+    @property
+    def loaded(self) -> bool:
+        return self._catalog is not None
+
+    @property
+    def catalog(self) -> CatalogBackend:
+        if self._catalog is None:
+            if self.db_path is not None:
+                # imported here because sqlite_catalog builds on this module
+                from sqlite_catalog import SqliteCatalog
+                self._catalog = SqliteCatalog(self.db_path)
+            else:
+                paths = self.paths
+                self._catalog = Catalog.from_csv(paths["venues"], paths["hosts"], paths["events"])
+        return self._catalog
+
+    def invalidate(self):
+        """Drop the loaded catalog (writing out anything still buffered) so the next access reloads."""
+        if self._catalog is not None:
+            self._catalog.flush()
+            if hasattr(self._catalog, "close"):
+                self._catalog.close()
+            self._catalog = None
+
+    def reload(self) -> CatalogBackend:
+        self.invalidate()
+        return self.catalog
+
+    def set_data_dir(self, data_dir):
+        """Use the CSVs in `data_dir`, or the default csv_files (and stop using a database)."""
+        self.invalidate()
+        self.data_dir = Path(data_dir) if data_dir is not None else DEFAULT_DATA_DIR
+        self.db_path = None
+
+    def use_database(self, db_path):
+        """Use the SQLite catalog at `db_path` instead of the CSVs."""
+        self.invalidate()
+        self.db_path = Path(db_path)
+
+
+def _plain_list(values) -> list:
+    """Unwrap numpy scalars so a list cell is written as "[3]" rather than "[np.int64(3)]"."""
+    return [value.item() if hasattr(value, "item") else value for value in values]
+
+
+def _same_value(old, new) -> bool:
+    """Compare a stored cell with an incoming value the way they'd round-trip through CSV."""
+    return canonical(old) == canonical(new)
+
+
+def _cell(value) -> str:
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return ""
+    return str(value)
+
+
+def _csv_cells(rows: list[dict], table) -> list[dict]:
+    """Rows as the text their cells are written to the CSV with."""
+    if not rows:
+        return []
+    frame = format_frame(pd.DataFrame(rows), table)
+    return [{column: _cell(value) for column, value in row.items()} for row in frame.to_dict("records")]
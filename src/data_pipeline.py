@@ -1,37 +1,54 @@
 # a bunhc of functions that take in data regardless of format, and pipeliens it into csvs
 import datetime
 from zoneinfo import ZoneInfo
-from dateutil import parser
 import pandas as pd
 from data_objects import Event, Venue, Host
+from catalog import CatalogStore
+from resolution_rules import ResolutionRules, UnresolvedEntity
+from fuzzy_match import choose, describe
+from event_diff import canonical, changed_columns, content_hash
 
-PREFIX = "./dance_dispatch/data/csv_files/"
-vfilepath = PREFIX + "venues.csv"
-hfilepath = PREFIX + "hosts.csv"   
-efilepath = PREFIX + "events.csv"
-VENUES = pd.read_csv(vfilepath)
-HOSTS = pd.read_csv(hfilepath)
-EVENTS = pd.read_csv(efilepath)
+# the CSVs are only read the first time a function below needs them
+STORE = CatalogStore()
+
+
+def configure(data_dir=None, db_path=None):
+    """Point the pipeline at a different csv_files directory (e.g. a test dataset),
+    or with `db_path` at a SQLite catalog (see sqlite_catalog.py)."""
+    if db_path is not None:
+        STORE.use_database(db_path)
+    else:
+        STORE.set_data_dir(data_dir)
+
+
+def __getattr__(name):
+    # VENUES / HOSTS / EVENTS used to be module globals loaded at import time
+    frames = {"VENUES": "venues", "HOSTS": "hosts", "EVENTS": "events"}
+    if name in frames:
+        return getattr(STORE.catalog, frames[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def write_session(flush_every=None):
+    """Buffer new venues/hosts/events and append them to the CSVs when the block exits
+    (or every `flush_every` rows), instead of writing the files once per entity."""
+    return STORE.catalog.write_session(flush_every)
+
+
+# columns refreshed when an event that's already in the catalog comes in again
+UPDATE_COLUMNS = ('Title', 'StartDate', 'StartTime', 'EndDate', 'EndTime', 'Location',
+                  'Description', 'Hosts', 'PhotoURL', 'Price', 'ExternalURLs')
 
 
 def check_if_event_exists(event: Event):
-    global EVENTS
     if (event.id != None):
-        if (event.id in EVENTS['ID'].values):
-                print("FOUND + UPDATE ")
-                print( event)
-                # EVENTS.loc[EVENTS['ID'] == event.id, ['Title', 'StartTime', 'EndTime']] = event.title, event.start_time, event.end_time
-                print(f"Event with ID {event.id} already exists. Skipping.")
+        if STORE.catalog.has_event(event.id):
+                print(f"Event with ID {event.id} already exists.")
                 return True
     return False
 
-def handle_event_entry(event: Event):
-    global EVENTS, VENUES, HOSTS
-    if check_if_event_exists(event):
-        return event.id
-    venue_id = get_venue_id(event.location, event.address)
-    host_ids = get_host_id(event.hosts)
-    new_event = {
+def _event_row(event: Event, venue_id, host_ids):
+    return {
         'ID': event.id,
         'Title': event.title,
         'StartDate': event.start_date,
@@ -46,54 +63,290 @@ def handle_event_entry(event: Event):
         'Price': event.price,
         'ExternalURLs': event.external_links.split(",") if event.external_links else []   
     }
-    print(EVENTS)
-    new_event_df = pd.DataFrame([new_event])
-    EVENTS = pd.concat([EVENTS, new_event_df], ignore_index=True)
-    EVENTS.to_csv(efilepath, index=False)
-    event.id = len(EVENTS)
+
+def handle_event_entry(event: Event, rules: ResolutionRules | None = None):
+    """Add an event, resolving its venue and hosts; pass `rules` to never prompt.
+
+    An event that's already in the catalog is refreshed instead (see update_event).
+    """
+    if check_if_event_exists(event):
+        update_event(event, rules)
+        return event.id
+    venue_id = get_venue_id(event.location, event.address, rules)
+    host_ids = get_host_id(event.hosts, rules)
+    STORE.catalog.add_event(_event_row(event, venue_id, host_ids))
+    event.id = STORE.catalog.event_count()
     print(f"Added new event: {event.title} with ID {event.id}")
     return event.id
 
+def update_event(event: Event, rules: ResolutionRules | None = None) -> dict:
+    """
+    Write the columns of a stored event that differ from an incoming copy.
+
+    The venue and hosts are matched without prompting or adding anything; one
+    that can't be matched keeps the stored Location or Hosts. Rows whose content
+    hash is unchanged are skipped without comparing fields. Inside
+    write_session() the changes are written out with the other buffered rows
+    when the session ends. Returns the changed columns.
+    """
+    stored = STORE.catalog.get_row('events', event.id) or {}
+    venue_id = _match_venue(event.location, event.address, rules)
+    if venue_id is None and (event.location or event.address):
+        venue_id = stored.get('Location')
+    host_ids = _match_hosts(event.hosts, rules)
+    if host_ids is None:
+        host_ids = stored.get('Hosts', [])
+    return _update_stored_event(event.id, _event_row(event, venue_id, host_ids))
+
+def _update_stored_event(event_id, row: dict) -> dict:
+    if content_hash(row, UPDATE_COLUMNS) == STORE.catalog.row_hash('events', event_id, UPDATE_COLUMNS):
+        return {}
+    changes = changed_columns(STORE.catalog.get_row('events', event_id), row, UPDATE_COLUMNS)
+    if changes:
+        STORE.catalog.update_row('events', event_id, changes)
+        print(f"Updated event {event_id}: {', '.join(changes)}")
+    return changes
+
+
+def _update_stored_events(rows: pd.DataFrame) -> int:
+    """
+    Bulk version of _update_stored_event for rows whose IDs are all stored.
+
+    The rows are merged with the events frame on ID and compared a column at a
+    time as canonical text; only rows with a differing cell are written, all in
+    the caller's write_session. Returns the number of rows updated.
+    """
+    if rows.empty:
+        return 0
+    stored = STORE.catalog.events.drop_duplicates('ID')
+    columns = [column for column in UPDATE_COLUMNS if column in rows.columns]
+    merged = rows[['ID', *columns]].merge(
+        stored[['ID', *(column for column in columns if column in stored.columns)]],
+        on='ID', how='left', suffixes=('', '_stored'),
+    )
+    differs = pd.DataFrame({
+        column: merged[column].map(canonical) != (
+            merged[column + '_stored'].map(canonical) if column + '_stored' in merged.columns else ""
+        )
+        for column in columns
+    })
+    changed = differs.any(axis=1)
+    for record, mask in zip(merged[changed].to_dict('records'), differs[changed].to_dict('records')):
+        changes = {column: record[column] for column in columns if mask[column]}
+        STORE.catalog.update_row('events', record['ID'], changes)
+        print(f"Updated event {record['ID']}: {', '.join(changes)}")
+    return int(changed.sum())
+
+
+# input columns for import_events, named like the Event fields
+IMPORT_COLUMNS = ('id', 'title', 'description', 'start_date', 'end_date', 'start_time', 'end_time',
+                  'location', 'address', 'hosts', 'photo_url', 'price', 'external_links', 'tags')
+
+
+def _text(values: pd.Series) -> pd.Series:
+    return values.fillna("").astype(str).str.strip()
+
+def _resolve_venues(frame: pd.DataFrame, rules: ResolutionRules | None) -> tuple[pd.Series, pd.Series]:
+    """Venue IDs for every row, and a mask of rows whose venue has to go to review.
+
+    Names and addresses are looked up in the catalog a column at a time;
+    only the distinct pairs that miss go through get_venue_id (fuzzy match, prompt
+    or create), once each rather than once per row.
+    """
+    names, addresses = _text(frame['location']), _text(frame['address'])
+    aliased = names.map({name: rules.venue_name(name) for name in names.unique()}) if rules is not None else names
+    ids = STORE.catalog.match_venues(aliased, addresses)
+    review = pd.Series(False, index=frame.index)
+    unknown = ids.isna() & ((names != "") | (addresses != ""))
+    for (name, address), rows in frame[unknown].groupby([names[unknown], addresses[unknown]]).groups.items():
+        try:
+            ids[rows] = get_venue_id(name, address, rules)
+        except UnresolvedEntity as exc:
+            print(f"{exc}; {len(rows)} row(s) need review")
+            review[rows] = True
+    return ids, review
+
+def _resolve_hosts(frame: pd.DataFrame, rules: ResolutionRules | None) -> tuple[pd.Series, pd.Series]:
+    """Lists of host IDs for every row, and a mask of rows with a host that has to go to review."""
+    names = _text(frame['hosts']).str.split(",").explode().str.strip()
+    names = names[names != ""]
+    pairs = pd.DataFrame({'row': names.index, 'name': names.to_numpy()})
+    if rules is not None:
+        pairs['name'] = pairs['name'].map({name: rules.host_name(name) for name in pairs['name'].unique()})
+    pairs['id'] = STORE.catalog.match_hosts(pairs['name'])
+    resolved, unresolved = {}, set()
+    for name in pairs.loc[pairs['id'].isna(), 'name'].unique():
+        try:
+            matched = get_host_id(name, rules)
+        except UnresolvedEntity as exc:
+            print(exc)
+            unresolved.add(name)
+            continue
+        resolved[name] = matched[0] if matched else None
+    pairs['id'] = pairs['id'].fillna(pairs['name'].map(resolved).astype("Int64"))
+    review = frame.index.isin(pairs.loc[pairs['name'].isin(unresolved), 'row'])
+    host_lists = pairs.dropna(subset=['id']).groupby('row')['id'].agg(lambda ids: [int(hid) for hid in ids])
+    host_lists = host_lists.reindex(frame.index)
+    return host_lists.map(lambda ids: ids if isinstance(ids, list) else []), pd.Series(review, index=frame.index)
+
+def _match_stored_events(frame: pd.DataFrame, rules: ResolutionRules | None) -> tuple[pd.Series, pd.Series]:
+    """Venue IDs and host ID lists for rows whose event is already stored, matched like update_event.
+
+    Distinct venues and host lists are matched once each without prompting or
+    adding anything; a row whose venue or hosts don't match keeps the stored
+    Location or Hosts.
+    """
+    stored = STORE.catalog.events.drop_duplicates('ID').set_index('ID')
+    names, addresses = _text(frame['location']), _text(frame['address'])
+    venues = {pair: _match_venue(*pair, rules) for pair in set(zip(names, addresses))}
+    venue_ids = pd.Series([venues[pair] for pair in zip(names, addresses)], index=frame.index, dtype=object)
+    unmatched = venue_ids.isna() & ((names != "") | (addresses != ""))
+    venue_ids = venue_ids.where(~unmatched, frame['id'].map(stored['Location']).astype(object))
+    hosts = _text(frame['hosts'])
+    matched = {text: _match_hosts(text, rules) for text in hosts.unique()}
+    host_ids = pd.Series([matched[text] for text in hosts], index=frame.index, dtype=object)
+    host_ids = host_ids.where(host_ids.notna(), frame['id'].map(stored['Hosts']))
+    return venue_ids, host_ids
+
+def import_events(frame: pd.DataFrame, rules: ResolutionRules | None = None) -> dict:
+    """
+    Bulk version of handle_event_entry for a whole DataFrame (columns as in IMPORT_COLUMNS).
+
+    Rows repeating an ID keep the last copy. IDs already in the catalog are
+    refreshed like update_event, compared against the stored events in one
+    merge; their venues and hosts are only matched, never prompted for or
+    added, and keep the stored values when they don't match. The rest are
+    appended to events.csv in one write. Venues and hosts are resolved per
+    distinct value, not per row. With `rules`, new rows whose venue or host
+    goes to review are left out. Returns counts of added, updated, duplicate
+    and review rows.
+    """
+    frame = frame.reindex(columns=[*frame.columns, *(c for c in IMPORT_COLUMNS if c not in frame.columns)])
+    duplicate = frame['id'].notna() & frame['id'].duplicated(keep='last')
+    frame = frame[~duplicate]
+    # new venues/hosts are written along with the events when the session ends
+    with write_session():
+        existing = STORE.catalog.has_events(frame['id'])
+        venue_ids, venue_review = _resolve_venues(frame[~existing], rules)
+        host_ids, host_review = _resolve_hosts(frame[~existing], rules)
+        stored_venue_ids, stored_host_ids = _match_stored_events(frame[existing], rules)
+        venue_ids = pd.concat([venue_ids.astype(object), stored_venue_ids]).reindex(frame.index)
+        host_ids = pd.concat([host_ids, stored_host_ids]).reindex(frame.index)
+        review = (venue_review | host_review).reindex(frame.index, fill_value=False)
+        links = _text(frame['external_links'])
+        rows = pd.DataFrame({
+            'ID': frame['id'],
+            'Title': frame['title'],
+            'StartDate': frame['start_date'],
+            'StartTime': frame['start_time'],
+            'EndDate': frame['end_date'],
+            'EndTime': frame['end_time'],
+            'Location': venue_ids,
+            'Description': frame['description'],
+            'Hosts': host_ids,
+            'PhotoURL': frame['photo_url'],
+            'Tags': frame['tags'],
+            'Price': frame['price'],
+            'ExternalURLs': links.map(lambda text: text.split(",") if text else []),
+        })[~review]
+        existing = existing[~review]
+        records = rows[~existing].astype(object).where(rows[~existing].notna(), None).to_dict('records')
+        updated = _update_stored_events(rows[existing])
+        STORE.catalog.add_events(records)
+    counts = {'added': len(records), 'updated': updated, 'duplicates': int(duplicate.sum()), 'review': int(review.sum())}
+    print(f"Imported {counts['added']} new events, updated {counts['updated']}, "
+          f"skipped {counts['duplicates']} duplicate rows, {counts['review']} rows need review")
+    return counts
+
      
         
 
-def get_venue_id(venue_name, venue_address):
-    global VENUES
+def _accepted_match(index, rules: ResolutionRules | None, *texts):
+    """The close match to use without asking; only when the rules set fuzzy_accept.
+
+    Interactive runs list near misses at the prompt instead, to be picked by number.
+    """
+    if rules is None or rules.fuzzy_accept is None:
+        return None
+    return index.best(*texts, accept=rules.fuzzy_accept)
+
+
+def _match_venue(venue_name, venue_address, rules: ResolutionRules | None = None):
+    """Exact or close match for a venue, or None; never prompts or adds one."""
+    if not venue_name and not venue_address:
+        return None
+    if rules is not None:
+        venue_name = rules.venue_name(venue_name)
+    matched_venue = STORE.catalog.find_venue(venue_name, venue_address)
+    if matched_venue is not None:
+        return matched_venue
+    close = _accepted_match(STORE.catalog.fuzzy_venues, rules, venue_name, venue_address)
+    return close.id if close is not None else None
+
+
+def _match_hosts(listofhostnames, rules: ResolutionRules | None = None):
+    """IDs of the listed hosts, or None if any of them has no exact or close match."""
+    host_ids = []
+    for host in (listofhostnames or "").split(","):
+        host = host.strip()
+        if host == "":
+            continue
+        if rules is not None:
+            host = rules.host_name(host).strip()
+        matched_host = STORE.catalog.find_host(host)
+        if matched_host is None:
+            close = _accepted_match(STORE.catalog.fuzzy_hosts, rules, host)
+            if close is None:
+                return None
+            matched_host = close.id
+        host_ids.append(matched_host)
+    return host_ids
+
+
+def get_venue_id(venue_name, venue_address, rules: ResolutionRules | None = None):
     if venue_name == "" and venue_address == "":
         print("No venue name or address provided; skipping venue addition.")
         return
-    matched_venues = VENUES[(VENUES['Name'] == venue_name) | (VENUES['Address'] == venue_address)]
-    if not matched_venues.empty:
-        return matched_venues['ID'].values[0] 
+    if rules is not None:
+        venue_name = rules.venue_name(venue_name)
+    matched_venue = STORE.catalog.find_venue(venue_name, venue_address)
+    if matched_venue is not None:
+        return matched_venue
+    close = _accepted_match(STORE.catalog.fuzzy_venues, rules, venue_name, venue_address)
+    if close is not None:
+        print(f"Matched venue '{venue_name}' to '{close.text}' (score {close.score:.2f})")
+        return close.id
+    if rules is not None:
+        if not rules.unresolved("venue", venue_name, venue_address):
+            print(f"Skipping adding venue for event at '{venue_name}'")
+            return
+        vname_inp, vaddress_inp = venue_name, ""
     else:
-        vname_inp = input(f"Venue '{venue_name}' not found. Enter venue name to add or leave blank to skip adding venue: ").strip()
+        candidates = STORE.catalog.fuzzy_venues.suggest(venue_name, venue_address)
+        if candidates:
+            print(f"Similar venues:\n{describe(candidates)}")
+        vname_inp = input(f"Venue '{venue_name}' not found. Enter venue name to add, the number of a similar venue, or leave blank to skip adding venue: ").strip()
+        picked = choose(vname_inp, candidates)
+        if picked is not None:
+            return picked
         if vname_inp == "":
                 print(f"Skipping adding venue for event at '{venue_name}'")
                 return
         else:
                 vaddress_inp = input(f"Enter address for venue '{vname_inp}' or leave blank to use '{venue_address}': ").strip()
-        vid = max(VENUES['ID'].values) + 1 if not VENUES.empty else 0
-        new_venue = {
-            'ID': vid,
-            'Name': vname_inp,
-            'Address': vaddress_inp if vaddress_inp else venue_address,
-            'Bio': '',
-            'Tags': '',
-            'Residents': '',
-            'NearestStation': '',
-            'DistanceFromStation': '',
-            'NumberOfZones': '',
-            'TotalArea': '',
-            'ExternalLinks': '',
-            'PhotoURLs': ''
-        }
-        VENUES = pd.concat([VENUES, pd.DataFrame([new_venue])], ignore_index=True)
-        VENUES.to_csv(vfilepath, index=False)
-        print(f"Added new venue: {venue_name} with ID {vid}")
-        return vid
-
-def get_host_id(listofhostnames):
-    global HOSTS
+    vid = STORE.catalog.next_venue_id()
+    new_venue = {
+        'ID': vid,
+        'Name': vname_inp,
+        'Address': vaddress_inp if vaddress_inp else venue_address,
+        'Bio': '',
+        'Type': ''
+    }
+    STORE.catalog.add_venue(new_venue)
+    print(f"Added new venue: {venue_name} with ID {vid}")
+    return vid
+
+def get_host_id(listofhostnames, rules: ResolutionRules | None = None):
     if not listofhostnames:
         return []
     hosts = listofhostnames.split(",")
@@ -101,13 +354,34 @@ def get_host_id(listofhostnames):
     for host in hosts:
         if host.strip() == "":
             continue
-        matched_hosts = HOSTS[HOSTS['Name'] == host.strip()]
-        if not matched_hosts.empty:
-            host_ids.append(matched_hosts['ID'].values[0])
+        if rules is not None:
+            host = rules.host_name(host.strip())
+        matched_host = STORE.catalog.find_host(host.strip())
+        if matched_host is None:
+            close = _accepted_match(STORE.catalog.fuzzy_hosts, rules, host.strip())
+            if close is not None:
+                print(f"Matched host '{host.strip()}' to '{close.text}' (score {close.score:.2f})")
+                matched_host = close.id
+        if matched_host is not None:
+            host_ids.append(matched_host)
         else:
-            print(f"Adding Host '{host.strip()}'.")
-            htags_inp = [x.strip() for x in input(f"List of tags (optional, comma-separated): ").split(",")]
-            hid = max(HOSTS['ID'].values) + 1 if not HOSTS.empty else 0
+            if rules is not None:
+                if not rules.unresolved("host", host.strip()):
+                    print(f"Skipping adding host with name '{host.strip()}'")
+                    continue
+                htags_inp = []
+            else:
+                candidates = STORE.catalog.fuzzy_hosts.suggest(host.strip())
+                print(f"Adding Host '{host.strip()}'.")
+                if candidates:
+                    print(f"Similar hosts:\n{describe(candidates)}")
+                tags_inp = input(f"List of tags (optional, comma-separated){', or the number of a similar host to use it instead' if candidates else ''}: ").strip()
+                picked = choose(tags_inp, candidates)
+                if picked is not None:
+                    host_ids.append(picked)
+                    continue
+                htags_inp = [x.strip() for x in tags_inp.split(",")]
+            hid = STORE.catalog.next_host_id()
             new_host = {
                 'ID': hid,
                 'Name': host.strip(),
@@ -116,18 +390,16 @@ def get_host_id(listofhostnames):
                 'ExternalLinks': '',
                 'PhotoURLs': ''
             }
-            HOSTS = pd.concat([HOSTS, pd.DataFrame([new_host])], ignore_index=True)
-            HOSTS.to_csv(hfilepath, index=False)
+            STORE.catalog.add_host(new_host)
             print(f"Added new host: {host.strip()} with ID {hid}")
             host_ids.append(hid)
     return host_ids
 
 def get_max_date_for_events():
-    global EVENTS
-    if EVENTS.empty:
+    max_date = STORE.catalog.max_start_date()
+    if max_date is None:
         return None
-    max_date = EVENTS['StartDate'].max()
-    dt = parser.parse(max_date)
+    dt = max_date.to_pydatetime()
     dt = dt.replace(tzinfo=ZoneInfo("America/New_York"))
     return dt.isoformat()
     # return datetime.datetime.strptime(max_date, "%Y-%m-%d").isoformat() + "T00:00:00Z"
\ No newline at end of file
@@ -0,0 +1,63 @@
+# compare an incoming copy of an event with the stored row, so rescheduled or
+# edited events are refreshed column by column instead of skipped
+import ast
+import datetime
+import hashlib
+import json
+import re
+import pandas as pd
+from schema import NUMPY_SCALAR
+
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+
+def canonical(value) -> str:
+    """
+    A value as text, the same whether it came from a CSV, Supabase or an Event.
+
+    Blanks/NaN/NA are "", whole floats drop their ".0" (pandas reads an int
+    column with gaps as float), lists written out as "[1, 2]" compare equal to
+    the list itself, a midnight timestamp is just its date, and timestamps with
+    an offset are shifted to UTC and made naive, the way Postgres stores the
+    naive ones we send it.
+    """
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(canonical(item) for item in value) + "]"
+    if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
+        try:
+            parsed = ast.literal_eval(NUMPY_SCALAR.sub(r"\1", value))
+        except (ValueError, SyntaxError):
+            return value
+        return canonical(parsed) if isinstance(parsed, (list, tuple)) else value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if value.time() == datetime.time():
+            # a date column loaded as datetime64 compares equal to the date itself
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, str) and _TIMESTAMP.match(value):
+        try:
+            return canonical(datetime.datetime.fromisoformat(value))
+        except ValueError:
+            return value
+    return str(value)
+
+
+def content_hash(row: dict, columns) -> str:
+    """Hash of a row's canonical values over `columns`; equal hashes mean nothing to update."""
+    text = json.dumps([canonical(row.get(column)) for column in columns])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def changed_columns(stored: dict, incoming: dict, columns=None) -> dict:
+    """The columns of `incoming` (or just `columns`) whose value differs from `stored`."""
+    columns = incoming.keys() if columns is None else columns
+    return {
+        column: incoming[column] for column in columns
+        if canonical(stored.get(column)) != canonical(incoming.get(column))
+    }
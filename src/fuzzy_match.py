@@ -0,0 +1,127 @@
+# fuzzy matching of venue/host names and addresses, so "Brickhouse" finds
+# "Brickhouse NYC" and "156 West 44th Street" finds "156 W 44th St, New York, NY"
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+# default score (0-1) at or above which best() returns the top candidate
+AUTO_ACCEPT = 0.85
+
+# spelled-out words Google Calendar / users type, mapped to the form stored in the CSVs
+ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "place": "pl",
+    "drive": "dr", "lane": "ln", "floor": "fl", "suite": "ste", "north": "n", "south": "s",
+    "east": "e", "west": "w", "first": "1st", "second": "2nd", "third": "3rd", "and": "&",
+}
+# tokens that say nothing about which venue/host is meant
+NOISE = {"the", "nyc", "ny", "usa", "inc", "llc"}
+
+
+def normalize(text) -> str:
+    """Lowercase, drop punctuation and noise words, and abbreviate address words."""
+    if text is None or text != text:  # None or NaN
+        return ""
+    tokens = re.sub(r"[^\w&]+", " ", str(text).lower()).split()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens if token not in NOISE)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Match:
+    id: Any
+    text: str
+    score: float
+
+
+class FuzzyIndex:
+    """
+    Trigram inverted index over (id, text) entries.
+
+    A query only scores entries that share trigrams with it, so a lookup touches a
+    handful of posting lists instead of every row. An id may be added with several
+    texts (a venue's name and its address); it's ranked by its best one.
+    """
+
+    POSTING_BUDGET = 2000
+
+    def __init__(self, entries: Iterable[tuple[Any, Any]] = ()):
+        self._texts: list[str] = []
+        self._ids: list[Any] = []
+        self._grams: list[set[str]] = []
+        self._tokens: list[set[str]] = []
+        self._postings: dict[str, list[int]] = {}
+        for entry_id, text in entries:
+            self.add(entry_id, text)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, entry_id, text):
+        key = normalize(text)
+        if not key:
+            return
+        position = len(self._texts)
+        self._texts.append(str(text))
+        self._ids.append(entry_id)
+        grams = trigrams(key)
+        self._grams.append(grams)
+        self._tokens.append(set(key.split()))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+
+    def search(self, text, limit: int = 5, min_score: float = 0.3) -> list[Match]:
+        """Return up to `limit` matches for `text`, best first."""
+        key = normalize(text)
+        if not key:
+            return []
+        grams, tokens = trigrams(key), set(key.split())
+        # count candidates from the rarest trigrams first and stop once enough postings
+        # have been read, so grams like " st" shared by half the table don't dominate
+        postings = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+        shared, total = Counter(), 0
+        for read, posting in enumerate(postings):
+            if read >= 3 and total >= self.POSTING_BUDGET:
+                break
+            shared.update(posting)
+            total += len(posting)
+        best: dict[Any, Match] = {}
+        # only the entries with the most trigrams in common can score well
+        for position, _ in shared.most_common(limit * 4):
+            dice = 2 * len(grams & self._grams[position]) / (len(grams) + len(self._grams[position]))
+            overlap = len(tokens & self._tokens[position]) / min(len(tokens), len(self._tokens[position]))
+            score = round((dice + overlap) / 2, 3)
+            entry_id = self._ids[position]
+            if score >= min_score and (entry_id not in best or score > best[entry_id].score):
+                best[entry_id] = Match(entry_id, self._texts[position], score)
+        return sorted(best.values(), key=lambda match: -match.score)[:limit]
+
+    def suggest(self, *texts, limit: int = 3) -> list[Match]:
+        """Matches for any of several texts (e.g. a venue's name and address), best first."""
+        best: dict[Any, Match] = {}
+        for text in texts:
+            for match in self.search(text, limit):
+                if match.id not in best or match.score > best[match.id].score:
+                    best[match.id] = match
+        return sorted(best.values(), key=lambda match: -match.score)[:limit]
+
+    def best(self, *texts, accept: Optional[float] = None) -> Optional[Match]:
+        """The top match across several query texts if it scores at least `accept`."""
+        accept = AUTO_ACCEPT if accept is None else accept
+        top = self.suggest(*texts, limit=1)
+        return top[0] if top and top[0].score >= accept else None
+
+
+def choose(answer: str, candidates: list[Match]):
+    """The id of the candidate picked by number at a prompt, or None if `answer` isn't a pick."""
+    if answer.isdigit() and 1 <= int(answer) <= len(candidates):
+        return candidates[int(answer) - 1].id
+    return None
+
+
+def describe(candidates: list[Match]) -> str:
+    return "\n".join(f"  {number}. {match.text} ({match.score:.2f})" for number, match in enumerate(candidates, 1))
@@ -1,12 +1,23 @@
 import datetime
+import json
 import os
 import csv
+import time
 from pathlib import Path
 from typing import Any
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import numpy
+import httpx
 import supabase
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from postgrest import ReturnMethod
 from data_objects import Event
+from resolution_rules import ResolutionRules
+from fuzzy_match import FuzzyIndex, Match, choose, describe
+from event_diff import changed_columns, content_hash
+from snapshot import read_records
+from utils import recover
 
 # Load environment variables
 
@@ -14,122 +25,431 @@ CSV_DIR = Path("dance_dispatch/data/csv_files")
 NEXT_PUBLIC_SUPABASE_URL = "https://gkiwxeqrcmqotegowgil.supabase.co"
 NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY="sb_publishable_c1FPKFoUxmpCV7SBnRQV0A_VHFVfwn2"
 
+# errors raised when a pooled keep-alive connection was closed or reset by the
+# server (WinError 10054 surfaces as ReadError/RemoteProtocolError)
+CONNECTION_ERRORS = (
+    httpx.ConnectError,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.WriteError,
+)
+# the subset raised before a request reached the server: a new connection that
+# couldn't be made, or a stale pooled one that failed as the request was written.
+# Only these are retried for inserts, since after a ReadError the row may exist.
+UNSENT_ERRORS = (
+    httpx.ConnectError,
+    httpx.WriteError,
+)
+
+
+class SupabaseClientHolder:
+    """
+    Long-lived Supabase client backed by a single keep-alive httpx connection pool.
+
+    Idle connections are expired before the server is likely to drop them, and a
+    connection that fails mid-request is discarded by the pool on its own, so a
+    retry through the same client only reconnects that one connection.
+    """
+
+    def __init__(
+        self,
+        url: str | None = None,
+        key: str | None = None,
+        max_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+    ):
+        self.url = url or NEXT_PUBLIC_SUPABASE_URL
+        self.key = key or NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Client | None = None
+        self._http: httpx.Client | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Client:
+        with self._lock:
+            if self._client is None:
+                self._http = httpx.Client(limits=self.limits, timeout=120)
+                self._client = create_client(self.url, self.key, options=ClientOptions(httpx_client=self._http))
+            return self._client
+
+    def close(self):
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._client = None
+            self._http = None
+
+
+SUPABASE = SupabaseClientHolder()
+
+
 def get_supabase_client() -> Client:
-    """Initialize and return Supabase client"""
-    return create_client(NEXT_PUBLIC_SUPABASE_URL, NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY)
+    """Return the shared Supabase client"""
+    return SUPABASE.get()
 
 
-def _fetch_existing_ids(
+def _iter_rows(
     client: Client,
     table_name: str,
-    id_column: str,
+    columns: str,
     page_size: int = 1000,
-) -> set[str]:
-    """Fetch all existing IDs from a Supabase table."""
-    existing_ids: set[str] = set()
+):
+    """Yield every row of a Supabase table, fetched page by page."""
     start = 0
 
     while True:
         end = start + page_size - 1
         response = (
             client.table(table_name)
-            .select(id_column)
+            .select(columns)
             .range(start, end)
             .execute()
         )
 
         rows = response.data or []
-        if not rows:
-            break
-
-        for row in rows:
-            value = row.get(id_column)
-            if value is not None:
-                existing_ids.add(str(value).strip())
+        yield from rows
 
         if len(rows) < page_size:
             break
 
         start += page_size
 
+
+def _fetch_existing_ids(
+    client: Client,
+    table_name: str,
+    id_column: str,
+    page_size: int = 1000,
+) -> set[str]:
+    """Fetch all existing IDs from a Supabase table."""
+    existing_ids: set[str] = set()
+    for row in _iter_rows(client, table_name, id_column, page_size):
+        value = row.get(id_column)
+        if value is not None:
+            existing_ids.add(str(value).strip())
     return existing_ids
 
 
+def _fetch_id_map(
+    client: Client,
+    table_name: str,
+    key_column: str,
+    id_column: str = "id",
+    page_size: int = 1000,
+) -> dict[str, Any]:
+    """Fetch a `key_column -> id` map for a whole Supabase table in one paged read."""
+    id_map: dict[str, Any] = {}
+    for row in _iter_rows(client, table_name, f"{key_column},{id_column}", page_size):
+        key = row.get(key_column)
+        if key is not None:
+            id_map[str(key).strip()] = row[id_column]
+    return id_map
+
+
+def _fetch_rows_after(
+    client: Client,
+    table_name: str,
+    columns: str,
+    watermark_column: str,
+    watermark: Any,
+    page_size: int = 1000,
+) -> list[dict[str, Any]]:
+    """Fetch rows whose watermark column is greater than `watermark`, oldest first."""
+    rows: list[dict[str, Any]] = []
+    start = 0
+
+    while True:
+        end = start + page_size - 1
+        query = client.table(table_name).select(columns)
+        if watermark is not None:
+            query = query.gt(watermark_column, watermark)
+        response = query.order(watermark_column).range(start, end).execute()
+
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+
+        start += page_size
+
+    return rows
+
+
+class ExistingIdCache:
+    """
+    Process-level set of IDs already present in a Supabase table.
+
+    The first lookup pages through the table once; after that the set is kept
+    current locally via add(), and once `ttl` seconds have passed the next lookup
+    only fetches rows whose `watermark_column` is past the highest one seen.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        id_column: str,
+        watermark_column: str = "id",
+        ttl: float | None = 300.0,
+    ):
+        self.table_name = table_name
+        self.id_column = id_column
+        self.watermark_column = watermark_column
+        self.ttl = ttl
+        self.ids: set[str] = set()
+        self.watermark: Any = None
+        self.loaded_at: float | None = None
+
+    def _merge(self, rows: list[dict[str, Any]]):
+        for row in rows:
+            value = row.get(self.id_column)
+            if value is not None:
+                self.ids.add(str(value).strip())
+            mark = row.get(self.watermark_column)
+            if mark is not None and (self.watermark is None or mark > self.watermark):
+                self.watermark = mark
+
+    def refresh(self, client: Client | None = None, full: bool = False):
+        """Fetch rows newer than the watermark, or the whole table if `full` or never loaded."""
+        client = client or get_supabase_client()
+        if full or self.loaded_at is None:
+            self.ids = set()
+            self.watermark = None
+        columns = f"{self.id_column},{self.watermark_column}"
+        rows = _fetch_rows_after(client, self.table_name, columns, self.watermark_column, self.watermark)
+        self._merge(rows)
+        self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def is_stale(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self.loaded_at > self.ttl
+
+    def contains(self, value: Any, client: Client | None = None) -> bool:
+        if self.is_stale():
+            self.refresh(client)
+        return value is not None and str(value).strip() in self.ids
+
+    def add(self, value: Any):
+        """Record a row this process just inserted.
+
+        The watermark is deliberately left alone so rows other writers inserted in
+        the meantime are still picked up by the next incremental refresh.
+        """
+        if value is not None:
+            self.ids.add(str(value).strip())
+
+
+EVENT_ID_CACHE = ExistingIdCache("Events", "google_cal_id")
+
+
 def sync_events_csv_to_supabase(
     csv_path: Path | None = None,
     table_name: str = "events",
     csv_id_column: str = "ID",
     db_id_column: str = "id",
     batch_size: int = 500,
-) -> dict[str, int]:
+    workers: int = 4,
+    upsert: bool = False,
+) -> dict[str, Any]:
     """
     Sync events from events.csv to Supabase, skipping rows where event ID already exists.
 
-    Returns summary counts: read, inserted, skipped_existing, skipped_missing_id.
+    With `upsert=True` the existing IDs aren't downloaded first; every row is sent as
+    an upsert on `db_id_column`, so the server skips nothing and updates rows that
+    changed. skipped_existing then only counts IDs repeated within the CSV.
+
+    The CSV is streamed: each chunk of `batch_size` new rows is handed to a pool of
+    `workers` insert threads as soon as it fills, and reading pauses while that many
+    chunks are in flight, so memory stays at roughly workers * batch_size rows.
+
+    Returns summary counts: read, inserted, skipped_existing, skipped_missing_id,
+    plus batches, a list of {"batch", "rows", "seconds"} timings per insert.
     """
     client = get_supabase_client()
     csv_file = csv_path or (CSV_DIR / "events.csv")
 
     if not csv_file.exists():
         raise FileNotFoundError(f"CSV file not found: {csv_file}")
+    # apply changes the catalog journaled but hasn't checkpointed yet
+    recover(csv_file)
 
-    existing_ids = _fetch_existing_ids(client, table_name, db_id_column)
+    existing_ids = set() if upsert else _fetch_existing_ids(client, table_name, db_id_column)
 
-    rows_to_insert: list[dict[str, Any]] = []
     seen_in_csv: set[str] = set()
     read_count = 0
     skipped_existing = 0
     skipped_missing_id = 0
+    inserted = 0
+    submitted = 0
+    batches: list[dict[str, Any]] = []
 
-    with open(csv_file, "r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            read_count += 1
-            raw_id = row.get(csv_id_column)
-            event_id = str(raw_id).strip() if raw_id is not None else ""
-
-            if not event_id:
-                skipped_missing_id += 1
-                continue
+    def insert_chunk(batch: int, chunk: list[dict[str, Any]]) -> dict[str, Any]:
+        started = time.perf_counter()
+        if upsert:
+            _execute_with_retry(lambda: client.table(table_name).upsert(chunk, on_conflict=db_id_column).execute())
+        else:
+            _execute_with_retry(lambda: client.table(table_name).insert(chunk).execute(), idempotent=False)
+        return {"batch": batch, "rows": len(chunk), "seconds": time.perf_counter() - started}
+
+    def collect(done):
+        nonlocal inserted
+        for future in done:
+            timing = future.result()
+            inserted += timing["rows"]
+            batches.append(timing)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight: set[Future] = set()
+
+        def submit(chunk: list[dict[str, Any]]):
+            nonlocal in_flight, submitted
+            if len(in_flight) >= workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(pool.submit(insert_chunk, submitted, chunk))
+            submitted += 1
+
+        chunk: list[dict[str, Any]] = []
+        with open(csv_file, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+
+            for row in reader:
+                read_count += 1
+                raw_id = row.get(csv_id_column)
+                event_id = str(raw_id).strip() if raw_id is not None else ""
+
+                if not event_id:
+                    skipped_missing_id += 1
+                    continue
 
-            if event_id in existing_ids or event_id in seen_in_csv:
-                skipped_existing += 1
-                continue
+                if event_id in existing_ids or event_id in seen_in_csv:
+                    skipped_existing += 1
+                    continue
 
-            payload = dict(row)
-            if csv_id_column != db_id_column:
-                payload.pop(csv_id_column, None)
-            payload[db_id_column] = event_id
+                payload = dict(row)
+                if csv_id_column != db_id_column:
+                    payload.pop(csv_id_column, None)
+                payload[db_id_column] = event_id
 
-            rows_to_insert.append(payload)
-            seen_in_csv.add(event_id)
+                chunk.append(payload)
+                seen_in_csv.add(event_id)
+                if len(chunk) >= batch_size:
+                    submit(chunk)
+                    chunk = []
 
-    inserted = 0
-    for index in range(0, len(rows_to_insert), batch_size):
-        chunk = rows_to_insert[index:index + batch_size]
-        if not chunk:
-            continue
-        client.table(table_name).insert(chunk).execute()
-        inserted += len(chunk)
+        if chunk:
+            submit(chunk)
+        collect(wait(in_flight).done)
 
+    batches.sort(key=lambda timing: timing["batch"])
     summary = {
         "read": read_count,
         "inserted": inserted,
         "skipped_existing": skipped_existing,
         "skipped_missing_id": skipped_missing_id,
+        "batches": batches,
     }
 
     print(
         f"Events sync complete: read={summary['read']}, inserted={summary['inserted']}, "
         f"skipped_existing={summary['skipped_existing']}, "
-        f"skipped_missing_id={summary['skipped_missing_id']}"
+        f"skipped_missing_id={summary['skipped_missing_id']}, "
+        f"batches={len(batches)} ({sum(t['seconds'] for t in batches):.2f}s in inserts)"
     )
 
     return summary
 
-def migrate_csv_files():
-    """Migrate all CSV files from directory to Supabase"""
+def _write_rows(
+    client: Client,
+    table_name: str,
+    rows: list[dict[str, Any]],
+    upsert: bool = False,
+    on_conflict: str = "",
+):
+    """Insert rows, or upsert them on `on_conflict` so the server resolves duplicates."""
+    if upsert:
+        return _execute_with_retry(
+            lambda: client.table(table_name).upsert(rows, on_conflict=on_conflict, returning=ReturnMethod.representation).execute()
+        )
+    return _execute_with_retry(
+        lambda: client.table(table_name).insert(rows, returning=ReturnMethod.representation).execute(),
+        idempotent=False,
+    )
+
+
+def migrate_venues_csv(client: Client | None = None, upsert: bool = False) -> int:
+    """Copy venues.csv into the Venues table keyed by temp_id; returns rows written."""
+    client = client or get_supabase_client()
+    existing_venues = set() if upsert else _fetch_existing_ids(client, "Venues", "temp_id")
+    venues = read_records("venues", CSV_DIR)
+    print(f"Read {len(venues)} venues from CSV")
+
+    rows = [
+        {
+            'name': venue["Name"],
+            'address': venue["Address"],
+            'bio': venue["Bio"],
+            'type': venue["Type"],
+            'temp_id': venue["ID"],
+        }
+        for venue in venues
+        if str(venue["ID"]) not in existing_venues
+    ]
+    if rows:
+        _write_rows(client, "Venues", rows, upsert=upsert, on_conflict="temp_id")
+    print(f"Venues migration complete: {'upserted' if upsert else 'inserted'}={len(rows)}")
+    return len(rows)
+
+
+def migrate_hosts_csv(client: Client | None = None, upsert: bool = False) -> int:
+    """Copy hosts.csv into the Hosts table keyed by temp_id; returns rows written."""
+    client = client or get_supabase_client()
+    existing_hosts = set() if upsert else _fetch_existing_ids(client, "Hosts", "temp_id")
+    hosts = read_records("hosts", CSV_DIR)
+    print(f"Read {len(hosts)} hosts from CSV")
+
+    rows = [
+        {
+            'name': host["Name"],
+            'bio': host["Bio"],
+            'tags': "{" + ",".join(host["Tags"]) + "}" if host["Tags"] else None,
+            'temp_id': host["ID"],
+        }
+        for host in hosts
+        if str(host["ID"]) not in existing_hosts
+    ]
+    if rows:
+        _write_rows(client, "Hosts", rows, upsert=upsert, on_conflict="temp_id")
+    print(f"Hosts migration complete: {'upserted' if upsert else 'inserted'}={len(rows)}")
+    return len(rows)
+
+
+def _timestamp(date: datetime.date | None, time_of_day: datetime.time | None) -> str | None:
+    if date is None:
+        return None
+    return datetime.datetime.combine(date, time_of_day or datetime.time()).isoformat(sep=" ")
+
+
+def migrate_csv_files(batch_size: int = 500, upsert: bool = False, venues_and_hosts: bool = False):
+    """
+    Migrate all CSV files from directory to Supabase.
+
+    Venue and host temp_id -> id maps are prefetched once, events are inserted in
+    chunks of `batch_size`, and all event_hosts rows go in a single insert. The
+    CSVs are read as typed records through their Arrow snapshots (see snapshot.py).
+
+    With `upsert=True` nothing is pre-scanned: events are upserted on google_cal_id
+    (and venues/hosts on temp_id when `venues_and_hosts` is set), so re-runs update
+    changed rows instead of skipping them, and event_hosts links that already
+    exist are ignored by the server.
+    """
     client = get_supabase_client()
     
     if not CSV_DIR.exists():
@@ -137,83 +457,66 @@ def migrate_csv_files():
         return
     
 
-    # existing_venues = _fetch_existing_ids(client, "Venues", "temp_id")
-    # with open(CSV_DIR / "venues.csv", "r", encoding="utf-8") as f:
-    #     reader = csv.DictReader(f)
-    #     venues = list(reader)
-    #     print(f"Read {len(venues)} venues from CSV")
-    #     for venue in venues:
-    #         if venue["ID"] in existing_venues:
-    #             print(f"Skipping existing venue: {venue['Name']} (ID: {venue['ID']})")
-    #             continue
-    #         temp_json = {
-    #             'name': venue["Name"],
-    #             'address': venue["Address"],
-    #             'bio': venue["Bio"],
-    #             'type': venue["Type"],
-                
-    #             'temp_id': venue["ID"],
-    #         }
-    #         response = client.table("Venues").insert(temp_json).execute()
-    #         input("Inserted venue: " + venue["Name"] + " - Press Enter to continue...")
-    
+    if venues_and_hosts:
+        migrate_venues_csv(client, upsert=upsert)
+        migrate_hosts_csv(client, upsert=upsert)
 
-    # existing_hosts = _fetch_existing_ids(client, "Hosts", "temp_id")
-    # with open(CSV_DIR / "hosts.csv", "r", encoding="utf-8") as f:
-    #     reader = csv.DictReader(f)
-    #     hosts = list(reader)
-    #     print(f"Read {len(hosts)} hosts from CSV")
-    #     for host in hosts:
-    #         if host["ID"] in existing_hosts:
-    #             print(f"Skipping existing host: {host['Name']} (ID: {host['ID']})")
-    #             continue
-    #         temp_json = {
-    #             'name': host["Name"],
-    #             'bio': host["Bio"],
-    #             'tags': "{" +  ",".join([s.replace("'", "") for s in host["Tags"].strip("[]").split(",")]) + "}" if host["Tags"] else None,
-    #             'temp_id': host["ID"],
-    #         }
-    #         response = client.table("Hosts").insert(temp_json).execute()
-    #         input("Inserted host: " + host["Name"] + " - Press Enter to continue...")
-    
+    venue_ids = _fetch_id_map(client, "Venues", "temp_id")
+    host_ids = _fetch_id_map(client, "Hosts", "temp_id")
+    existing_events = set() if upsert else _fetch_existing_ids(client, "Events", "google_cal_id")
 
-    existing_events = _fetch_existing_ids(client, "Events", "google_cal_id")
+    events = read_records("events", CSV_DIR)
+    print(f"Read {len(events)} events from CSV")
 
-    with open(CSV_DIR / "events.csv", "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        events = list(reader)
-        print(f"Read {len(events)} events from CSV")
-        for event in events:
-            if event["ID"] in existing_events:
-                print(f"Skipping existing event: {event['Title']} (Google Cal ID: {event['ID']})")
-                continue
-            temp_json = {
+    new_events: list[dict[str, Any]] = []
+    seen_in_csv: set[str] = set()
+    for event in events:
+        if event["ID"] in existing_events or event["ID"] in seen_in_csv:
+            print(f"Skipping existing event: {event['Title']} (Google Cal ID: {event['ID']})")
+            continue
+        seen_in_csv.add(event["ID"])
+        new_events.append(event)
+
+    # insert events a chunk at a time and collect their event_hosts links from the returned ids
+    event_hosts: list[dict[str, Any]] = []
+    inserted = 0
+    for index in range(0, len(new_events), batch_size):
+        chunk = new_events[index:index + batch_size]
+        payload = [
+            {
                 'title': event["Title"],
-                'start': event["StartDate"] + " " + event["StartTime"],
-                'end': event["EndDate"] + " " + event["EndTime"],
-                'location': client.table("Venues").select("id").eq("temp_id", int(float(event["Location"]))).execute().data[0]["id"] if client.table("Venues").select("id").eq("temp_id", int(float(event["Location"]))).execute().data else None,
+                'start': _timestamp(event["StartDate"], event["StartTime"]),
+                'end': _timestamp(event["EndDate"], event["EndTime"]),
+                'location': venue_ids.get(str(event["Location"])),
                 'description': event["Description"],
-                'price': event["Price"] if event["Price"] != "" else None,
+                'price': event["Price"],
                 'flyer_url': event["PhotoURL"],
                 'external_url': event["ExternalURLs"],
                 'google_cal_id': event["ID"],
             }
-            response = client.table("Events").insert(temp_json).execute()
-            # once event is input, create an entry into event_hosts, querying the host id from the Hosts table using the temp_id from the events csv
-            host_ids = []
-            print(f"Processing hosts for event: {event['Title']} with host temp IDs: {event['Hosts']}")
-            for host_temp_id in event["Hosts"].strip("[]").split(","):
-                if host_temp_id.strip() == "":
-                    continue
-                temp_id = int(float(host_temp_id.replace("np.int64(", "").replace(")", "").strip()))
-                host_response = client.table("Hosts").select("id").eq("temp_id", temp_id).execute()
-                if host_response.data:
-                    host_ids.append(host_response.data[0]["id"])
-            for host_id in host_ids:
-                client.table("event_hosts").insert({
-                    'event_id': response.data[0]["id"],
-                    'host_id': host_id,
-                }).execute()
+            for event in chunk
+        ]
+        response = _write_rows(client, "Events", payload, upsert=upsert, on_conflict="google_cal_id")
+        new_ids = {row["google_cal_id"]: row["id"] for row in response.data or []}
+        inserted += len(payload)
+
+        for event in chunk:
+            event_id = new_ids.get(event["ID"])
+            if event_id is None:
+                continue
+            for temp_id in event["Hosts"]:
+                if str(temp_id) in host_ids:
+                    event_hosts.append({'event_id': event_id, 'host_id': host_ids[str(temp_id)]})
+
+    if event_hosts and upsert:
+        _execute_with_retry(lambda: client.table("event_hosts").upsert(
+            event_hosts, on_conflict="event_id,host_id", ignore_duplicates=True
+        ).execute())
+    elif event_hosts:
+        _execute_with_retry(lambda: client.table("event_hosts").insert(event_hosts).execute(), idempotent=False)
+
+    print(f"Events migration complete: {'upserted' if upsert else 'inserted'}={inserted}, event_hosts={len(event_hosts)}")
+    return {"inserted": inserted, "event_hosts": len(event_hosts)}
 
 
     # for csv_file in CSV_DIR.glob("*.csv"):
@@ -232,51 +535,112 @@ def migrate_csv_files():
 
 
 def check_if_event_exists(event: Event):
-    eventIds = _fetch_existing_ids(get_supabase_client(), "Events", "google_cal_id")
-    if (eventIds and event.id in eventIds):
+    if EVENT_ID_CACHE.contains(event.id):
         print("Skipping existing event with Google Cal ID: " + str(event.id))
         # EVENTS.loc[EVENTS['ID'] == event.id, ['Title', 'StartTime', 'EndTime']] = event.title, event.start_time, event.end_time
         return True
     return False
 
 def _client() -> Client:
-    """Return a fresh Supabase client to avoid stale connections (WinError 10054)."""
-    return get_supabase_client()
+    """Return the shared pooled client; stale connections (WinError 10054) are recycled by the pool."""
+    return SUPABASE.get()
 
 
-import time
+def _execute_with_retry(fn, retries: int = 3, delay: float = 0.5, idempotent: bool = True):
+    """Call fn() retrying on httpx connection errors, waiting delay, 2*delay, ... between tries.
 
-def _execute_with_retry(fn, retries: int = 3, delay: float = 2.0):
-    """Call fn() retrying on httpx connection errors."""
-    import httpx
+    Pass idempotent=False for inserts: those are only retried when the request
+    never reached the server (UNSENT_ERRORS), so a lost response can't add a
+    second copy of the row.
+    """
+    retry_on = CONNECTION_ERRORS if idempotent else UNSENT_ERRORS
     for attempt in range(retries):
         try:
             return fn()
-        except (httpx.ConnectError, httpx.RemoteProtocolError) as exc:
+        except retry_on as exc:
             if attempt < retries - 1:
-                print(f"Connection error ({exc}), retrying in {delay}s... ({attempt + 1}/{retries})")
-                time.sleep(delay)
+                wait = delay * 2 ** attempt
+                print(f"Connection error ({exc}), retrying in {wait}s... ({attempt + 1}/{retries})")
+                time.sleep(wait)
             else:
                 raise
 
 
-def get_venue_id(venue_name, venue_address):
-    response_by_name = _execute_with_retry(lambda: _client().table("Venues").select("id").eq("name", venue_name).limit(1).execute())
-    if response_by_name.data:
-        return response_by_name.data[0]["id"]
+def _postgrest_value(value) -> str:
+    """Quote a value for use inside an or=(...) / in.(...) filter, where commas and parens are syntax."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _pick_venue(rows: list[dict[str, Any]], venue_name, venue_address):
+    """From rows ordered by id, the first name match wins over the first address match."""
+    by_address = None
+    for row in rows:
+        if venue_name and row.get("name") == venue_name:
+            return row["id"]
+        if by_address is None and venue_address and row.get("address") == venue_address:
+            by_address = row["id"]
+    return by_address
+
+
+def _find_venue(venue_name, venue_address):
+    """Look up a venue by name or address in one query; a name match is preferred."""
+    filters = [f"{column}.eq.{_postgrest_value(value)}"
+               for column, value in (("name", venue_name), ("address", venue_address)) if value]
+    if not filters:
+        return None
+    response = _execute_with_retry(lambda: _client().table("Venues").select("id,name,address")
+                                   .or_(",".join(filters)).order("id").execute())
+    return _pick_venue(response.data, venue_name, venue_address)
+
+
+def find_venue_ids(pairs, client: Client | None = None, chunk_size: int = 100) -> dict[tuple, Any]:
+    """
+    Resolve many (name, address) pairs with one name-or-address in.(...) query per chunk.
+
+    Returns {(name, address): venue_id}; pairs with no matching venue are left out.
+    """
+    client = client or _client()
+    pairs = list(dict.fromkeys(pairs))
+    found = {}
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        filters = []
+        for column, values in (("name", {name for name, _ in chunk if name}),
+                               ("address", {address for _, address in chunk if address})):
+            if values:
+                filters.append(f"{column}.in.({','.join(_postgrest_value(v) for v in sorted(values))})")
+        if not filters:
+            continue
+        response = _execute_with_retry(lambda f=filters: client.table("Venues").select("id,name,address")
+                                       .or_(",".join(f)).order("id").execute())
+        for name, address in chunk:
+            venue_id = _pick_venue(response.data, name, address)
+            if venue_id is not None:
+                found[(name, address)] = venue_id
+    return found
+
 
-    response_by_address = _execute_with_retry(lambda: _client().table("Venues").select("id").eq("address", venue_address).limit(1).execute())
-    if response_by_address.data:
-        return response_by_address.data[0]["id"]
+def _add_venue(venue_name, venue_address, rules: ResolutionRules | None = None, candidates: list[Match] | None = None):
+    """Prompt for (or apply the rules to) a venue that wasn't found and insert it.
 
-    loc = input(f"Venue '{venue_name}' not found. Enter location for new venue, leave blank to use {venue_address}, or 'skip' to skip: ").strip()
+    Similar existing venues in `candidates` are listed and can be picked by number.
+    """
+    if rules is not None:
+        loc = "" if rules.unresolved("venue", venue_name, venue_address) else "skip"
+    else:
+        if candidates:
+            print(f"Similar venues:\n{describe(candidates)}")
+        loc = input(f"Venue '{venue_name}' not found. Enter location for new venue, leave blank to use {venue_address}, the number of a similar venue, or 'skip' to skip: ").strip()
+        picked = choose(loc, candidates or [])
+        if picked is not None:
+            return picked
     if loc == "":
         temp_json = {
             'name': venue_name,
             'address': venue_address,
             'temp_id': None,
         }
-        response = _execute_with_retry(lambda: _client().table("Venues").insert(temp_json).execute())
+        response = _execute_with_retry(lambda: _client().table("Venues").insert(temp_json).execute(), idempotent=False)
         print(f"Added new venue: {venue_name} with ID {response.data[0]['id']}")
         return response.data[0]["id"]
     elif loc.lower() == "skip":
@@ -288,53 +652,278 @@ def get_venue_id(venue_name, venue_address):
             'address': loc,
             'temp_id': None,
         }
-        response = _execute_with_retry(lambda: _client().table("Venues").insert(temp_json).execute())
+        response = _execute_with_retry(lambda: _client().table("Venues").insert(temp_json).execute(), idempotent=False)
         print(f"Added new venue: {venue_name} with ID {response.data[0]['id']}")
         return response.data[0]["id"]
-    
-def get_host_id(hosts):
-    host_ids = []
-    if not hosts:
-        return host_ids
-    for host in hosts.strip("[]").split(","):
+
+
+def get_venue_id(venue_name, venue_address, rules: ResolutionRules | None = None):
+    if rules is not None:
+        venue_name = rules.venue_name(venue_name)
+    venue_id = _find_venue(venue_name, venue_address)
+    if venue_id is not None:
+        return venue_id
+    return _add_venue(venue_name, venue_address, rules)
+
+
+def _host_names(hosts, rules: ResolutionRules | None = None) -> list[str]:
+    """Split a host list string like "[A, B]" into names, applying any aliases."""
+    names = []
+    for host in (hosts or "").strip("[]").split(","):
         if host.strip() == "":
             continue
-        response = _execute_with_retry(lambda h=host: _client().table("Hosts").select("id").eq("name", h.strip()).execute())
-        if response.data:
-            host_ids.append(response.data[0]["id"])
-        else:
-            name = input(f"Host with name '{host.strip()}' not found. Type 'skip' to skip adding host or leave blank to use {host}: ").strip()
-            if name.lower() == "skip":
-                print(f"Skipping adding host with name '{host.strip()}'")
-                continue
-            elif name == "":
-                name = host.strip()
-                tags = input(f"Enter tags for host '{name}' (comma-separated) or leave blank: ").strip()
-                temp_json = {
-                    'name': name,
-                    'bio': None,
-                    'tags': "{" +  ",".join([s.replace("'", "") for s in tags.split(",")]) + "}" if tags else None,
-                }
-                response = _execute_with_retry(lambda tj=temp_json: _client().table("Hosts").insert(tj).execute())
-                print(f"Added new host: {name} with ID {response.data[0]['id']}")
-                host_ids.append(response.data[0]["id"])
-            else:
-                temp_json = {
-                    'name': host.strip(),
-                    'bio': None,
-                    'tags': None,}
-                response = _execute_with_retry(lambda tj=temp_json: _client().table("Hosts").insert(tj).execute())
-                print(f"Added new host: {host.strip()} with ID {response.data[0]['id']}")
-                host_ids.append(response.data[0]["id"])
+        names.append(rules.host_name(host.strip()) if rules is not None else host.strip())
+    return names
+
+
+def _find_host(name):
+    response = _execute_with_retry(lambda: _client().table("Hosts").select("id").eq("name", name).execute())
+    return response.data[0]["id"] if response.data else None
+
+
+def _add_host(host, rules: ResolutionRules | None = None, candidates: list[Match] | None = None):
+    """Prompt for (or apply the rules to) a host that wasn't found and insert it.
+
+    Similar existing hosts in `candidates` are listed and can be picked by number.
+    """
+    if rules is not None:
+        name = "" if rules.unresolved("host", host) else "skip"
+    else:
+        if candidates:
+            print(f"Similar hosts:\n{describe(candidates)}")
+        name = input(f"Host with name '{host}' not found. Type 'skip' to skip adding host, the number of a similar host, or leave blank to use {host}: ").strip()
+        picked = choose(name, candidates or [])
+        if picked is not None:
+            return picked
+    if name.lower() == "skip":
+        print(f"Skipping adding host with name '{host}'")
+        return None
+    elif name == "":
+        name = host
+        tags = "" if rules is not None else input(f"Enter tags for host '{name}' (comma-separated) or leave blank: ").strip()
+        temp_json = {
+            'name': name,
+            'bio': None,
+            'tags': "{" +  ",".join([s.replace("'", "") for s in tags.split(",")]) + "}" if tags else None,
+        }
+    else:
+        temp_json = {
+            'name': name,
+            'bio': None,
+            'tags': None,}
+    response = _execute_with_retry(lambda: _client().table("Hosts").insert(temp_json).execute(), idempotent=False)
+    print(f"Added new host: {name} with ID {response.data[0]['id']}")
+    return response.data[0]["id"]
+
+
+def get_host_id(hosts, rules: ResolutionRules | None = None):
+    host_ids = []
+    for name in _host_names(hosts, rules):
+        host_id = _find_host(name)
+        if host_id is None:
+            host_id = _add_host(name, rules)
+        if host_id is not None:
+            host_ids.append(host_id)
     return host_ids
 
-def handle_event_entry(event: Event):
 
-    if check_if_event_exists(event):
-        return event.id
-    venue_id = get_venue_id(event.location, event.address)
-    host_ids = get_host_id(event.hosts)
-    new_event = {
+class EntityResolver:
+    """
+    Resolves an event's venue and hosts with all of the lookups in flight at once.
+
+    Lookups are shared between the events handled by one resolver: an event asking
+    for a venue or host that is already being (or has been) looked up waits on that
+    result instead of querying again. prefetch_venues() fills that memo for a whole
+    batch with a single query.
+
+    A venue or host with no exact match is looked up in a trigram index of the
+    table (loaded on the first miss); a close enough match is used as is, weaker
+    ones are offered at the prompt. Prompts and inserts for anything that wasn't
+    found still run on the calling thread, one at a time.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lookups: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._indexes: dict[str, FuzzyIndex] = {}
+
+    def __enter__(self) -> "EntityResolver":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def _lookup(self, key: tuple, fn, *args) -> Future:
+        with self._lock:
+            future = self._lookups.get(key)
+            if future is None:
+                future = self._pool.submit(fn, *args)
+                self._lookups[key] = future
+            return future
+
+    def _remember(self, key: tuple, value):
+        future: Future = Future()
+        future.set_result(value)
+        with self._lock:
+            self._lookups[key] = future
+
+    def _fuzzy(self, kind: str) -> FuzzyIndex:
+        with self._lock:
+            if kind not in self._indexes:
+                if kind == "venue":
+                    rows = list(_iter_rows(_client(), "Venues", "id,name,address"))
+                    entries = [*((row["id"], row["name"]) for row in rows), *((row["id"], row["address"]) for row in rows)]
+                else:
+                    entries = [(row["id"], row["name"]) for row in _iter_rows(_client(), "Hosts", "id,name")]
+                self._indexes[kind] = FuzzyIndex(entries)
+            return self._indexes[kind]
+
+    def _near_miss(self, kind: str, rules: ResolutionRules | None, *texts):
+        """(id of an auto-accepted close match or None, candidates to offer at the prompt).
+
+        Close matches are only accepted without asking when the rules set fuzzy_accept.
+        """
+        index = self._fuzzy(kind)
+        close = index.best(*texts, accept=rules.fuzzy_accept) \
+            if rules is not None and rules.fuzzy_accept is not None else None
+        if close is not None:
+            print(f"Matched {kind} '{texts[0]}' to '{close.text}' (score {close.score:.2f})")
+            return close.id, []
+        return None, index.suggest(*texts) if rules is None else []
+
+    def _created(self, kind: str, key: tuple, new_id, *texts):
+        self._remember(key, new_id)
+        index = self._indexes.get(kind)
+        if index is not None:
+            for text in texts:
+                index.add(new_id, text)
+
+    def prefetch_venues(self, events, rules: ResolutionRules | None = None):
+        """Resolve the venues of a batch of events in bulk, ahead of resolve() being called for each."""
+        with self._lock:
+            pairs = {
+                (rules.venue_name(event.location) if rules is not None else event.location, event.address)
+                for event in events
+            }
+            pairs = [pair for pair in pairs if ("venue", *pair) not in self._lookups]
+        if not pairs:
+            return
+        found = find_venue_ids(pairs)
+        for pair in pairs:
+            self._remember(("venue", *pair), found.get(pair))
+
+    def resolve(
+        self, event: Event, rules: ResolutionRules | None = None, hosts: bool = True, create: bool = True
+    ) -> tuple[Any, list]:
+        """Return (venue_id, host_ids) for an event, creating missing rows like get_venue_id/get_host_id.
+
+        With hosts=False only the venue is resolved and host_ids is empty. With
+        create=False nothing is prompted for or inserted: a venue without an exact
+        or close match comes back as None and such hosts are left out.
+        """
+        venue_name, venue_address = event.location, event.address
+        if rules is not None:
+            venue_name = rules.venue_name(venue_name)
+        venue_key = ("venue", venue_name, venue_address)
+        venue_lookup = self._lookup(venue_key, _find_venue, venue_name, venue_address)
+        host_names = _host_names(event.hosts, rules) if hosts else []
+        host_lookups = [self._lookup(("host", name), _find_host, name) for name in host_names]
+
+        venue_id = venue_lookup.result()
+        if venue_id is None:
+            venue_id, candidates = self._near_miss("venue", rules, venue_name, venue_address)
+            if venue_id is None and create:
+                venue_id = _add_venue(venue_name, venue_address, rules, candidates)
+            if venue_id is not None:
+                self._created("venue", venue_key, venue_id, venue_name, venue_address)
+
+        host_ids = []
+        for name, lookup in zip(host_names, host_lookups):
+            host_id = lookup.result()
+            if host_id is None:
+                host_id, candidates = self._near_miss("host", rules, name)
+                if host_id is None and create:
+                    host_id = _add_host(name, rules, candidates)
+                if host_id is not None:
+                    self._created("host", ("host", name), host_id, name)
+            if host_id is not None:
+                host_ids.append(host_id)
+        return venue_id, host_ids
+
+
+# Events columns compared when an already-ingested event comes in again; hosts live
+# in event_hosts and aren't refreshed
+UPDATE_COLUMNS = ("title", "start", "end", "location", "description", "flyer_url", "price", "external_url")
+
+
+class EventUpdater:
+    """
+    Refreshes events that were already ingested, writing only what changed.
+
+    Staged rows are compared with the stored ones a batch at a time: the stored
+    rows come back in one in.(...) query, rows with an unchanged content hash are
+    dropped, and the rest are PATCHed with just their changed columns. Rows with
+    the same changes (e.g. a series moved to a new venue) share one request.
+    """
+
+    def __init__(self, batch_size: int = 100, client: Client | None = None):
+        self.batch_size = batch_size
+        self.client = client
+        self.updated = 0
+        self._staged: dict[str, dict[str, Any]] = {}
+
+    def __enter__(self) -> "EventUpdater":
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.flush()
+
+    def stage(self, google_cal_id: str, row: dict[str, Any]):
+        self._staged[google_cal_id] = row
+        if len(self._staged) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the staged changes; returns how many events were updated."""
+        if not self._staged:
+            return 0
+        client = self.client or _client()
+        staged, self._staged = self._staged, {}
+        response = _execute_with_retry(lambda: client.table("Events")
+                                       .select(",".join(("google_cal_id",) + UPDATE_COLUMNS))
+                                       .in_("google_cal_id", list(staged)).execute())
+        stored = {row["google_cal_id"]: row for row in response.data}
+
+        groups: dict[str, tuple[dict[str, Any], list[str]]] = {}
+        for google_cal_id, row in staged.items():
+            current = stored.get(google_cal_id)
+            # a staged row can leave out a column (e.g. a location that didn't resolve)
+            columns = [column for column in UPDATE_COLUMNS if column in row]
+            if current is None or content_hash(current, columns) == content_hash(row, columns):
+                continue
+            changes = changed_columns(current, row, columns)
+            if changes:
+                key = json.dumps(changes, sort_keys=True, default=str)
+                groups.setdefault(key, (changes, []))[1].append(google_cal_id)
+
+        updated = 0
+        for changes, ids in groups.values():
+            _execute_with_retry(lambda c=changes, i=ids: client.table("Events")
+                                .update(c, returning=ReturnMethod.minimal)
+                                .in_("google_cal_id", i).execute())
+            print(f"Updated {len(ids)} event(s): {', '.join(changes)}")
+            updated += len(ids)
+        self.updated += updated
+        return updated
+
+
+def _event_row(event: Event, venue_id) -> dict[str, Any]:
+    return {
         'google_cal_id': event.id,
         'title': event.title,
         'start': datetime.datetime.strptime(
@@ -351,15 +940,47 @@ def handle_event_entry(event: Event):
         'price': event.price,
         'external_url': event.external_links.split(",") if event.external_links else []   
     }
-    response = _execute_with_retry(lambda ev=new_event: _client().table("Events").insert(ev).execute())
+
+
+def handle_event_entry(
+    event: Event,
+    rules: ResolutionRules | None = None,
+    resolver: EntityResolver | None = None,
+    updater: EventUpdater | None = None,
+):
+    """
+    Insert an event with its venue and hosts; pass `rules` to never prompt.
+
+    The venue and host lookups run concurrently. Pass a shared `resolver` when
+    handling a batch of events so repeated venues/hosts are only looked up once.
+    An event that already exists is skipped, or with an `updater` staged to have
+    its changed columns written; that never prompts or adds a venue, and a
+    location that doesn't match one keeps the stored venue.
+    """
+    exists = check_if_event_exists(event)
+    if exists and updater is None:
+        return event.id
+    if resolver is None:
+        with EntityResolver() as resolver:
+            venue_id, host_ids = resolver.resolve(event, rules, hosts=not exists, create=not exists)
+    else:
+        venue_id, host_ids = resolver.resolve(event, rules, hosts=not exists, create=not exists)
+    new_event = _event_row(event, venue_id)
+    if exists:
+        if venue_id is None and (event.location or event.address):
+            del new_event["location"]
+        updater.stage(event.id, new_event)
+        return event.id
+    response = _execute_with_retry(lambda ev=new_event: _client().table("Events").insert(ev).execute(), idempotent=False)
     new_id = response.data[0]["id"]
+    EVENT_ID_CACHE.add(event.id)
     
     if len(host_ids) > 0:
         new_event_hosts = list(map(lambda host_id: {
             'event_id': new_id,
             'host_id': host_id,
         }, host_ids))
-        response = _execute_with_retry(lambda eh=new_event_hosts: _client().table("event_hosts").insert(eh).execute())
+        response = _execute_with_retry(lambda eh=new_event_hosts: _client().table("event_hosts").insert(eh).execute(), idempotent=False)
 
     # new_event_tags = list(map(lambda tag: {
     #     'event_id': new_id,
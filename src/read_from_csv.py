@@ -1,18 +1,22 @@
 import pandas as pd
+import argparse
 import csv
+import json
+import os
 import sys
+import time
 from pathlib import Path
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from marshmallow import ValidationError
 
-from src.data_pipeline import handle_event_entry
+from src.data_pipeline import import_events
 
 """
 /c:/Users/Maggi/DanceDispatch/read_from_csv.py
 
 Usage:
-    python read_from_csv.py path/to/events.csv [--dry-run] [--stop-on-error] [--commit-each]
+    python read_from_csv.py path/to/events.csv [--db [--dry-run] [--stop-on-error] [--commit-each | --commit-every N [--resume]]]
 
 This script reads rows from a CSV and uses the Marshmallow schema defined in event_entry.py
 to validate & deserialize each row and insert resulting event objects into the database.
@@ -61,39 +65,116 @@ def read_rows_from_csv(path):
         df = pd.read_csv(path)  # adjust separator as needed
         print(df.head())
 
-        for index, row in df.iterrows():
-                handle_event_entry(row)
-                # 'row' is a pandas Series containing the data for the current row
-                print(row)
+        # venues/hosts are resolved per distinct value and new events appended in one write
+        return import_events(df)
 
 
-def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False):
+class ImportStats:
+        """Running counters for process_csv, with rows/sec since the import started."""
+
+        def __init__(self):
+                self.added = 0
+                self.errors = 0
+                self.skipped = 0
+                self.started = time.monotonic()
+
+        @property
+        def rate(self):
+                elapsed = time.monotonic() - self.started
+                return self.added / elapsed if elapsed > 0 else 0.0
+
+        def __str__(self):
+                return f"Added: {self.added}, Skipped(empty): {self.skipped}, Errors: {self.errors}, {self.rate:.0f} rows/sec"
+
+
+def offset_path(path):
+        """Sidecar file recording the last committed row of `path`, so an import can resume."""
+        path = Path(path)
+        return path.with_name(path.name + ".offset")
+
+
+def read_offset(path):
+        try:
+                with offset_path(path).open() as fh:
+                        return json.load(fh)["row"]
+        except (OSError, ValueError, KeyError):
+                return 0
+
+
+def save_offset(path, row_num):
+        # events.csv.offset.tmp, not events.csv.tmp, which utils uses when rewriting the CSV itself
+        tmp = offset_path(path).with_name(offset_path(path).name + ".tmp")
+        with tmp.open("w") as fh:
+                json.dump({"row": row_num}, fh)
+        os.replace(tmp, offset_path(path))
+
+
+def commit_chunk(chunk, stats, stop_on_error=False):
+        """
+        Insert a chunk of (row_num, model) pairs and commit it.
+
+        The chunk goes in through bulk_save_objects, as executemany INSERTs without
+        per-object unit-of-work bookkeeping, inside a savepoint. If that fails, the
+        savepoint is rolled back and the rows are retried one savepoint each, so a
+        bad row is reported on its own and the rest of the chunk is still committed.
+        Returns False if stop_on_error was hit, in which case nothing is committed.
+        """
+        added = 0
+        try:
+                with db.session.begin_nested():
+                        db.session.bulk_save_objects([model for _, model in chunk])
+                added = len(chunk)
+        except Exception:
+                for row_num, model in chunk:
+                        try:
+                                with db.session.begin_nested():
+                                        db.session.bulk_save_objects([model])
+                                added += 1
+                        except Exception as e:
+                                stats.errors += 1
+                                print(f"[ROW {row_num}] Failed to add row: {e}", file=sys.stderr)
+                                if stop_on_error:
+                                        # drop the whole chunk so the saved offset still marks what's committed
+                                        db.session.rollback()
+                                        return False
+        db.session.commit()
+        stats.added += added
+        return True
+
+
+def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False, commit_every=None, resume=False):
         ctx = push_app_context()
 
         # instantiate schema
         schema = EventSchema()
 
-        added = 0
-        errors = 0
-        skipped = 0
+        stats = ImportStats()
+        chunk = []
 
         path = Path(path)
         if not path.exists():
                 print(f"CSV file not found: {path}", file=sys.stderr)
                 sys.exit(2)
 
+        # with commit_every, rows up to the last committed chunk are skipped on resume
+        start_after = read_offset(path) if resume and commit_every else 0
+        if start_after:
+                print(f"Resuming after row {start_after}")
+
         with path.open(newline="", encoding="utf-8-sig") as fh:
                 reader = csv.DictReader(fh)
                 for row_num, row in enumerate(reader, start=1):
+                        if row_num <= start_after:
+                                continue
                         # Skip empty rows
                         if not any((v or "").strip() for v in row.values()):
-                                skipped += 1
+                                stats.skipped += 1
                                 continue
 
                         try:
                                 obj_data = schema.load(row)
                         except ValidationError as ve:
-                                errors += 1
+                                stats.errors += 1
                                 print(f"[ROW {row_num}] Validation errors: {ve.messages}", file=sys.stderr)
                                 if stop_on_error:
                                         break
@@ -110,16 +191,26 @@ def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False):
                                         # fallback: try to pass dict-like
                                         model_instance = Event(**dict(obj_data))
 
+                                if commit_every and not dry_run:
+                                        chunk.append((row_num, model_instance))
+                                        if len(chunk) >= commit_every:
+                                                if not commit_chunk(chunk, stats, stop_on_error):
+                                                        break
+                                                save_offset(path, row_num)
+                                                chunk = []
+                                                print(f"[ROW {row_num}] Committed. {stats}")
+                                        continue
+
                                 if not dry_run:
                                         db.session.add(model_instance)
                                         if commit_each:
                                                 db.session.commit()
 
-                                added += 1
+                                stats.added += 1
                                 print(f"[ROW {row_num}] Added: {getattr(model_instance, 'id', '<unsaved>')}")
 
                         except Exception as e:
-                                errors += 1
+                                stats.errors += 1
                                 # Rollback to keep session clean if something went wrong during add/commit
                                 try:
                                         db.session.rollback()
@@ -128,8 +219,14 @@ def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False):
                                 print(f"[ROW {row_num}] Failed to add row: {e}", file=sys.stderr)
                                 if stop_on_error:
                                         break
-
-        if not dry_run and not commit_each:
+                else:
+                        if chunk and commit_chunk(chunk, stats, stop_on_error):
+                                chunk = []
+                        if commit_every and not dry_run and not chunk:
+                                # the whole file is in; a rerun should start from the top
+                                offset_path(path).unlink(missing_ok=True)
+
+        if not dry_run and not commit_each and not commit_every:
                 try:
                         db.session.commit()
                 except Exception as e:
@@ -140,7 +237,7 @@ def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False):
                                 pass
                         sys.exit(3)
 
-        print(f"Done. Added: {added}, Skipped(empty): {skipped}, Errors: {errors}")
+        print(f"Done. {stats}")
 
         if ctx is not None:
                 # pop context if possible (only works if we kept a ref; we used push above without storing ctx variable)
@@ -151,18 +248,23 @@ def process_csv(path, dry_run=False, stop_on_error=False, commit_each=False):
 
 
 def main():
+        parser = argparse.ArgumentParser(description="Import events from a CSV.")
         # filepath: Path to CSV file to import
-        # dryrun: "Validate only, do not insert into DB")
-        # stoponerror: "Stop the import on first validation/DB error")
-        # commiteach: Commit the DB transaction after each row (slower)")
-
-        filepath = "C:/Users/Maggi/Downloads/testdata.txt"
-        dryrun = False
-        stoponerror = False 
-        commiteach = False
-
-        # process_csv(filepath, dry_run=dryrun, stop_on_error=stoponerror, commit_each=commiteach)
-        read_rows_from_csv(filepath)
+        parser.add_argument("path", nargs="?", default="C:/Users/Maggi/Downloads/testdata.txt")
+        parser.add_argument("--db", action="store_true", help="Insert into the database with process_csv instead of the CSV catalog")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, do not insert into DB")
+        parser.add_argument("--stop-on-error", action="store_true", help="Stop the import on first validation/DB error")
+        parser.add_argument("--commit-each", action="store_true", help="Commit the DB transaction after each row (slower)")
+        parser.add_argument("--commit-every", type=int, metavar="N",
+                            help="Bulk insert and commit every N rows; a failing row only loses itself")
+        parser.add_argument("--resume", action="store_true", help="With --commit-every, continue after the last committed row")
+        args = parser.parse_args()
+
+        if args.db:
+                process_csv(args.path, dry_run=args.dry_run, stop_on_error=args.stop_on_error,
+                            commit_each=args.commit_each, commit_every=args.commit_every, resume=args.resume)
+        else:
+                read_rows_from_csv(args.path)
 
 
 if __name__ == "__main__":
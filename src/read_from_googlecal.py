@@ -1,3 +1,5 @@
+import argparse
+import asyncio
 import datetime
 import os.path
 import hashlib
@@ -10,7 +12,10 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from data_objects import Event
-from migrate_supabase import  handle_event_entry, check_if_event_exists
+from blacklist import Blacklist
+from migrate_supabase import  handle_event_entry, check_if_event_exists, EntityResolver, EventUpdater
+from resolution_rules import ResolutionRules, UnresolvedEntity, read_review_queue
+from sync_state import SyncState
 
 
 # app = Flask(__name__)
@@ -18,10 +23,14 @@ from migrate_supabase import  handle_event_entry, check_if_event_exists
 SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
 TOKEN_PATH = os.path.join(os.path.dirname(__file__), "json", "token.json")
 CRED_PATH = os.path.join(os.path.dirname(__file__), "json", "credentials.json")
-# read blacklisted events from blacklistedevents.txt
-with open(os.path.join(os.path.dirname(__file__), "..", "dance_dispatch", "data", "csv_files", "blacklisted_events.txt"), "r") as f:
-    BLACKLISTED_EVENTS = f.read().splitlines()
+# blacklisted events from blacklisted_events.txt, recompiled whenever the file changes
+BLACKLIST = Blacklist(os.path.join(os.path.dirname(__file__), "..", "dance_dispatch", "data", "csv_files", "blacklisted_events.txt"))
+# where the sync token used to be kept; read once to seed SYNC_STATE
+SYNC_TOKEN_PATH = os.path.join(os.path.dirname(__file__), "nextSyncToken")
+RULES_PATH = os.path.join(os.path.dirname(__file__), "resolution_rules.json")
 CALENDAR_ID = '0613c0971c5fa6576dbd6087615eb0ee1cd875e1c0e427a6f36f4ef1d6bc2a37@group.calendar.google.com'
+# sync token, resume cursor and per-event etags, in instance/sync_state.db
+SYNC_STATE = SyncState(CALENDAR_ID)
 
 
 def load_credentials():
@@ -61,50 +70,112 @@ def get_calendar_service():
     return service
 
 
-def get_synced_events(synctoken = None):
-    global CALENDAR_ID
+def read_sync_token():
+    SYNC_STATE.import_token_file(SYNC_TOKEN_PATH)
+    return SYNC_STATE.sync_token
+
+
+def save_sync_token(token):
+    SYNC_STATE.save_sync_token(token)
+
+
+async def iter_synced_event_pages(synctoken=None, service=None, state=None):
+    """
+    Async generator yielding each page of calendar events as a list.
+
+    The next page is requested in a worker thread while the caller processes the
+    current one. Once the caller is done with a page the next page token is saved
+    to `state` (SYNC_STATE by default), so an interrupted sync resumes at the page
+    it stopped on. nextSyncToken is only saved after the last page, so a failure or
+    early exit leaves the previous token in place.
+    """
+    if service is None:
+        service = await asyncio.to_thread(get_calendar_service)
+    if state is None:
+        state = SYNC_STATE
+
+    def fetch(page_token):
+        if synctoken:
+            return service.events().list(
+                calendarId=CALENDAR_ID,
+                pageToken=page_token,
+                syncToken=synctoken,
+            ).execute()
+        # no sync token: full fetch of every event
+        return service.events().list(
+            calendarId=CALENDAR_ID,
+            pageToken=page_token,
+        ).execute()
+
+    resume_from = state.page_cursor(synctoken)
+    try:
+        events_result = await asyncio.to_thread(fetch, resume_from)
+    except HttpError as error:
+        if error.resp.status == 410 and synctoken:
+            # the sync token expired: Google requires a full sync; already-seen
+            # events are skipped by their etag, so this mostly costs the listing
+            print("Sync token expired; running a full sync.")
+            state.save_sync_token(None)
+            synctoken = None
+        elif resume_from is None:
+            raise
+        else:
+            print("Saved page token no longer valid; restarting this sync from the first page.")
+        state.save_page_cursor(synctoken, None)
+        events_result = await asyncio.to_thread(fetch, None)
+
+    loop = asyncio.get_running_loop()
+    pending = None
     try:
-        service = get_calendar_service()
-        page_token = None
         while True:
-            if synctoken is None or synctoken == "":
-                # now = get_max_date_for_events()
-                # print("No sync token found, fetching all events.")
-                synctoken = None
-                events_result = service.events().list(
-                    calendarId=CALENDAR_ID,
-                    pageToken=page_token,
-                ).execute()
-                print(events_result)
-            else:
-                # now = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
-                # end = (datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(days=90)).isoformat()
-                events_result = service.events().list(
-                    calendarId=CALENDAR_ID,
-                    pageToken=page_token,
-                    # timeMin=now,   
-                    # timeMax=end,
-                    # singleEvents=True,
-                    syncToken=synctoken
-                ).execute()
-            if 'nextSyncToken' in events_result:
-                with open('src/nextSyncToken', 'w') as file:
-                    file.write(events_result['nextSyncToken'])
-            events = events_result.get('items', [])
             page_token = events_result.get('nextPageToken')
+            if page_token:
+                # handed to a worker thread right away, so the download overlaps the
+                # caller's processing even if it doesn't await until the next page
+                pending = loop.run_in_executor(None, fetch, page_token)
+            yield events_result.get('items', [])
             if not page_token:
                 break
-        return events
+            state.save_page_cursor(synctoken, page_token)
+            events_result = await pending
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+    if 'nextSyncToken' in events_result:
+        state.save_sync_token(events_result['nextSyncToken'])
+
+
+def get_synced_events(synctoken = None):
+    """Fetch every page of events (not just the last one) and return them as one list."""
+    async def collect():
+        return [event async for page in iter_synced_event_pages(synctoken) for event in page]
+
+    try:
+        return asyncio.run(collect())
     except HttpError as error:
-        print(f"An error occurred: {error}")    
+        print(f"An error occurred: {error}")
+        return []
 
-def process_event(event):
+def split_location(event):
+    """Split a calendar location "Venue, address" into (venue_name, venue_address)."""
     try:
         venue_name, venue_address = event['location'].split(", ", 1)
     except ValueError:
         venue_name, venue_address = None, event.get('location', None)
     except KeyError:
         venue_name, venue_address = None, None
+    return venue_name, venue_address
+
+
+def process_event(event, rules=None, resolver=None, updater=None):
+    """
+    Add a calendar event; returns "done", "skipped" or "review" (queued in batch mode).
+
+    With an `updater`, an event that was already added is refreshed from the
+    calendar instead, without the edit prompt.
+    """
+    venue_name, venue_address = split_location(event)
     start = datetime.datetime.fromisoformat(event["start"].get("dateTime", event["start"].get("date")))
     end = datetime.datetime.fromisoformat(event["end"].get("dateTime", event["end"].get("date")))
     # split hosts from title
@@ -123,6 +194,18 @@ def process_event(event):
         price=None,
         external_links=None,
     )
+    if rules is not None:
+        e.hosts = rules.hosts_from_title(e.title)
+    if rules is not None or (updater is not None and check_if_event_exists(e)):
+        # batch mode or an update: no edit prompt; in batch mode anything
+        # unresolvable goes to the review queue (UnresolvedEntity needs rules)
+        try:
+            handle_event_entry(e, rules, resolver, updater)
+        except UnresolvedEntity as exc:
+            print(f"Queued for review: {e.title} ({exc})")
+            rules.queue_for_review(event, str(exc))
+            return "review"
+        return "done"
     editing = True
     while editing:
         print(f"Current event data:\n{e}")
@@ -130,34 +213,86 @@ def process_event(event):
         if edit_field == "done":
             editing = False
             # double checks that the venue and hosts are valid, then adds to CSV
-            handle_event_entry(e)
+            handle_event_entry(e, resolver=resolver)
         elif edit_field == "cancel":
             print("Event entry cancelled.")
-            return
+            return "skipped"
         elif edit_field == "skip":
             print("Event entry skipped.")
-            editing = False
-            continue
+            return "skipped"
         elif hasattr(e, edit_field):
             new_value = input(f"Enter new value for {edit_field}: ").strip()
             setattr(e, edit_field, new_value)
         else:
             print(f"Field '{edit_field}' not found in Event.")
+    return "done"
+
+
+async def sync_events(sync_token=None, rules=None, state=None):
+    """
+    Process events page by page as they arrive instead of after pagination finishes.
+
+    Each event's outcome is recorded in `state` (SYNC_STATE by default) with its
+    etag, so a restarted or repeated sync skips versions it already handled.
+    """
+    if state is None:
+        state = SYNC_STATE
+    found = 0
+    # one resolver for the whole sync so repeated venues/hosts are only looked up once;
+    # events that were already added are refreshed through the updater
+    with EntityResolver() as resolver, EventUpdater() as updater:
+        try:
+            async for page in iter_synced_event_pages(sync_token, state=state):
+                found += len(page)
+                pending = []
+                for event in page:
+                    if state.is_processed(event):
+                        continue
+                    rule = BLACKLIST.match(event)
+                    if rule is not None:
+                        print(f"Skipping blacklisted event: {event.get('summary')} ({rule})")
+                        state.record(event, "skipped")
+                        continue
+                    pending.append(event)
+                # look up every venue on the page in one query before handling events one by one
+                resolver.prefetch_venues(
+                    [Event(location=name, address=address) for name, address in map(split_location, pending)], rules
+                )
+                outcomes = []
+                for event in pending:
+                    try:
+                        outcomes.append((event, process_event(event, rules, resolver, updater)))
+                    except Exception:
+                        state.record(event, "failed")
+                        raise
+                # write the page's updates before marking its events as handled
+                updater.flush()
+                for event, status in outcomes:
+                    state.record(event, status)
+        except HttpError as error:
+            print(f"An error occurred: {error}")
+    print(f"Found {found} events from sync.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync events from the Dance Dispatch Google Calendar.")
+    parser.add_argument("--batch", action="store_true",
+                        help="never prompt; resolve venues and hosts with the rules file")
+    parser.add_argument("--rules", default=RULES_PATH,
+                        help="resolution rules JSON used by --batch")
+    parser.add_argument("--review", metavar="QUEUE",
+                        help="interactively process the events in a review queue file")
+    args = parser.parse_args(argv)
 
+    if args.review:
+        for reason, event in read_review_queue(args.review):
+            print(f"Reviewing {event.get('summary')} ({reason})")
+            process_event(event)
+        print(f"Finished {args.review}; delete or truncate it once reviewed.")
+        return
 
-def main():
-    sync_token = None
-    with open('src/nextSyncToken', 'r') as file:
-        sync_token = file.read().strip()
-    events = get_synced_events(sync_token)
-    print(f"Found {len(events)} events from sync.")
-    # Prints the start and name of the next 10 events
-    for event in events:
-        if (check_if_event_exists(Event(id=event["id"]))):
-            continue
-        if (any(blacklisted_word in event.get('summary', '').lower() for blacklisted_word in BLACKLISTED_EVENTS)):
-            continue
-        process_event(event)
+    rules = ResolutionRules.from_file(args.rules) if args.batch else None
+    asyncio.run(sync_events(read_sync_token(), rules))
 
 if __name__ == "__main__":
     global CHANNEL_ID
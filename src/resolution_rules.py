@@ -0,0 +1,108 @@
+# rules for resolving venues and hosts without prompting, used by the --batch ingest
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+POLICIES = ("create", "skip", "review")
+
+
+def _key(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+class UnresolvedEntity(Exception):
+    """Raised in batch mode when a venue or host has to go to the review queue."""
+
+    def __init__(self, kind: str, name, detail: str = ""):
+        self.kind = kind
+        self.name = name
+        super().__init__(f"Unresolved {kind} '{name}'{': ' + detail if detail else ''}")
+
+
+@dataclass
+class ResolutionRules:
+    """
+    What to do with venues/hosts that don't match an existing row.
+
+    Aliases map alternative spellings to the canonical name before lookup.
+    unknown_venue / unknown_host are one of "create", "skip" or "review";
+    "review" raises UnresolvedEntity so the caller can queue the whole event.
+    host_pattern is a regex run against the event title whose "hosts" group
+    (or first group) is a comma-separated list of host names.
+    fuzzy_accept is the match score (0-1) above which a near miss like
+    "Brickhouse" for "Brickhouse NYC" is accepted; unset, near misses are
+    handled like any other unknown venue or host.
+    """
+    venue_aliases: dict[str, str] = field(default_factory=dict)
+    host_aliases: dict[str, str] = field(default_factory=dict)
+    unknown_venue: str = "review"
+    unknown_host: str = "review"
+    host_pattern: Optional[str] = None
+    review_queue: Optional[Path] = None
+    fuzzy_accept: Optional[float] = None
+
+    def __post_init__(self):
+        for policy in (self.unknown_venue, self.unknown_host):
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES}")
+        if self.fuzzy_accept is not None and not 0 <= self.fuzzy_accept <= 1:
+            raise ValueError(f"fuzzy_accept must be between 0 and 1, got {self.fuzzy_accept}")
+        self.venue_aliases = {_key(alias): name for alias, name in self.venue_aliases.items()}
+        self.host_aliases = {_key(alias): name for alias, name in self.host_aliases.items()}
+        self._host_regex = re.compile(self.host_pattern) if self.host_pattern else None
+
+    @classmethod
+    def from_file(cls, path) -> "ResolutionRules":
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        queue = data.get("review_queue")
+        if queue is not None:
+            # relative queue paths live next to the rules file
+            data["review_queue"] = path.parent / queue
+        return cls(**data)
+
+    def venue_name(self, name):
+        return self.venue_aliases.get(_key(name), name)
+
+    def host_name(self, name):
+        return self.host_aliases.get(_key(name), name)
+
+    def hosts_from_title(self, title) -> Optional[str]:
+        """Pull a comma-separated host list out of an event title, or None."""
+        if self._host_regex is None or not title:
+            return None
+        match = self._host_regex.search(title)
+        if match is None:
+            return None
+        hosts = match.group("hosts") if "hosts" in self._host_regex.groupindex else match.group(1)
+        return hosts.strip() or None
+
+    def unresolved(self, kind: str, name, detail: str = "") -> bool:
+        """Apply the policy for an unknown venue/host: True to create it, False to skip.
+
+        Raises UnresolvedEntity when the policy is "review".
+        """
+        policy = self.unknown_venue if kind == "venue" else self.unknown_host
+        if policy == "review":
+            raise UnresolvedEntity(kind, name, detail)
+        return policy == "create"
+
+    def queue_for_review(self, event: dict[str, Any], reason: str):
+        """Append a raw calendar event to the review queue (JSON lines)."""
+        if self.review_queue is None:
+            print(f"No review queue configured; dropping event {event.get('id')}: {reason}")
+            return
+        with open(self.review_queue, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"reason": reason, "event": event}, default=str) + "\n")
+
+
+def read_review_queue(path):
+    """Yield (reason, event) pairs from a review queue file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["reason"], entry["event"]
@@ -0,0 +1,211 @@
+# column types for the CSVs in csv_files, and a loader that applies them in one
+# vectorized pass per column instead of leaving pandas to guess
+#
+#   string     text, blanks are ""                 int       nullable Int64
+#   float      float64, blanks are NaN             category  pandas categorical
+#   bool       nullable boolean ("true"/"false")   date      naive datetime64 (a calendar day)
+#   time       "HH:MM:SS" text                     timestamp datetime64 in UTC
+#   list[int] / list[string]   Python lists, parsed from "[3, 4]", "['a']" or "[np.int64(3)]"
+#
+# event dates stay naive: they're local calendar days, not instants
+import ast
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+import pandas as pd
+
+SCHEMAS = {
+    "events": {
+        "ID": "string", "Title": "string", "StartDate": "date", "StartTime": "time",
+        "EndDate": "date", "EndTime": "time", "Location": "int", "Description": "string",
+        "Price": "float", "PhotoURL": "string", "ExternalURLs": "list[string]",
+        "Hosts": "list[int]", "Tags": "list[string]",
+    },
+    "venues": {"ID": "int", "Name": "string", "Address": "string", "Bio": "string", "Type": "category"},
+    "hosts": {
+        "ID": "int", "Name": "string", "Bio": "string", "Tags": "list[string]",
+        "ExternalLinks": "string", "PhotoURLs": "string",
+    },
+    "tags": {"ID": "int", "Name": "string", "Category": "category"},
+    "reviews": {
+        "UserID": "string", "EventID": "string", "EntityType": "category", "EntityID": "string",
+        "Rating": "int", "Comment": "string", "PrivacyLevel": "category", "SubmitDate": "timestamp",
+    },
+    "user_saved_events": {"ID": "string", "UserID": "string", "EventID": "string", "Saved": "bool"},
+    "user_saved_hosts": {"ID": "string", "UserID": "string", "HostID": "int", "Saved": "bool"},
+    "user_saved_venues": {"ID": "string", "UserID": "string", "VenueID": "int", "Saved": "bool"},
+}
+
+# numpy scalars repr'd into older CSV rows, e.g. "[np.int64(3)]"
+NUMPY_SCALAR = re.compile(r"np\.\w+\(([^()]*)\)")
+_TIME = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?$")
+
+
+def parse_list(value) -> list:
+    """Parse one list cell such as "[np.int64(3)]", "['a', 'b']" or "[]" into a list."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if value is None or (isinstance(value, float) and value != value):
+        return []
+    text = NUMPY_SCALAR.sub(r"\1", str(value).strip())
+    if not text:
+        return []
+    try:
+        parsed = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        # a bare comma-separated list
+        return [part.strip() for part in text.strip("[]").split(",") if part.strip()]
+    return list(parsed) if isinstance(parsed, (list, tuple)) else [parsed]
+
+
+_INT_LIST = r"\[\s*(-?\d+(\.0*)?\s*(,\s*-?\d+(\.0*)?\s*)*)?\]"
+_STRING_LIST = r"\[\s*('[^'\\]*'\s*(,\s*'[^'\\]*'\s*)*)?\]"
+
+
+def parse_list_column(values: pd.Series, kind: str) -> pd.Series:
+    """
+    Parse a whole column of list cells with vectorized regexes instead of literal_eval per row.
+
+    Cells in some other form (already a list, blank, a bare "a, b") go through parse_list.
+    """
+    is_text = values.map(lambda value: isinstance(value, str)).astype(bool)
+    text = values.where(is_text, "").astype(str).str.replace(NUMPY_SCALAR, r"\1", regex=True).str.strip()
+    if kind == "list[int]":
+        simple = is_text & text.str.fullmatch(_INT_LIST).astype(bool)
+        parsed = text.str.findall(r"-?\d+(?:\.0*)?").astype(object)
+    else:
+        simple = is_text & text.str.fullmatch(_STRING_LIST).astype(bool)
+        parsed = text.str.findall(r"'([^'\\]*)'").astype(object)
+    others = ~simple
+    if others.any():
+        parsed[others] = values[others].map(parse_list)
+    if kind == "list[int]":
+        return parsed.map(lambda items: [int(float(item)) for item in items])
+    return parsed.map(lambda items: [str(item) for item in items])
+
+
+def _blank_to_na(values: pd.Series) -> pd.Series:
+    values = values.astype(object)
+    return values.where(values.map(lambda value: not (isinstance(value, str) and value.strip() == "")), None)
+
+
+def apply_column(values: pd.Series, kind: str) -> pd.Series:
+    """Convert one column (strings, or values already of the right kind) to its schema type."""
+    if kind.startswith("list["):
+        return parse_list_column(values, kind)
+    if kind == "string":
+        return values.astype(object).where(values.notna(), "").astype(str)
+    if kind == "int":
+        return pd.to_numeric(_blank_to_na(values), errors="coerce").round().astype("Int64")
+    if kind == "float":
+        return pd.to_numeric(_blank_to_na(values), errors="coerce").astype("float64")
+    if kind == "category":
+        return _blank_to_na(values).astype("category")
+    if kind == "bool":
+        lowered = values.astype(object).map(lambda value: str(value).strip().lower() if pd.notna(value) else None)
+        return lowered.map({"true": True, "false": False, "1": True, "0": False}).astype("boolean")
+    if kind == "date":
+        return pd.to_datetime(_blank_to_na(values), errors="coerce").dt.normalize()
+    if kind == "timestamp":
+        return pd.to_datetime(_blank_to_na(values), errors="coerce", utc=True)
+    if kind == "time":
+        return values.astype(object).where(values.notna(), "").astype(str).str.strip()
+    raise ValueError(f"Unknown column type '{kind}'")
+
+
+def apply_schema(frame: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Return `frame` with every column in the table's schema converted; other columns are left alone."""
+    types = SCHEMAS.get(table, {})
+    frame = frame.copy()
+    for column in frame.columns:
+        if column in types:
+            frame[column] = apply_column(frame[column], types[column])
+    return frame
+
+
+@dataclass
+class ValidationReport:
+    """Problems found while loading a CSV: cells that didn't convert, missing columns, duplicate IDs."""
+    table: str
+    rows: int = 0
+    problems: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def __str__(self):
+        if self.ok:
+            return f"{self.table}: {self.rows} rows OK"
+        return f"{self.table}: {self.rows} rows, {len(self.problems)} problem(s)\n" + \
+            "\n".join(f"  {problem}" for problem in self.problems)
+
+
+def _failed_cells(raw: pd.Series, typed: pd.Series, kind: str) -> pd.Series:
+    blank = raw.fillna("").astype(str).str.strip() == ""
+    if kind == "time":
+        return ~blank & ~raw.fillna("").astype(str).str.strip().str.match(_TIME)
+    if kind in ("int", "float", "date", "timestamp", "bool"):
+        return ~blank & typed.isna()
+    return pd.Series(False, index=raw.index)
+
+
+def read_table(path, table: str) -> tuple[pd.DataFrame, ValidationReport]:
+    """Load a CSV with its schema's types, returning the frame and a validation report."""
+    raw = pd.read_csv(Path(path), dtype=str, keep_default_na=False, skipinitialspace=True)
+    raw.columns = [column.strip() for column in raw.columns]
+    frame = apply_schema(raw, table)
+    report = ValidationReport(table, len(frame))
+    types = SCHEMAS.get(table, {})
+    missing = [column for column in types if column not in frame.columns]
+    if missing:
+        report.problems.append(f"missing columns: {', '.join(missing)}")
+    for column, kind in types.items():
+        if column not in frame.columns:
+            continue
+        failed = _failed_cells(raw[column], frame[column], kind)
+        for index in failed[failed].index[:5]:
+            report.problems.append(f"row {index + 2}, {column}: can't read {raw.at[index, column]!r} as {kind}")
+        if failed.sum() > 5:
+            report.problems.append(f"{column}: {failed.sum() - 5} more unreadable {kind} value(s)")
+    if "ID" in frame.columns:
+        ids = frame["ID"][frame["ID"].notna() & (frame["ID"].astype(str) != "")]
+        duplicated = ids[ids.duplicated()].unique()
+        if len(duplicated):
+            report.problems.append(f"duplicate IDs: {', '.join(map(str, duplicated[:5]))}")
+    return frame, report
+
+
+def _format_cell(value, fmt: str) -> str:
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value):
+        return ""
+    if isinstance(value, str) and value.strip() == "":
+        return ""
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return str(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC")
+    return timestamp.strftime(fmt)
+
+
+def format_column(values: pd.Series, kind: str | None) -> pd.Series:
+    """Turn a typed column back into the text the CSVs are written with."""
+    if kind is None:
+        return values
+    if kind.startswith("list["):
+        return values.map(lambda items: str([item.item() if hasattr(item, "item") else item for item in parse_list(items)]))
+    if kind == "date":
+        return values.map(lambda value: _format_cell(value, "%Y-%m-%d"))
+    if kind == "timestamp":
+        return values.map(lambda value: _format_cell(value, "%Y-%m-%dT%H:%M:%SZ"))
+    if kind == "bool":
+        return values.map(lambda value: "" if pd.isna(value) else str(bool(value)).lower())
+    return values
+
+
+def format_frame(frame: pd.DataFrame, table: str) -> pd.DataFrame:
+    """A copy of `frame` with typed columns formatted for writing back to the table's CSV."""
+    types = SCHEMAS.get(table, {})
+    return pd.DataFrame({column: format_column(frame[column], types.get(column)) for column in frame.columns})
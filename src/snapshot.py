@@ -0,0 +1,138 @@
+# typed Arrow snapshots of the CSVs in csv_files, so readers get real list,
+# date and number columns instead of re-parsing strings like "[np.int64(3)]"
+#
+# a snapshot <table>.arrow is written next to <table>.csv the first time the
+# table is read and rewritten whenever the CSV changes; pyarrow is optional,
+# without it every read parses the CSV into the same typed records
+import datetime
+import os
+from pathlib import Path
+import pandas as pd
+from catalog import DEFAULT_DATA_DIR
+from schema import SCHEMAS, read_table
+from utils import recover
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+
+def _none_if_na(value):
+    return None if value is None or value is pd.NA or value is pd.NaT or value != value else value
+
+
+# turns one column of a schema.read_table frame into plain Python values, by column type
+_TO_PYTHON = {
+    "string": lambda values: values.tolist(),
+    "category": lambda values: values.astype(object).where(values.notna(), "").tolist(),
+    "int": lambda values: [None if value is pd.NA else int(value) for value in values],
+    "float": lambda values: [_none_if_na(value) for value in values.tolist()],
+    "bool": lambda values: [None if value is pd.NA else bool(value) for value in values],
+    "date": lambda values: [None if value is pd.NaT else value.date() for value in values],
+    "time": lambda values: [_to_time(text) for text in values],
+    "timestamp": lambda values: [None if value is pd.NaT else value.to_pydatetime() for value in values],
+    "list[int]": lambda values: values.tolist(),
+    "list[string]": lambda values: values.tolist(),
+}
+
+
+def _to_time(text):
+    try:
+        return datetime.time.fromisoformat(text) if text else None
+    except ValueError:
+        return None
+
+
+def csv_path(table: str, data_dir=None) -> Path:
+    return Path(data_dir if data_dir is not None else DEFAULT_DATA_DIR) / f"{table}.csv"
+
+
+def snapshot_path(table: str, data_dir=None) -> Path:
+    return csv_path(table, data_dir).with_suffix(".arrow")
+
+
+def parse_csv(table: str, data_dir=None) -> dict[str, list]:
+    """
+    Read a CSV into typed columns: {column: [values]}, blanks as None (or "" for strings).
+
+    The CSV is loaded with schema.read_table; cells it can't convert are printed
+    with the rest of its validation report and come back as None.
+    """
+    frame, report = read_table(csv_path(table, data_dir), table)
+    if not report.ok:
+        print(report)
+    types = SCHEMAS.get(table, {})
+    return {column: _TO_PYTHON[types.get(column, "string")](frame[column]) for column in frame.columns}
+
+
+def _arrow_type(name: str):
+    return {
+        "string": pa.string(), "category": pa.string(), "int": pa.int64(), "float": pa.float64(),
+        "bool": pa.bool_(), "date": pa.date32(), "time": pa.time64("us"), "timestamp": pa.timestamp("us", tz="UTC"),
+        "list[int]": pa.list_(pa.int64()), "list[string]": pa.list_(pa.string()),
+    }[name]
+
+
+def _source_stamp(table: str, data_dir) -> dict[bytes, bytes]:
+    stat = os.stat(csv_path(table, data_dir))
+    return {b"source_mtime_ns": str(stat.st_mtime_ns).encode(), b"source_size": str(stat.st_size).encode()}
+
+
+def build_table(table: str, data_dir=None):
+    """Parse a CSV into an Arrow table typed by its schema, stamped with the CSV's mtime and size."""
+    columns = parse_csv(table, data_dir)
+    types = SCHEMAS.get(table, {})
+    schema = pa.schema([pa.field(column, _arrow_type(types.get(column, "string"))) for column in columns],
+                       metadata=_source_stamp(table, data_dir))
+    return pa.table(columns, schema=schema)
+
+
+def write_snapshot(table: str, data_dir=None):
+    """(Re)write <table>.arrow from <table>.csv and return the Arrow table."""
+    if pa is None:
+        raise ImportError("pyarrow is required for snapshots (pip install pyarrow)")
+    arrow_table = build_table(table, data_dir)
+    path = snapshot_path(table, data_dir)
+    temp_path = path.with_suffix(".arrow.tmp")
+    # uncompressed Arrow IPC so a later load can memory-map it without decoding
+    with pa.OSFile(str(temp_path), "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    os.replace(temp_path, path)
+    return arrow_table
+
+
+def load_snapshot(table: str, data_dir=None):
+    """Memory-map <table>.arrow, or None if pyarrow is missing or the snapshot is missing/stale."""
+    path = snapshot_path(table, data_dir)
+    if pa is None or not path.exists():
+        return None
+    arrow_table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    if (arrow_table.schema.metadata or {}) != _source_stamp(table, data_dir):
+        return None
+    return arrow_table
+
+
+def read_arrow_table(table: str, data_dir=None):
+    """Typed Arrow table for a CSV, from its snapshot when it's current."""
+    # a journaled write that didn't reach the CSV would otherwise look current
+    recover(csv_path(table, data_dir))
+    arrow_table = load_snapshot(table, data_dir)
+    if arrow_table is not None:
+        return arrow_table
+    try:
+        write_snapshot(table, data_dir)
+    except OSError as e:
+        print(f"Couldn't write snapshot for {table}: {e}")
+        return build_table(table, data_dir)
+    return load_snapshot(table, data_dir)
+
+
+def read_records(table: str, data_dir=None) -> list[dict]:
+    """Rows of a CSV as dicts of typed values (int, float, date, time, list), via the snapshot if possible."""
+    if pa is not None:
+        return read_arrow_table(table, data_dir).to_pylist()
+    recover(csv_path(table, data_dir))
+    columns = parse_csv(table, data_dir)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
@@ -0,0 +1,367 @@
+# the catalog kept in a SQLite file instead of CSVs loaded into dataframes,
+# behind the same methods data_pipeline calls (see catalog.CatalogBackend)
+#
+# lookups go through indexes on ID, name, address and StartDate, and the file
+# is in WAL mode so other processes can keep reading while an ingest writes;
+# the CSVs can be imported into it and exported from it on demand:
+#
+#   python sqlite_catalog.py import|export [csv_dir] [db_path]
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+from catalog import DEFAULT_DATA_DIR, TABLES, _cell, _csv_cells, _same_value, normalize_key, normalize_keys
+from event_diff import content_hash
+from fuzzy_match import FuzzyIndex
+from schema import apply_schema, format_frame, read_table
+from utils import drop_index, file_lock, recover
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "instance" / "catalog.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS venues (
+    ID INTEGER PRIMARY KEY, Name TEXT, Address TEXT, Bio TEXT, Type TEXT,
+    name_key TEXT, address_key TEXT
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    ID INTEGER PRIMARY KEY, Name TEXT, Bio TEXT, Tags TEXT, ExternalLinks TEXT, PhotoURLs TEXT,
+    name_key TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    ID TEXT PRIMARY KEY, Title TEXT, StartDate TEXT, StartTime TEXT, EndDate TEXT, EndTime TEXT,
+    Location INTEGER, Description TEXT, Price REAL, PhotoURL TEXT, ExternalURLs TEXT, Hosts TEXT, Tags TEXT
+);
+CREATE INDEX IF NOT EXISTS venues_name ON venues (name_key);
+CREATE INDEX IF NOT EXISTS venues_address ON venues (address_key);
+CREATE INDEX IF NOT EXISTS hosts_name ON hosts (name_key);
+CREATE INDEX IF NOT EXISTS events_start ON events (StartDate);
+"""
+# normalize_key()'d lookup columns, kept next to a row but not part of it
+KEY_COLUMNS = {"venues": ("name_key", "address_key"), "hosts": ("name_key",), "events": ()}
+# values per IN (...) query, under SQLite's parameter limit
+CHUNK = 500
+
+
+def _quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SqliteCatalog:
+    """
+    Venues, hosts and events in SQLite, with the Catalog's lookup and write methods.
+
+    Values are stored as the text the CSVs hold (blanks as NULL) and come back
+    typed by schema.py, so rows look the same as from the CSV Catalog. Statements
+    use ? parameters so sqlite3 reuses their prepared form. Outside a
+    write_session() every write is committed straight away; inside one they're
+    committed when it ends, or every `flush_every` rows.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else DEFAULT_PATH
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self._buffering = False
+        self._flush_every = None
+        self._pending = 0
+        self._columns: dict[str, list] = {}
+        self._row_hashes: dict[tuple, str] = {}
+        self._fuzzy_venues: FuzzyIndex | None = None
+        self._fuzzy_hosts: FuzzyIndex | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def _query(self, sql, params=()) -> list:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _columns_of(self, table) -> list:
+        if table not in self._columns:
+            info = self._query(f"PRAGMA table_info({table})")
+            self._columns[table] = [row[1] for row in info if row[1] not in KEY_COLUMNS[table]]
+        return self._columns[table]
+
+    def _add_columns(self, table, columns):
+        """Add columns a row brings that the table doesn't have yet, as the CSVs would."""
+        for column in columns:
+            if column not in self._columns_of(table):
+                with self._lock:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)}")
+                self._columns[table].append(column)
+
+    # dataframes, read on access
+
+    def _frame(self, table) -> pd.DataFrame:
+        columns = ", ".join(map(_quote, self._columns_of(table)))
+        with self._lock:
+            frame = pd.read_sql_query(f"SELECT {columns} FROM {table} ORDER BY rowid", self.conn)
+        return apply_schema(frame, table)
+
+    @property
+    def venues(self) -> pd.DataFrame:
+        return self._frame("venues")
+
+    @property
+    def hosts(self) -> pd.DataFrame:
+        return self._frame("hosts")
+
+    @property
+    def events(self) -> pd.DataFrame:
+        return self._frame("events")
+
+    def event_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM events")[0][0]
+
+    # lookups
+
+    def _find(self, table, column, key):
+        if not key:
+            return None
+        return self._query(f"SELECT MIN(ID) FROM {table} WHERE {column} = ?", (key,))[0][0]
+
+    def find_venue(self, name, address):
+        """Return the ID of a venue matching name or address, or None."""
+        vid = self._find("venues", "name_key", normalize_key(name))
+        if vid is None:
+            vid = self._find("venues", "address_key", normalize_key(address))
+        return vid
+
+    def find_host(self, name):
+        return self._find("hosts", "name_key", normalize_key(name))
+
+    def _find_many(self, table, column, keys) -> dict:
+        """{key: lowest matching ID} for many keys, a chunk of them per query."""
+        keys = [key for key in pd.unique(keys) if key]
+        found = {}
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            found.update(self._query(
+                f"SELECT {column}, MIN(ID) FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))}) "
+                f"GROUP BY {column}", chunk,
+            ))
+        return found
+
+    def match_venues(self, names: pd.Series, addresses: pd.Series) -> pd.Series:
+        """Venue IDs for whole columns of names and addresses (a name match first), NA if neither is known."""
+        name_keys, address_keys = normalize_keys(names), normalize_keys(addresses)
+        ids = name_keys.map(self._find_many("venues", "name_key", name_keys)).astype("Int64")
+        return ids.fillna(address_keys.map(self._find_many("venues", "address_key", address_keys)).astype("Int64"))
+
+    def match_hosts(self, names: pd.Series) -> pd.Series:
+        keys = normalize_keys(names)
+        return keys.map(self._find_many("hosts", "name_key", keys)).astype("Int64")
+
+    def has_event(self, event_id) -> bool:
+        return bool(self._query("SELECT 1 FROM events WHERE ID = ?", (_cell(event_id),)))
+
+    def has_events(self, event_ids: pd.Series) -> pd.Series:
+        ids = event_ids.map(_cell)
+        return ids.isin(set(self._find_many("events", "ID", ids)))
+
+    def max_start_date(self):
+        """The latest StartDate, or None if there are no dated events; read off the StartDate index."""
+        latest = self._query("SELECT MAX(StartDate) FROM events WHERE StartDate <> ''")[0][0]
+        return pd.Timestamp(latest) if latest else None
+
+    @property
+    def fuzzy_venues(self) -> FuzzyIndex:
+        """Trigram index over venue names and addresses, built on first use."""
+        if self._fuzzy_venues is None:
+            rows = self._query("SELECT ID, Name, Address FROM venues ORDER BY ID")
+            self._fuzzy_venues = FuzzyIndex(
+                [*((vid, name) for vid, name, _ in rows), *((vid, address) for vid, _, address in rows)]
+            )
+        return self._fuzzy_venues
+
+    @property
+    def fuzzy_hosts(self) -> FuzzyIndex:
+        if self._fuzzy_hosts is None:
+            self._fuzzy_hosts = FuzzyIndex(self._query("SELECT ID, Name FROM hosts ORDER BY ID"))
+        return self._fuzzy_hosts
+
+    def get_row(self, table, row_id) -> dict | None:
+        columns = self._columns_of(table)
+        rows = self._query(f"SELECT {', '.join(map(_quote, columns))} FROM {table} WHERE ID = ?", (_cell(row_id),))
+        if not rows:
+            return None
+        return apply_schema(pd.DataFrame(rows, columns=columns), table).iloc[0].to_dict()
+
+    def row_hash(self, table, row_id, columns) -> str | None:
+        """Content hash of a stored row over `columns`, cached until the row is updated."""
+        key = (table, row_id, tuple(columns))
+        if key not in self._row_hashes:
+            row = self.get_row(table, row_id)
+            if row is None:
+                return None
+            self._row_hashes[key] = content_hash(row, columns)
+        return self._row_hashes[key]
+
+    def next_venue_id(self):
+        latest = self._query("SELECT MAX(ID) FROM venues")[0][0]
+        return latest + 1 if latest is not None else 0
+
+    def next_host_id(self):
+        latest = self._query("SELECT MAX(ID) FROM hosts")[0][0]
+        return latest + 1 if latest is not None else 0
+
+    # inserts and updates
+
+    def _keys_for(self, table, row: dict) -> list:
+        if table == "venues":
+            return [normalize_key(row.get("Name")), normalize_key(row.get("Address"))]
+        if table == "hosts":
+            return [normalize_key(row.get("Name"))]
+        return []
+
+    def _insert_many(self, table, rows: list[dict]):
+        cells = _csv_cells(rows, table)
+        if not cells:
+            return
+        columns = list(dict.fromkeys(column for row in cells for column in row))
+        self._add_columns(table, columns)
+        names = [*columns, *KEY_COLUMNS[table]]
+        sql = f"INSERT INTO {table} ({', '.join(map(_quote, names))}) VALUES ({', '.join('?' * len(names))})"
+        values = [[row.get(column) or None for column in columns] + self._keys_for(table, row) for row in cells]
+        with self._lock:
+            self.conn.executemany(sql, values)
+        self._pending += len(values)
+        self._after_write()
+
+    def add_venue(self, row: dict):
+        self._insert_many("venues", [row])
+        if self._fuzzy_venues is not None:
+            self._fuzzy_venues.add(row["ID"], row.get("Name"))
+            self._fuzzy_venues.add(row["ID"], row.get("Address"))
+
+    def add_host(self, row: dict):
+        self._insert_many("hosts", [row])
+        if self._fuzzy_hosts is not None:
+            self._fuzzy_hosts.add(row["ID"], row.get("Name"))
+
+    def add_event(self, row: dict):
+        self._insert_many("events", [row])
+
+    def add_events(self, rows: list[dict]):
+        """Insert many events with one executemany (and one commit outside a write_session)."""
+        self._insert_many("events", rows)
+
+    def update_row(self, table, row_id, values: dict) -> bool:
+        """Update columns of an existing row; returns False if nothing actually changed."""
+        current = self.get_row(table, row_id)
+        if current is None:
+            raise KeyError(f"No row with ID {row_id} in {table}")
+        changed = {
+            column: value for column, value in values.items()
+            if column not in current or not _same_value(current[column], value)
+        }
+        if not changed:
+            return False
+        cells = _csv_cells([changed], table)[0]
+        self._add_columns(table, cells)
+        assignments = {column: value or None for column, value in cells.items()}
+        if "Name" in cells or "Address" in cells:
+            assignments.update(zip(KEY_COLUMNS[table], self._keys_for(table, {**current, **changed})))
+        sql = f"UPDATE {table} SET {', '.join(f'{_quote(column)} = ?' for column in assignments)} WHERE ID = ?"
+        with self._lock:
+            self.conn.execute(sql, [*assignments.values(), _cell(row_id)])
+        self._row_hashes = {key: value for key, value in self._row_hashes.items() if key[:2] != (table, row_id)}
+        # a new name/address becomes searchable; the old one stays in the index until reload
+        if table == "venues" and self._fuzzy_venues is not None:
+            for column in ("Name", "Address"):
+                if column in changed:
+                    self._fuzzy_venues.add(current["ID"], changed[column])
+        elif table == "hosts" and self._fuzzy_hosts is not None and "Name" in changed:
+            self._fuzzy_hosts.add(current["ID"], changed["Name"])
+        self._pending += 1
+        self._after_write()
+        return True
+
+    # transactions
+
+    def _after_write(self):
+        if not self._buffering or (self._flush_every and self._pending >= self._flush_every):
+            self.flush()
+
+    def flush(self):
+        """Commit everything written since the last commit."""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.commit()
+        self._pending = 0
+
+    @contextmanager
+    def write_session(self, flush_every: int | None = None):
+        """Hold writes in one transaction committed on exit, or every `flush_every` rows."""
+        previous = (self._buffering, self._flush_every)
+        self._buffering, self._flush_every = True, flush_every
+        try:
+            yield self
+        finally:
+            self._buffering, self._flush_every = previous
+            if not self._buffering:
+                self.flush()
+
+    # CSV import / export
+
+    def import_csv(self, data_dir=None):
+        """Replace the database's venues, hosts and events with the CSVs in `data_dir`."""
+        data_dir = Path(data_dir) if data_dir is not None else DEFAULT_DATA_DIR
+        with self.write_session():
+            for table in TABLES:
+                path = data_dir / f"{table}.csv"
+                recover(path)
+                frame, report = read_table(path, table)
+                if not report.ok:
+                    print(report)
+                with self._lock:
+                    self.conn.execute(f"DELETE FROM {table}")
+                self._insert_many(table, frame.to_dict("records"))
+                print(f"Imported {len(frame)} {table}")
+        self._row_hashes = {}
+        self._fuzzy_venues = self._fuzzy_hosts = None
+
+    def export_csv(self, data_dir=None):
+        """Write venues.csv, hosts.csv and events.csv from the database, each through a temp file and rename."""
+        data_dir = Path(data_dir) if data_dir is not None else DEFAULT_DATA_DIR
+        data_dir.mkdir(parents=True, exist_ok=True)
+        for table in TABLES:
+            path = data_dir / f"{table}.csv"
+            temp_path = path.with_name(path.name + ".tmp")
+            frame = self._frame(table)
+            with file_lock(path):
+                format_frame(frame, table).to_csv(temp_path, index=False)
+                os.replace(temp_path, path)
+                # the export replaces whatever a CSV writer had journaled
+                path.with_name(path.name + ".journal").unlink(missing_ok=True)
+                drop_index(path)
+            print(f"Exported {len(frame)} {table} to {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python sqlite_catalog.py import|export [csv_dir] [db_path]")
+        sys.exit(2)
+    csv_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    catalog = SqliteCatalog(sys.argv[3] if len(sys.argv) > 3 else None)
+    if sys.argv[1] == "import":
+        catalog.import_csv(csv_dir)
+    else:
+        catalog.export_csv(csv_dir)
+    catalog.close()
@@ -0,0 +1,139 @@
+# durable state for the Google Calendar sync: the sync token, the page a
+# sync stopped on, and the etag/status of every event already handled
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "instance" / "sync_state.db"
+# statuses that mean an event needs no more work until its etag changes
+FINAL_STATUSES = ("done", "skipped", "review")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    -- page token to resume from, valid only for the run started with page_sync_token
+    page_token TEXT,
+    page_sync_token TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    etag TEXT,
+    updated TEXT,
+    status TEXT NOT NULL,
+    processed_at TEXT,
+    PRIMARY KEY (calendar_id, event_id)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SyncState:
+    """
+    SQLite store for one or more calendars' sync progress.
+
+    Every write is its own transaction, so a crash leaves either the old or the
+    new state and never a token saved ahead of the events it covers. The
+    database is opened on first use.
+    """
+
+    def __init__(self, calendar_id: str, path=None):
+        self.calendar_id = calendar_id
+        self.path = Path(path) if path is not None else DEFAULT_PATH
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _sync_row(self):
+        return self.conn.execute(
+            "SELECT sync_token, page_token, page_sync_token FROM sync WHERE calendar_id = ?", (self.calendar_id,)
+        ).fetchone()
+
+    def _update_sync(self, **values):
+        values["updated_at"] = _now()
+        columns = ", ".join(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"INSERT INTO sync (calendar_id, {columns}) VALUES (?{', ?' * len(values)}) "
+                f"ON CONFLICT (calendar_id) DO UPDATE SET {updates}",
+                (self.calendar_id, *values.values()),
+            )
+
+    # sync token and page cursor
+
+    @property
+    def sync_token(self) -> str | None:
+        row = self._sync_row()
+        return row[0] if row else None
+
+    def save_sync_token(self, token: str | None):
+        """Store the token for the next sync and forget the page cursor of the finished one."""
+        self._update_sync(sync_token=token, page_token=None, page_sync_token=None)
+
+    def page_cursor(self, sync_token: str | None) -> str | None:
+        """The page an interrupted sync started from `sync_token` should resume at, if any."""
+        row = self._sync_row()
+        if row is None or row[1] is None or row[2] != (sync_token or ""):
+            return None
+        return row[1]
+
+    def save_page_cursor(self, sync_token: str | None, page_token: str | None):
+        self._update_sync(page_token=page_token, page_sync_token=sync_token or "")
+
+    def import_token_file(self, path) -> bool:
+        """Adopt the token from the old plain-text nextSyncToken file if none is stored yet."""
+        if self.sync_token is not None or not os.path.exists(path):
+            return False
+        with open(path, "r") as file:
+            token = file.read().strip()
+        if not token:
+            return False
+        self.save_sync_token(token)
+        return True
+
+    # per-event progress
+
+    def is_processed(self, event: dict) -> bool:
+        """True if this version (etag) of the event was already handled."""
+        row = self.conn.execute(
+            "SELECT etag, status FROM events WHERE calendar_id = ? AND event_id = ?",
+            (self.calendar_id, event["id"]),
+        ).fetchone()
+        return row is not None and row[0] == event.get("etag") and row[1] in FINAL_STATUSES
+
+    def status(self, event_id: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT status FROM events WHERE calendar_id = ? AND event_id = ?", (self.calendar_id, event_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, event: dict, status: str):
+        """Save the outcome of handling an event along with the etag it was handled at."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO events (calendar_id, event_id, etag, updated, status, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (calendar_id, event_id) DO UPDATE SET "
+                "etag = excluded.etag, updated = excluded.updated, status = excluded.status, "
+                "processed_at = excluded.processed_at",
+                (self.calendar_id, event["id"], event.get("etag"), event.get("updated"), status, _now()),
+            )
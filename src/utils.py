@@ -1,29 +1,546 @@
 import csv
+import io
+import json
 import os
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
 from io import StringIO 
+from itertools import islice
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 CSV_PATH = 'dance_dispatch/data/csv_files/'
 
+# sidecar index: a header (magic, size / mtime / inode of the CSV it describes,
+# dead bytes, row count) followed by the byte offset where each row starts
+INDEX_MAGIC = b"CSVIDX1\n"
+_INDEX_HEADER = struct.Struct("<8sqqqqq")
+
+
+def _encode_rows(rows) -> bytes:
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _trim(slot: bytes) -> bytes:
+    """A row's bytes with one line ending, dropping the blank lines updates and deletes leave behind it."""
+    body = slot.rstrip(b"\r\n")
+    if not body:
+        return b""
+    return body + (b"\r\n" if slot[len(body):].startswith(b"\r\n") else b"\n")
+
+
+class CsvTable:
+    """
+    A CSV file with a sidecar index (<file>.idx) of where each row starts, so a row
+    can be read or rewritten with one seek instead of loading the whole file.
+
+    Row 0 is the header, as with the functions below. An update that fits in the
+    old row's bytes is written in place, padded with blank lines; a delete blanks
+    the row out (a tombstone). Blank lines are skipped by csv readers here and by
+    pandas, and the file is compacted through a temp file and rename once they
+    make up COMPACT_RATIO of it, or when an update doesn't fit. The index is
+    rebuilt whenever the file was changed by something else.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, filename):
+        self.path = Path(filename)
+        if not self.path.exists():
+            raise FileNotFoundError(f"{filename} does not exist.")
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.dead = 0
+        self._offsets = array("q")
+        if not self._load_index():
+            self._scan()
+            self._save_index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _load_index(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, *stamp, dead, count = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+                if magic != INDEX_MAGIC or tuple(stamp) != self._stamp():
+                    return False
+                offsets = array("q")
+                offsets.fromfile(f, count)
+        except (OSError, struct.error, EOFError):
+            return False
+        self._offsets, self.dead = offsets, dead
+        return True
+
+    def _save_index(self, start=None):
+        """Write the index; with `start`, only the header and the offsets from row `start` on."""
+        header = _INDEX_HEADER.pack(INDEX_MAGIC, *self._stamp(), self.dead, len(self._offsets))
+        if start is not None and self.index_path.exists():
+            with open(self.index_path, "r+b") as f:
+                f.write(header)
+                f.seek(_INDEX_HEADER.size + start * self._offsets.itemsize)
+                self._offsets[start:].tofile(f)
+            return
+        temp_path = self.index_path.with_suffix(".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(header)
+            self._offsets.tofile(f)
+        os.replace(temp_path, self.index_path)
+
+    def _scan(self):
+        # csv.reader pulls only the lines of one record per next(), so the file
+        # position before each next() is where that record starts
+        offsets, live = array("q"), 0
+        with open(self.path, "rb") as f:
+            reader = csv.reader(line.decode("utf-8") for line in iter(f.readline, b""))
+            while True:
+                start = f.tell()
+                row = next(reader, None)
+                if row is None:
+                    break
+                if row:
+                    offsets.append(start)
+                    live += f.tell() - start
+            size = f.tell()
+        self._offsets, self.dead = offsets, size - live
+
+    def _slot(self, index):
+        """Byte range of a row, up to where the next one starts."""
+        if index < 0:
+            index += len(self._offsets)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError(f"Row {index} not found.")
+        end = self._offsets[index + 1] if index + 1 < len(self._offsets) else os.path.getsize(self.path)
+        return index, self._offsets[index], end
+
+    def offset(self, index) -> int:
+        """Byte offset where a row starts."""
+        return self._slot(index)[1]
+
+    def _read(self, start, end) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def row(self, index) -> list:
+        _, start, end = self._slot(index)
+        text = self._read(start, end).decode("utf-8")
+        return next(csv.reader(StringIO(text, newline="")))
+
+    def update(self, index, row):
+        index, start, end = self._slot(index)
+        data = _encode_rows([row])
+        if len(data) > end - start:
+            self.compact({index: data})
+            return
+        old = _trim(self._read(start, end))
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            f.write(data + b"\n" * (end - start - len(data)))
+        self.dead += len(old) - len(data)
+        self._after_change(start=len(self._offsets))
+
+    def delete(self, index):
+        index, start, end = self._slot(index)
+        old = _trim(self._read(start, end))
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            f.write(b"\n" * (end - start))
+        del self._offsets[index]
+        self.dead += len(old)
+        self._after_change()
+
+    def append(self, rows):
+        first = len(self._offsets)
+        with open(self.path, "r+b") as f:
+            position = f.seek(0, os.SEEK_END)
+            if position:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) not in (b"\n", b"\r"):
+                    position += f.write(b"\n")
+            for row in rows:
+                self._offsets.append(position)
+                position += f.write(_encode_rows([row]))
+        self._after_change(start=first)
+
+    def _after_change(self, start=None):
+        if self.dead > self.COMPACT_RATIO * os.path.getsize(self.path):
+            self.compact()
+        else:
+            self._save_index(start)
+
+    def compact(self, replace: dict | None = None):
+        """Rewrite the file without blank lines through a temp file and rename; `replace` maps row index -> new row bytes."""
+        replace = replace or {}
+        size = os.path.getsize(self.path)
+        offsets = array("q")
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(self.path, "rb") as src, open(temp_path, "wb") as dst:
+            for index, start in enumerate(self._offsets):
+                end = self._offsets[index + 1] if index + 1 < len(self._offsets) else size
+                src.seek(start)
+                data = replace[index] if index in replace else _trim(src.read(end - start))
+                offsets.append(dst.tell())
+                dst.write(data)
+        os.replace(temp_path, self.path)
+        self._offsets, self.dead = offsets, 0
+        self._save_index()
+
+
+def drop_index(filename):
+    """Remove a CSV's sidecar index after rewriting the file some other way."""
+    Path(str(filename) + ".idx").unlink(missing_ok=True)
+
+
+# lock files this thread holds, so a writer can re-enter its own lock
+_held_locks = threading.local()
+
+
+@contextmanager
+def file_lock(filename):
+    """
+    Hold an exclusive lock on <file>.lock for the block. Every writer of a CSV (the
+    catalog, the functions below, other ingest processes) takes it, so two of them
+    can't interleave their writes.
+    """
+    lock_path = os.path.abspath(str(filename) + ".lock")
+    held = _held_locks.__dict__.setdefault("paths", set())
+    if lock_path in held:
+        yield
+        return
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 seconds; keep waiting
+                    continue
+        held.add(lock_path)
+        try:
+            yield
+        finally:
+            held.discard(lock_path)
+            if fcntl is None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _fsync(file):
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def _fold_entries(entries, key):
+    """Collapse journal entries into rows to append ({key: row}) and changes to stored rows (None = deleted)."""
+    inserted, changed = {}, {}
+    for number, entry in enumerate(entries):
+        if entry["op"] == "insert":
+            row_key = entry["row"].get(key, "")
+            inserted[row_key if row_key != "" else ("", number)] = dict(entry["row"])
+        elif entry["op"] == "update":
+            if entry["key"] in inserted:
+                inserted[entry["key"]].update(entry["values"])
+            elif changed.get(entry["key"], {}) is not None:
+                changed.setdefault(entry["key"], {}).update(entry["values"])
+        elif entry["op"] == "delete":
+            inserted.pop(entry["key"], None)
+            changed[entry["key"]] = None
+    return inserted, changed
+
+
+class CsvJournal:
+    """
+    Append-only journal (<file>.journal, one JSON entry per line) of inserts,
+    updates and deletes to a CSV, keyed by one of its columns.
+
+    record() appends entries and fsyncs them before the CSV is touched;
+    checkpoint() applies them to the CSV and removes the journal, all under
+    file_lock. Inserts of new keys alone are appended to the CSV after noting
+    its size, so a torn append is cut off and redone; updates and deletes stream
+    the CSV on disk into a temp file that replaces it, so another writer's rows
+    are kept. Writers call checkpoint_if_due(), which appends straight away but
+    leaves updates in the journal until it reaches CHECKPOINT_BYTES or the CSV
+    hasn't been written for CHECKPOINT_SECONDS, so a run of updates costs one
+    rewrite rather than one per flush. A journal left behind (by a crash or a
+    writer that stopped before its next checkpoint) is applied by recover().
+
+    The row functions below (update_csv, delete_csv_row) address rows by number
+    rather than key; they go through apply_rows(), whose entries are applied in
+    order through CsvTable so edits stay in place.
+    """
+
+    CHECKPOINT_BYTES = 1 << 20
+    CHECKPOINT_SECONDS = 30.0
+    # entries written by apply_rows(): {"op": "set_row", "index", "row": [...]},
+    # {"op": "delete_row", "index", "count", "row": [...]}, {"op": "append_rows", "rows": [[...]]}
+    ROW_OPS = ("set_row", "delete_row", "append_rows")
+
+    def __init__(self, filename, key="ID"):
+        self.path = Path(filename)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.key = key
+
+    def record(self, entries):
+        """Append entries ({"op": "insert", "row": {...}}, {"op": "update", "key", "values"},
+        {"op": "delete", "key"}); cell values are stored as the text written to the CSV."""
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        if not lines:
+            return
+        with file_lock(self.path), open(self.journal_path, "a", encoding="utf-8") as journal:
+            journal.write(lines)
+            _fsync(journal)
+
+    def insert(self, row: dict):
+        self.record([{"op": "insert", "row": row}])
+
+    def update(self, key, values: dict):
+        self.record([{"op": "update", "key": key, "values": values}])
+
+    def delete(self, key):
+        self.record([{"op": "delete", "key": key}])
+
+    def entries(self) -> list[dict]:
+        if not self.journal_path.exists():
+            return []
+        entries = []
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:  # a line cut short by a crash while recording
+                    break
+        return entries
+
+    def _header(self) -> list:
+        return next(_rows_from(self.path), []) if self.path.exists() else []
+
+    def apply_rows(self, entries) -> int:
+        """Journal row-numbered changes and apply them straight away; returns the number applied."""
+        with file_lock(self.path):
+            # anything already journaled by key goes first, so row numbers mean what the caller saw
+            self.checkpoint()
+            if any(entry["op"] == "append_rows" for entry in entries):
+                entries = [{"op": "append_at", "size": os.path.getsize(self.path)}, *entries]
+            self.record(entries)
+            return self.checkpoint()
+
+    def checkpoint_due(self) -> bool:
+        """Whether the journal should be applied now: it only appends, it's big, or the CSV is stale."""
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return False
+        if size >= self.CHECKPOINT_BYTES or not self.path.exists():
+            return True
+        if time.time() - os.path.getmtime(self.path) >= self.CHECKPOINT_SECONDS:
+            return True
+        return all(entry["op"] in ("insert", "append_at") for entry in self.entries())
+
+    def checkpoint_if_due(self) -> int:
+        with file_lock(self.path):
+            return self.checkpoint() if self.checkpoint_due() else 0
+
+    def checkpoint(self) -> int:
+        """Apply the journal to the CSV and clear it; returns the number of entries applied."""
+        with file_lock(self.path):
+            entries = self.entries()
+            if not entries:
+                self.journal_path.unlink(missing_ok=True)
+                return 0
+            marks = [entry["size"] for entry in entries if entry["op"] == "append_at"]
+            if marks and self.path.exists():
+                # an append was cut short (or done but not yet cleared): undo it and redo
+                os.truncate(self.path, marks[0])
+            changes = [entry for entry in entries if entry["op"] != "append_at"]
+            if any(entry["op"] in self.ROW_OPS for entry in changes):
+                self._apply_rows(changes)
+            else:
+                self._apply_keyed(changes)
+            self.journal_path.unlink(missing_ok=True)
+            return len(changes)
+
+    def _apply_rows(self, entries):
+        table = CsvTable(self.path)
+        for entry in entries:
+            if entry["op"] == "set_row":
+                table.update(entry["index"], entry["row"])
+            elif entry["op"] == "delete_row":
+                # replayed after the delete went through, the row count has already dropped
+                if len(table) == entry["count"] and table.row(entry["index"]) == entry["row"]:
+                    table.delete(entry["index"])
+            elif entry["op"] == "append_rows":
+                table.append(entry["rows"])
+
+    def _apply_keyed(self, entries):
+        header = self._header()
+        inserted, changed = _fold_entries(entries, self.key)
+        new_columns = []
+        for row in [*inserted.values(), *changed.values()]:
+            for column in row or ():
+                if column not in header and column not in new_columns:
+                    new_columns.append(column)
+        if header and not changed and not new_columns:
+            self._append(header, inserted.values())
+        else:
+            self._rewrite(header + new_columns, inserted, changed)
+        drop_index(self.path)
+
+    def _append(self, header, rows):
+        size = os.path.getsize(self.path)
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            journal.write(json.dumps({"op": "append_at", "size": size}) + "\n")
+            _fsync(journal)
+        needs_newline = False
+        if size:
+            with open(self.path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) not in (b"\n", b"\r")
+        with open(self.path, "a", newline="", encoding="utf-8") as file:
+            if needs_newline:
+                file.write("\n")
+            writer = csv.DictWriter(file, header, restval="", extrasaction="ignore", lineterminator="\n")
+            writer.writerows(rows)
+            _fsync(file)
+
+    def _rewrite(self, header, inserted, changed):
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        rows = _rows_from(self.path) if self.path.exists() else iter(())
+        stored_header = next(rows, None) or []
+        with open(temp_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, header, restval="", extrasaction="ignore", lineterminator="\n")
+            writer.writeheader()
+            for row in rows:
+                row = dict(zip(stored_header, row))
+                values = changed.get(row.get(self.key), {})
+                # a key being inserted is already on disk if this journal was applied
+                # once before a crash; the journaled row replaces it
+                if values is None or row.get(self.key) in inserted:
+                    continue
+                row.update(values)
+                writer.writerow(row)
+            writer.writerows(inserted.values())
+            _fsync(file)
+        os.replace(temp_path, self.path)
+
+
+def recover(filename, key="ID"):
+    """Apply a journal left behind by an interrupted write, if there is one."""
+    journal = CsvJournal(filename, key)
+    if journal.journal_path.exists():
+        applied = journal.checkpoint()
+        if applied:
+            print(f"Recovered {applied} journaled change(s) to {filename}")
+
+
 # Function to create (write) to a CSV file
 def write_csv(filename, data):
-    with open(filename, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerows(data)
+    # written to a temp file and renamed over the old one, so a crash can't leave it half written
+    temp_path = Path(str(filename) + ".tmp")
+    with file_lock(filename):
+        with open(temp_path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(data)
+            _fsync(file)
+        os.replace(temp_path, filename)
+        Path(str(filename) + ".journal").unlink(missing_ok=True)
+        drop_index(filename)
     print(f"Data written to {filename}")
 
-# Function to read (view) a CSV file
+def _rows_from(filename, offset=0):
+    with open(filename, mode='rb') as raw:
+        raw.seek(offset)
+        reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+        # blank lines are deleted rows not yet compacted away (see CsvTable)
+        for row in reader:
+            if row:
+                yield row
+
+
+def _column_positions(names, columns):
+    positions = []
+    for column in columns:
+        if isinstance(column, int):
+            positions.append(column)
+        elif column in names:
+            positions.append(names.index(column))
+        else:
+            raise KeyError(f"No column '{column}' in {names}")
+    return positions
+
+
+def iter_csv(filename, columns=None, where=None, start=0, stop=None, tail=None, header=True):
+    """
+    Yield the rows of a CSV one at a time, without printing anything.
+
+    `columns` picks columns by name or index, `where` is a predicate on each data
+    row as a {column: value} dict, and start/stop (a slice of the data rows) or
+    `tail` (the last n) pick a range. The header row comes first unless
+    header=False. Only `tail` holds rows in memory; a slice with no `where` seeks
+    straight to its first row through the CsvTable index.
+    """
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"{filename} does not exist.")
+    rows = _rows_from(filename)
+    names = next(rows, None)
+    if names is None:
+        return
+    positions = _column_positions(names, columns) if columns is not None else None
+
+    def project(row):
+        return [row[i] if i < len(row) else '' for i in positions] if positions is not None else row
+
+    if header:
+        yield project(names)
+    if start and where is None and tail is None:
+        rows.close()
+        table = CsvTable(filename)
+        rows = _rows_from(filename, table.offset(start + 1)) if start + 1 < len(table) else iter(())
+        stop = max(stop - start, 0) if stop is not None else None
+        start = 0
+    if where is not None:
+        rows = (row for row in rows if where(dict(zip(names, row))))
+    rows = islice(rows, start, stop)
+    if tail is not None:
+        rows = deque(rows, maxlen=tail) if tail > 0 else ()
+    for row in rows:
+        yield project(row)
+
+
+def print_rows(rows, page_size=None):
+    """Print rows, pausing after every `page_size` of them until Enter (q stops)."""
+    for count, row in enumerate(rows, start=1):
+        print(row)
+        if page_size and count % page_size == 0:
+            if input("-- more (Enter to continue, q to quit) -- ").strip().lower() == 'q':
+                break
+
+
+# Function to read (view) a CSV file into a list; iter_csv streams it instead
 def read_csv(filename):
     if not os.path.exists(filename):
         print(f"{filename} does not exist.")
         raise FileNotFoundError(f"{filename} does not exist.")
 
-    with open(filename, mode='r', newline='') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-        for row in rows:
-            print(row)
-        return rows
+    return list(iter_csv(filename))
 
 # Function to update a specific row in the CSV file
 def update_csv(filename, new_data, row_index = -1):
@@ -31,29 +548,28 @@ def update_csv(filename, new_data, row_index = -1):
         print(f"{filename} does not exist.")
         return
 
-    rows = []
-    with open(filename, mode='r', newline='') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
+    with file_lock(filename):
+        recover(filename)
+        _update_rows(filename, new_data, row_index)
+
 
-    if row_index >= 0 and row_index < len(rows):
+def _update_rows(filename, new_data, row_index):
+    table = CsvTable(filename)
+    journal = CsvJournal(filename)
+
+    if row_index >= 0 and row_index < len(table):
         # Update specific row with first row from new_data
         if new_data:
             if not isinstance(new_data[0], list):
                 new_data = [new_data]
-            rows[row_index] = new_data[0]
-        with open(filename, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
+            journal.apply_rows([{"op": "set_row", "index": row_index, "row": new_data[0]}])
         print(f"Row {row_index} updated.")
     elif row_index == -1:
         # Append all rows from new_data to the end
         # Check if new_data is a list of lists or just a list
         if new_data and not isinstance(new_data[0], list):
             new_data = [new_data]
-        with open(filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(new_data)
+        journal.apply_rows([{"op": "append_rows", "rows": new_data}])
         print(f"{len(new_data)} row(s) appended.")
     else:
         raise IndexError(f"Row {row_index} not found.")
@@ -66,50 +582,132 @@ def delete_csv_row(filename, row_index):
         print(f"{filename} does not exist.")
         raise FileNotFoundError(f"{filename} does not exist.")
 
-    rows = []
-    with open(filename, mode='r', newline='') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
+    with file_lock(filename):
+        recover(filename)
+        table = CsvTable(filename)
+        if row_index >= len(table):
+            print(f"Row {row_index} not found.")
+            raise IndexError(f"Row {row_index} does not exist.")
+        CsvJournal(filename).apply_rows([
+            {"op": "delete_row", "index": row_index, "count": len(table), "row": table.row(row_index)},
+        ])
+    print(f"Row {row_index} deleted.")
 
-    if row_index < len(rows):
-        del rows[row_index]
-        with open(filename, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
-        print(f"Row {row_index} deleted.")
+
+
+def _plan_position(plan, column):
+    """Index in `plan` of a column given by name or (possibly negative) index."""
+    if isinstance(column, int):
+        if -len(plan) <= column < len(plan):
+            return column % len(plan)
     else:
-        print(f"Row {row_index} not found.")
-        raise IndexError(f"Row {row_index} does not exist.")
+        for position, (name, _) in enumerate(plan):
+            if name == column:
+                return position
+    raise KeyError(f"No column {column!r}")
 
 
+def plan_columns(header, operations):
+    """
+    Turn column operations into (name, source) pairs for the output columns, where
+    source is the input column's index or ('default', value) for an added column.
 
-# Function to add a column to the CSV file
-def add_column_csv(filename, new_column_name, position=None):
-    if not os.path.exists(filename):
-        print(f"{filename} does not exist.")
+    Operations apply in order, each to the result of the ones before it:
+      ('add', name[, default[, position]])   ('drop', column)
+      ('rename', column, new_name)           ('reorder', [columns])
+    A column is a name or an index; reorder moves the listed columns to the front.
+    """
+    plan = [(name, index) for index, name in enumerate(header)]
+    for operation in operations:
+        kind, *args = operation
+        if kind == 'add':
+            name, default, position = (list(args) + ['', None])[:3]
+            column = (name, ('default', default))
+            if position is None:
+                plan.append(column)
+            else:
+                plan.insert(position, column)
+        elif kind == 'drop':
+            del plan[_plan_position(plan, args[0])]
+        elif kind == 'rename':
+            position = _plan_position(plan, args[0])
+            plan[position] = (args[1], plan[position][1])
+        elif kind == 'reorder':
+            positions = [_plan_position(plan, column) for column in args[0]]
+            plan = [plan[i] for i in positions] + [column for i, column in enumerate(plan) if i not in positions]
+        else:
+            raise ValueError(f"Unknown column operation '{kind}'")
+    return plan
+
+
+def migrate_columns(filename, operations):
+    """
+    Apply column operations (see plan_columns) to a CSV in one streaming pass:
+    rows are read, rearranged and written to a temp file that replaces the
+    original, so memory stays flat however many operations there are.
+    """
+    with file_lock(filename):
+        recover(filename)
+        _migrate_columns(filename, operations)
+
+
+def _migrate_columns(filename, operations):
+    rows = _rows_from(filename)
+    header = next(rows, None)
+    if header is None:
         return
+    plan = plan_columns(header, operations)
+    sources = [source for _, source in plan]
+    temp_path = Path(str(filename) + ".tmp")
+    with open(temp_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow([name for name, _ in plan])
+        for row in rows:
+            writer.writerow([
+                source[1] if isinstance(source, tuple) else row[source] if source < len(row) else ''
+                for source in sources
+            ])
+    os.replace(temp_path, filename)
+    drop_index(filename)
 
-    rows = []
-    with open(filename, mode='r', newline='') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
 
-    # Insert the column header at the specified position
-    if position is None:
-        rows[0].append(new_column_name)  # Add to the end
-    else:
-        rows[0].insert(position, new_column_name)  # Insert at specific position
+def parse_column_operations(text):
+    """
+    Parse operations typed at the menu, separated by ';':
+    "add Zip=10001@2; drop 1; rename City Town; reorder Name,Town".
+    Numbers are column indexes.
+    """
+    def column(value):
+        value = value.strip()
+        return int(value) if value.lstrip('-').isdigit() else value
 
-    # Add empty values for all data rows
-    for row in rows[1:]:
-        if position is None:
-            row.append('')  # Add empty value to the end
+    operations = []
+    for command in filter(None, (part.strip() for part in text.split(';'))):
+        kind, _, rest = command.partition(' ')
+        kind = kind.lower()
+        if kind == 'add':
+            rest, _, position = rest.partition('@')
+            name, _, default = rest.partition('=')
+            operations.append(('add', name.strip(), default.strip(), int(position) if position.strip() else None))
+        elif kind == 'drop':
+            operations.append(('drop', column(rest)))
+        elif kind == 'rename':
+            old, _, new = rest.strip().rpartition(' ')
+            operations.append(('rename', column(old), new))
+        elif kind == 'reorder':
+            operations.append(('reorder', [column(value) for value in rest.split(',')]))
         else:
-            row.insert(position, '')  # Insert empty value at specific position
+            raise ValueError(f"Unknown column operation '{kind}'")
+    return operations
 
-    with open(filename, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerows(rows)
+
+# Function to add a column to the CSV file
+def add_column_csv(filename, new_column_name, position=None):
+    if not os.path.exists(filename):
+        print(f"{filename} does not exist.")
+        return
+
+    migrate_columns(filename, [('add', new_column_name, '', position)])
     print(f"Column '{new_column_name}' added.")
 
 # Function to delete a column from the CSV file
@@ -118,25 +716,12 @@ def delete_column_csv(filename, column_index):
         print(f"{filename} does not exist.")
         return
 
-    rows = []
-    with open(filename, mode='r', newline='') as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-
-    if column_index < len(rows[0]):
-        # Remove the column from the header
-        del rows[0][column_index]
-        
-        # Remove the corresponding column from each data row
-        for row in rows[1:]:
-            del row[column_index]
-
-        with open(filename, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
-        print(f"Column at index {column_index} deleted.")
-    else:
+    try:
+        migrate_columns(filename, [('drop', column_index)])
+    except KeyError:
         print(f"Column index {column_index} not found.")
+        return
+    print(f"Column at index {column_index} deleted.")
 
 
 def format_user_input(input_string, num_columns):
@@ -168,31 +753,30 @@ def execute_command():
         print("4. Delete CSV row")
         print("5. Add a Column to CSV")
         print("6. Delete a Column from CSV")
-        print("7. Exit")
+        print("7. Migrate columns (add/drop/rename/reorder in one pass)")
+        print("8. Exit")
 
         filename = CSV_PATH + input("Enter the CSV filename: ").strip()+".csv"
         # print the number of columns in the csv file named if it exists
         if os.path.exists(filename):
-            with open(filename, mode='r', newline='') as file:
-                reader = csv.reader(file)
-                rows = list(reader)
-                if rows:
-                    num_columns = len(rows[0])
-                    print(f"{filename} has {num_columns} columns.")
-                else:
-                    num_columns = 0
-                    print(f"{filename} is empty.")
+            header = next(iter_csv(filename), None)
+            if header:
+                num_columns = len(header)
+                print(f"{filename} has {num_columns} columns.")
+            else:
+                num_columns = 0
+                print(f"{filename} is empty.")
         else:
             num_columns = 0
             print(f"{filename} does not exist yet.")
-        choice = input("Enter your choice (1-7): ").strip()
+        choice = input("Enter your choice (1-8): ").strip()
 
         if choice == '1':
             data = input("Enter data to write (comma separated values): ").strip().split(',')
             write_csv(filename, [data])
         
         elif choice == '2':
-            read_csv(filename)
+            print_rows(iter_csv(filename), page_size=20)
         
         elif choice == '3':
             row_index = input("Enter row index to update: ").strip()
@@ -219,11 +803,19 @@ def execute_command():
             delete_column_csv(filename, column_index)
         
         elif choice == '7':
+            text = input("Enter operations, e.g. add Zip=10001@2; drop 1; rename City Town; reorder Name,Town: ")
+            try:
+                migrate_columns(filename, parse_column_operations(text))
+                print("Columns migrated.")
+            except (KeyError, ValueError) as e:
+                print(f"Columns not changed: {e}")
+
+        elif choice == '8':
             print("Exiting the program.")
             break
         
         else:
-            print("Invalid choice. Please enter a number between 1 and 7.")
+            print("Invalid choice. Please enter a number between 1 and 8.")
 
 # Main entry point
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import pytest
+import os
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from blacklist import Blacklist, BlacklistError, parse_rule
+
+
+def test_parse_rule():
+    """Test field and kind prefixes."""
+    assert parse_rule("Open House").pattern == "open house"
+    rule = parse_rule("description:word:Rep Session", 3)
+    assert (rule.field, rule.kind, rule.pattern, rule.line) == ("description", "word", "rep session", 3)
+    assert parse_rule("re:^beg\\.? House").pattern == "^beg\\.? House"
+    assert parse_rule("   ") is None
+    assert parse_rule("# comment") is None
+
+
+def test_blank_lines_match_nothing():
+    """Test that a stray blank line doesn't blacklist every event."""
+    blacklist = Blacklist(lines=["open house", "", "  "])
+    assert blacklist.match({"summary": "Cypher Night"}) is None
+    assert blacklist.match({"summary": "OPEN HOUSE (Jungle)"}).pattern == "open house"
+
+
+def test_word_boundary_rules():
+    """Test that word rules don't match inside other words."""
+    blacklist = Blacklist(lines=["word:drill"])
+    assert blacklist.match({"summary": "House drills"}) is None
+    assert blacklist.match({"summary": "drillsergeant drill"}) is not None
+
+
+def test_regex_and_field_rules():
+    """Test regex rules and rules scoped to description or location."""
+    blacklist = Blacklist(lines=["re:^beg(inner)?\\.? house", "location:word:zoom", "description:members only"])
+    assert blacklist.match({"summary": "Beginner House"}).kind == "re"
+    assert blacklist.match({"summary": "Not a beg house"}) is None
+    assert blacklist.match({"summary": "Session", "location": "Zoom call"}).field == "location"
+    assert blacklist.match({"summary": "Session", "description": "Members only!"}).line == 3
+    assert blacklist.match({"summary": "Zoom members only"}) is None
+
+
+def test_invalid_regex_reports_line():
+    """Test that a bad regex fails on load, naming its line."""
+    with pytest.raises(BlacklistError, match=r"^line 3: invalid regex '\(unclosed'"):
+        Blacklist(lines=["open house", "# comment", "re:(unclosed"])
+
+
+def test_missing_file_is_empty(tmp_path):
+    """Test that a missing file blacklists nothing until it's created."""
+    path = tmp_path / "blacklist.txt"
+    blacklist = Blacklist(path)
+    assert blacklist.rules == []
+    assert blacklist.match({"summary": "Open House"}) is None
+
+    path.write_text("open house\n")
+    assert blacklist.match({"summary": "Open House"}).line == 1
+    path.unlink()
+    assert blacklist.match({"summary": "Open House"}) is None
+
+
+def test_reloads_when_file_changes(tmp_path):
+    """Test hot reload on mtime change."""
+    path = tmp_path / "blacklist.txt"
+    path.write_text("open house\n")
+    blacklist = Blacklist(path)
+    assert blacklist.match({"summary": "Battle 101"}) is None
+
+    path.write_text("open house\nbattle 101\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert blacklist.match({"summary": "Battle 101"}).line == 2
+
+
+def test_bad_reload_keeps_previous_rules(tmp_path, capsys):
+    """Test that a bad regex saved during a sync is reported once and the old rules keep matching."""
+    path = tmp_path / "blacklist.txt"
+    path.write_text("open house\n")
+    blacklist = Blacklist(path)
+
+    path.write_text("open house\nre:(unclosed\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert blacklist.match({"summary": "Open House"}).line == 1
+    assert "line 2: invalid regex" in capsys.readouterr().out
+    assert blacklist.match({"summary": "Open House"}).line == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_regex_rules_keep_their_meaning():
+    """Test that inline flags and backreferences work as they would in a rule on its own."""
+    blacklist = Blacklist(lines=["re:^beg house", "re:(?i)^drill", "re:(\\w+) \\1 jam", "re:(?P<x>a)b(?P=x)"])
+    assert blacklist.match({"summary": "DRILL night"}).line == 2
+    assert blacklist.match({"summary": "house house jam"}).line == 3
+    assert blacklist.match({"summary": "aba"}).line == 4
+    assert blacklist.match({"summary": "house party jam"}) is None
@@ -0,0 +1,203 @@
+import pytest
+import pandas as pd
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from catalog import Catalog, CatalogStore, normalize_key
+
+
+@pytest.fixture
+def catalog():
+    """Fixture with a small catalog."""
+    venues = pd.DataFrame({
+        'ID': [1, 2, 3],
+        'Name': ['Venue A', 'Venue B', 'Venue C'],
+        'Address': ['123 Main St', '456 Oak Ave', '789 Pine Rd'],
+    })
+    hosts = pd.DataFrame({
+        'ID': [1, 2],
+        'Name': ['Host A', 'Host B'],
+    })
+    events = pd.DataFrame({
+        'ID': ['abc', 'def'],
+        'Title': ['Event 1', 'Event 2'],
+    })
+    return Catalog(venues, hosts, events)
+
+
+def test_normalize_key():
+    """Test that keys ignore case and extra whitespace."""
+    assert normalize_key("  Venue   A ") == "venue a"
+    assert normalize_key(None) == ""
+    assert normalize_key(float("nan")) == ""
+
+
+def test_find_venue_by_name_or_address(catalog):
+    """Test venue lookup falls back from name to address."""
+    assert catalog.find_venue('Venue A', 'Unknown') == 1
+    assert catalog.find_venue('Unknown', '456 oak ave') == 2
+    assert catalog.find_venue('Unknown', 'Unknown') is None
+    assert catalog.find_venue(None, None) is None
+
+
+def test_find_host(catalog):
+    """Test host lookup by normalized name."""
+    assert catalog.find_host(' host b') == 2
+    assert catalog.find_host('Host Z') is None
+
+
+def test_add_updates_indexes(catalog):
+    """Test that inserts are visible to lookups without a rebuild."""
+    vid = catalog.next_venue_id()
+    catalog.add_venue({'ID': vid, 'Name': 'Venue D', 'Address': '1 New St'})
+    assert vid == 4
+    assert catalog.find_venue('Venue D', '') == 4
+    assert catalog.next_venue_id() == 5
+
+    catalog.add_host({'ID': catalog.next_host_id(), 'Name': 'Host C'})
+    assert catalog.find_host('Host C') == 3
+
+    assert not catalog.has_event('ghi')
+    catalog.add_event({'ID': 'ghi', 'Title': 'Event 3'})
+    assert catalog.has_event('ghi')
+    assert len(catalog.events) == 3
+
+
+@pytest.fixture
+def csv_catalog(tmp_path):
+    """Fixture with a catalog backed by CSV files in a temp directory."""
+    paths = {}
+    for table, frame in {
+        'venues': pd.DataFrame({'ID': [1], 'Name': ['Venue A'], 'Address': ['123 Main St']}),
+        'hosts': pd.DataFrame({'ID': [1], 'Name': ['Host A']}),
+        'events': pd.DataFrame({'ID': ['abc'], 'Title': ['Event 1']}),
+    }.items():
+        paths[table] = tmp_path / f"{table}.csv"
+        frame.to_csv(paths[table], index=False)
+    return Catalog.from_csv(paths['venues'], paths['hosts'], paths['events'])
+
+
+def test_write_session_appends_once(csv_catalog):
+    """Test that buffered rows are only written when the session ends."""
+    events_path = csv_catalog.paths['events']
+    with csv_catalog.write_session():
+        csv_catalog.add_event({'ID': 'def', 'Title': 'Event 2'})
+        csv_catalog.add_event({'ID': 'ghi', 'Title': 'Event 3'})
+        assert len(pd.read_csv(events_path)) == 1
+    assert list(pd.read_csv(events_path)['ID']) == ['abc', 'def', 'ghi']
+
+
+def test_write_session_flush_every(csv_catalog):
+    """Test that a session flushes every K rows."""
+    events_path = csv_catalog.paths['events']
+    with csv_catalog.write_session(flush_every=2):
+        csv_catalog.add_event({'ID': 'def', 'Title': 'Event 2'})
+        csv_catalog.add_event({'ID': 'ghi', 'Title': 'Event 3'})
+        assert len(pd.read_csv(events_path)) == 3
+        csv_catalog.add_event({'ID': 'jkl', 'Title': 'Event 4'})
+        assert len(pd.read_csv(events_path)) == 3
+    assert len(pd.read_csv(events_path)) == 4
+
+
+def test_append_without_trailing_newline(csv_catalog):
+    """Test appending to a file saved without a trailing newline."""
+    hosts_path = csv_catalog.paths['hosts']
+    hosts_path.write_text("ID,Name\n1,Host A")
+    csv_catalog.add_host({'ID': 2, 'Name': 'Host B'})
+    assert list(pd.read_csv(hosts_path)['Name']) == ['Host A', 'Host B']
+
+
+def test_update_row_only_rewrites_on_change(csv_catalog):
+    """Test that an unchanged update doesn't touch the file."""
+    events_path = csv_catalog.paths['events']
+    assert csv_catalog.update_row('events', 'abc', {'Title': 'Event 1'}) is False
+    assert csv_catalog.update_row('events', 'abc', {'Title': 'Renamed'}) is True
+    csv_catalog.close()
+    assert list(pd.read_csv(events_path)['Title']) == ['Renamed']
+
+
+def test_updates_wait_for_checkpoint_and_inserts_append(csv_catalog):
+    """Test that updates stay journaled until a checkpoint while new rows are appended in place."""
+    events_path = csv_catalog.paths['events']
+    inode, before = events_path.stat().st_ino, events_path.read_bytes()
+    csv_catalog.add_event({'ID': 'def', 'Title': 'Event 2'})
+    assert events_path.stat().st_ino == inode and events_path.read_bytes().startswith(before)
+    assert list(pd.read_csv(events_path)['ID']) == ['abc', 'def']
+
+    csv_catalog.update_row('events', 'abc', {'Title': 'Renamed'})
+    csv_catalog.add_event({'ID': 'ghi', 'Title': 'Event 3'})
+    assert list(pd.read_csv(events_path)['Title']) == ['Event 1', 'Event 2']
+    assert Path(str(events_path) + '.journal').exists()
+    csv_catalog.checkpoint()
+    assert list(pd.read_csv(events_path)['Title']) == ['Renamed', 'Event 2', 'Event 3']
+    assert not Path(str(events_path) + '.journal').exists()
+
+
+def test_store_loads_lazily(csv_catalog, tmp_path):
+    """Test that a store doesn't read the CSVs until the catalog is used."""
+    store = CatalogStore(tmp_path)
+    assert not store.loaded
+    assert store.catalog.find_venue('Venue A', '') == 1
+    assert store.loaded
+
+
+def test_store_reload_and_data_dir(csv_catalog, tmp_path):
+    """Test reloading picks up file changes and the data dir can be swapped."""
+    store = CatalogStore(tmp_path)
+    assert not store.catalog.has_event('xyz')
+    pd.DataFrame({'ID': ['xyz'], 'Title': ['Other']}).to_csv(tmp_path / 'events.csv', index=False)
+    assert store.reload().has_event('xyz')
+
+    store.set_data_dir(tmp_path / 'missing')
+    assert not store.loaded
+    with pytest.raises(FileNotFoundError):
+        store.catalog
+
+
+def test_store_invalidate_flushes(csv_catalog, tmp_path):
+    """Test that invalidating a store doesn't drop buffered rows."""
+    store = CatalogStore(tmp_path)
+    with store.catalog.write_session():
+        store.catalog.add_host({'ID': 2, 'Name': 'Host B'})
+        store.invalidate()
+    assert store.catalog.find_host('Host B') == 2
+
+
+def test_get_row_by_position(catalog):
+    """Test that rows are found by ID without a scan, including ones inserted after loading."""
+    assert catalog.get_row('events', 'def')['Title'] == 'Event 2'
+    assert catalog.get_row('events', 'zzz') is None
+    catalog.add_events([{'ID': 'ghi', 'Title': 'Event 3'}, {'ID': 'jkl', 'Title': 'Event 4'}])
+    assert catalog.get_row('events', 'jkl')['Title'] == 'Event 4'
+    assert catalog.update_row('events', 'ghi', {'Title': 'Renamed'})
+    assert list(catalog.events['Title']) == ['Event 1', 'Event 2', 'Renamed', 'Event 4']
+    assert catalog.get_row('venues', 2)['Name'] == 'Venue B'
+
+
+def test_fuzzy_index_tracks_inserts(catalog):
+    """Test that rows added after the fuzzy index is built are searchable."""
+    assert catalog.fuzzy_venues.best('venue a.', accept=0.9).id == 1
+    catalog.add_venue({'ID': catalog.next_venue_id(), 'Name': 'Brickhouse NYC', 'Address': '1 New St'})
+    assert catalog.fuzzy_venues.best('Brickhouse', accept=0.9).id == 4
+    catalog.add_host({'ID': catalog.next_host_id(), 'Name': 'DJ Spinna'})
+    assert catalog.fuzzy_hosts.best('Spinna', accept=0.6).id == 3
+
+
+def test_list_cells_written_without_numpy_repr(csv_catalog):
+    """Test that numpy IDs in list columns are written as plain numbers."""
+    import numpy as np
+    csv_catalog.add_event({'ID': 'def', 'Title': 'Event 2', 'Hosts': [np.int64(3), np.int64(4)]})
+    assert list(pd.read_csv(csv_catalog.paths['events'])['Hosts'])[-1] == '[3, 4]'
+
+
+def test_load_replays_leftover_journal(csv_catalog):
+    """Test that changes journaled before a crash are applied when the catalog loads again."""
+    from utils import CsvJournal
+    events_path = csv_catalog.paths['events']
+    CsvJournal(events_path).record([
+        {"op": "update", "key": "abc", "values": {"Title": "Renamed"}},
+        {"op": "insert", "row": {"ID": "def", "Title": "Event 2"}},
+    ])
+    catalog = Catalog.from_csv(*(csv_catalog.paths[table] for table in ('venues', 'hosts', 'events')))
+    assert catalog.has_event('def')
+    assert list(pd.read_csv(events_path)['Title']) == ['Renamed', 'Event 2']
@@ -1,27 +1,28 @@
 import pytest
 import pandas as pd
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from pathlib import Path
 import sys
-sys.path.insert(0, str(Path(__file__).parent.parent))
-import src.data_pipeline
-from src.data_pipeline import handle_event_entry, get_venue_id, get_host_id
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import data_pipeline
+from catalog import DEFAULT_DATA_DIR
+from data_objects import Event
+from resolution_rules import ResolutionRules
+from data_pipeline import handle_event_entry, get_venue_id, get_host_id
+
+EVENT_COLUMNS = ['ID', 'Title', 'StartDate', 'StartTime', 'EndDate', 'EndTime', 'Location', 'Description',
+                 'Price', 'PhotoURL', 'ExternalURLs', 'Hosts', 'Tags']
+
 
 @pytest.fixture
 def sample_venues_df():
     """Fixture with sample venues dataframe."""
     return pd.DataFrame({
+        'ID': [1, 2, 3],
         'Name': ['Venue A', 'Venue B', 'Venue C'],
         'Address': ['123 Main St', '456 Oak Ave', '789 Pine Rd'],
         'Bio': ['', '', ''],
-        'Tags': ['', '', ''],
-        'Residents': ['', '', ''],
-        'NearestStation': ['', '', ''],
-        'DistanceFromStation': ['', '', ''],
-        'NumberOfZones': ['', '', ''],
-        'TotalArea': ['', '', ''],
-        'ExternalLinks': ['', '', ''],
-        'PhotoURLs': ['', '', '']
+        'Type': ['', '', ''],
     })
 
 
@@ -29,133 +30,176 @@ def sample_venues_df():
 def sample_hosts_df():
     """Fixture with sample hosts dataframe."""
     return pd.DataFrame({
+        'ID': [1, 2, 3],
         'Name': ['Host A', 'Host B', 'Host C'],
         'Bio': ['', '', ''],
-        'Tags': ['tag1', 'tag2', 'tag3'],
+        'Tags': ["['tag1']", "['tag2']", "['tag3']"],
         'ExternalLinks': ['', '', ''],
         'PhotoURLs': ['', '', '']
     })
 
 
+@pytest.fixture
+def data_dir(tmp_path, sample_venues_df, sample_hosts_df):
+    """Fixture pointing data_pipeline at temp CSVs holding the sample venues and hosts, and no events."""
+    sample_venues_df.to_csv(tmp_path / 'venues.csv', index=False)
+    sample_hosts_df.to_csv(tmp_path / 'hosts.csv', index=False)
+    pd.DataFrame(columns=EVENT_COLUMNS).to_csv(tmp_path / 'events.csv', index=False)
+    data_pipeline.configure(tmp_path)
+    yield tmp_path
+    data_pipeline.STORE.invalidate()
+    data_pipeline.configure(DEFAULT_DATA_DIR)
+
+
+def stored(data_dir, table):
+    """The table's CSV as written to disk."""
+    data_pipeline.STORE.invalidate()
+    return pd.read_csv(data_dir / f'{table}.csv', keep_default_na=False)
+
+
 @pytest.fixture
 def sample_event():
     """Fixture with sample event data."""
-    return {
-        'id': None,
-        'title': 'Test Event',
-        'start_date': '2024-01-01',
-        'start_time': '18:00',
-        'end_date': '2024-01-01',
-        'end_time': '22:00',
-        'Location': 'Venue A',
-        'Address': '123 Main St',
-        'description': 'Test description',
-        'Hosts': 'Host A,Host B',
-        'photo_url': 'http://example.com/photo.jpg',
-        'tags': 'music,art',
-        'price': '10',
-        'external_links': 'http://example.com'
-    }
-
-
-def test_get_venue_id_exact_name_match(sample_venues_df):
+    return Event(
+        id='evt1',
+        title='Test Event',
+        start_date='2024-01-01',
+        start_time='18:00:00',
+        end_date='2024-01-01',
+        end_time='22:00:00',
+        location='Venue A',
+        address='123 Main St',
+        description='Test description',
+        hosts='Host A,Host B',
+        photo_url='http://example.com/photo.jpg',
+        tags=['music', 'art'],
+        price=10.0,
+        external_links='http://example.com',
+    )
+
+
+def test_get_venue_id_exact_name_match(data_dir):
     """Test finding venue by exact name match."""
-    venue_id = get_venue_id(sample_venues_df, 'Venue A', '999 Unknown St')
-    assert venue_id == 0
+    venue_id = get_venue_id('Venue A', '999 Unknown St')
+    assert venue_id == 1
 
 
-def test_get_venue_id_address_match(sample_venues_df):
+def test_get_venue_id_address_match(data_dir):
     """Test finding venue by address match."""
-    venue_id = get_venue_id(sample_venues_df, 'Unknown Venue', '456 Oak Ave')
-    assert venue_id == 1
+    venue_id = get_venue_id('Unknown Venue', '456 Oak Ave')
+    assert venue_id == 2
 
 
-def test_get_venue_id_both_match(sample_venues_df):
+def test_get_venue_id_both_match(data_dir):
     """Test finding venue when both name and address match."""
-    venue_id = get_venue_id(sample_venues_df, 'Venue B', '456 Oak Ave')
-    assert venue_id == 1
+    venue_id = get_venue_id('Venue B', '456 Oak Ave')
+    assert venue_id == 2
 
 
 @patch('builtins.input', side_effect=[''])
-def test_get_venue_id_not_found_skip(mock_input, sample_venues_df, capsys):
+def test_get_venue_id_not_found_skip(mock_input, data_dir, capsys):
     """Test skipping venue addition when not found."""
-    venue_id = get_venue_id(sample_venues_df, 'New Venue', 'New Address')
+    venue_id = get_venue_id('New Venue', 'New Address')
     assert venue_id is None
     captured = capsys.readouterr()
     assert "Skipping adding venue" in captured.out
+    assert len(stored(data_dir, 'venues')) == 3
 
 
 @patch('builtins.input', side_effect=['New Venue Name', ''])
-@patch('data_pipeline.VENUES')
-def test_get_venue_id_add_new_venue_default_address(mock_venues, mock_input, sample_venues_df, capsys):
+def test_get_venue_id_add_new_venue_default_address(mock_input, data_dir, capsys):
     """Test adding new venue with default address."""
-    with patch('pandas.DataFrame.to_csv'):
-        venue_id = get_venue_id(sample_venues_df, 'Nonexistent', 'Default Address')
-        assert venue_id == 3
-        captured = capsys.readouterr()
-        assert "Added new venue" in captured.out
+    venue_id = get_venue_id('Nonexistent', 'Default Address')
+    assert venue_id == 4
+    captured = capsys.readouterr()
+    assert "Added new venue" in captured.out
+    venues = stored(data_dir, 'venues')
+    assert venues.iloc[-1][['ID', 'Name', 'Address']].tolist() == [4, 'New Venue Name', 'Default Address']
 
 
 @patch('builtins.input', side_effect=['New Venue', 'Custom Address'])
-@patch('data_pipeline.VENUES')
-def test_get_venue_id_add_new_venue_custom_address(mock_venues, mock_input, sample_venues_df, capsys):
+def test_get_venue_id_add_new_venue_custom_address(mock_input, data_dir, capsys):
     """Test adding new venue with custom address."""
-    with patch('pandas.DataFrame.to_csv'):
-        venue_id = get_venue_id(sample_venues_df, 'Unknown', 'Old Address')
-        assert venue_id == 3
-        captured = capsys.readouterr()
-        assert "Added new venue" in captured.out
+    venue_id = get_venue_id('Unknown', 'Old Address')
+    assert venue_id == 4
+    captured = capsys.readouterr()
+    assert "Added new venue" in captured.out
+    venues = stored(data_dir, 'venues')
+    assert venues.iloc[-1][['ID', 'Name', 'Address']].tolist() == [4, 'New Venue', 'Custom Address']
+
+
+@patch('builtins.input', side_effect=['1'])
+def test_get_venue_id_close_match_is_picked_at_prompt(mock_input, data_dir, capsys):
+    """Test that without rules a near match is listed for the user to pick instead of being used."""
+    venue_id = get_venue_id('Venue A.', '')
+    assert venue_id == 1
+    assert mock_input.call_count == 1
+    assert "1. Venue A" in capsys.readouterr().out
+
+
+def test_get_venue_id_close_match_accepted_with_rules(data_dir, monkeypatch):
+    """Test that rules with fuzzy_accept use a near match without asking."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("prompted"))
+    assert get_venue_id('Venue A.', '', ResolutionRules(fuzzy_accept=0.9)) == 1
+    assert len(stored(data_dir, 'venues')) == 3
 
 
-def test_get_host_id_all_existing(sample_hosts_df):
+def test_get_host_id_all_existing(data_dir):
     """Test getting IDs for all existing hosts."""
-    host_ids = get_host_id(sample_hosts_df, "Host A,Host B")
-    assert host_ids == [0, 1]
+    host_ids = get_host_id("Host A,Host B")
+    assert host_ids == [1, 2]
 
 
-def test_get_host_id_empty_string(sample_hosts_df):
+def test_get_host_id_empty_string(data_dir):
     """Test handling empty host string."""
-    host_ids = get_host_id(sample_hosts_df, "")
+    host_ids = get_host_id("")
     assert host_ids == []
 
 
-def test_get_host_id_with_spaces(sample_hosts_df):
+def test_get_host_id_with_spaces(data_dir):
     """Test handling host names with extra spaces."""
-    host_ids = get_host_id(sample_hosts_df, " Host A , Host C ")
-    assert host_ids == [0, 2]
+    host_ids = get_host_id(" Host A , Host C ")
+    assert host_ids == [1, 3]
 
 
 @patch('builtins.input', return_value='tag1,tag2')
-@patch('data_pipeline.HOSTS')
-def test_get_host_id_add_new_host(mock_hosts, mock_input, sample_hosts_df, capsys):
+def test_get_host_id_add_new_host(mock_input, data_dir, capsys):
     """Test adding a new host."""
-    with patch('pandas.DataFrame.to_csv'):
-        host_ids = get_host_id(sample_hosts_df, "Host A,New Host")
-        assert len(host_ids) == 2
-        assert host_ids[0] == 0
-        assert host_ids[1] == 3
-        captured = capsys.readouterr()
-        assert "Added new host" in captured.out
+    host_ids = get_host_id("Host A,New Host")
+    assert host_ids == [1, 4]
+    captured = capsys.readouterr()
+    assert "Added new host" in captured.out
+    hosts = stored(data_dir, 'hosts')
+    assert hosts.iloc[-1][['ID', 'Name', 'Tags']].tolist() == [4, 'New Host', "['tag1', 'tag2']"]
+
+
+@patch('builtins.input', side_effect=['1'])
+def test_get_host_id_close_match_is_picked_at_prompt(mock_input, data_dir, capsys):
+    """Test that without rules a near match is offered at the tags prompt rather than used."""
+    host_ids = get_host_id("Host A.")
+    assert host_ids == [1]
+    assert mock_input.call_count == 1
+    assert "1. Host A" in capsys.readouterr().out
+    assert len(stored(data_dir, 'hosts')) == 3
 
 
-def test_get_host_id_mixed_empty_entries(sample_hosts_df):
+def test_get_host_id_close_match_accepted_with_rules(data_dir, monkeypatch):
+    """Test that rules with fuzzy_accept use a near match without asking."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("prompted"))
+    assert get_host_id("Host A.", ResolutionRules(fuzzy_accept=0.9)) == [1]
+
+
+def test_get_host_id_mixed_empty_entries(data_dir):
     """Test handling comma-separated list with empty entries."""
-    host_ids = get_host_id(sample_hosts_df, "Host A,,Host B,")
-    assert host_ids == [0, 1]
+    host_ids = get_host_id("Host A,,Host B,")
+    assert host_ids == [1, 2]
 
 
-@patch('data_pipeline.VENUES')
-@patch('data_pipeline.HOSTS')
-@patch('data_pipeline.EVENTS')
-@patch('data_pipeline.get_venue_id', return_value=0)
-@patch('data_pipeline.get_host_id', return_value=[0, 1])
-def test_handle_event_entry_new_event(mock_get_host, mock_get_venue, mock_events, mock_hosts, mock_venues, sample_event, capsys):
+def test_handle_event_entry_new_event(data_dir, sample_event, capsys):
     """Test adding a new event."""
-    mock_events_df = pd.DataFrame(columns=['id', 'Title'])
-    mock_events.return_value = mock_events_df
-    
-    with patch('pandas.DataFrame.to_csv'):
-        result = handle_event_entry(mock_events_df, sample_event)
-        assert result == 0
-        captured = capsys.readouterr()
-        assert "Added new event" in captured.out
\ No newline at end of file
+    result = handle_event_entry(sample_event)
+    assert result == 1
+    captured = capsys.readouterr()
+    assert "Added new event" in captured.out
+    events = stored(data_dir, 'events')
+    assert events[['ID', 'Title', 'Location', 'Hosts']].values.tolist() == [['evt1', 'Test Event', 1, '[1, 2]']]
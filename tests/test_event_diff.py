@@ -0,0 +1,70 @@
+import datetime
+import pytest
+import pandas as pd
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from event_diff import canonical, changed_columns, content_hash
+from data_objects import Event
+from catalog import DEFAULT_DATA_DIR
+import data_pipeline
+
+
+def test_canonical_round_trips():
+    """Test that values read back from CSV or Supabase compare equal to what was written."""
+    assert canonical(1.0) == canonical(1) == "1"
+    assert canonical(float("nan")) == canonical(None) == ""
+    assert canonical("[1, 2]") == canonical([1, 2])
+    assert canonical("2024-01-01T19:00:00+00:00") == canonical(datetime.datetime(2024, 1, 1, 19))
+    assert canonical(datetime.date(2024, 1, 1)) == "2024-01-01"
+
+
+def test_changed_columns_and_hash():
+    """Test that only differing columns are reported and the hash follows the content."""
+    stored = {"Title": "Class", "Location": 1.0, "Price": None}
+    incoming = {"Title": "Class", "Location": 2, "Price": float("nan")}
+    assert changed_columns(stored, incoming) == {"Location": 2}
+    columns = ("Title", "Price")
+    assert content_hash(stored, columns) == content_hash(incoming, columns)
+    assert content_hash(stored, ("Location",)) != content_hash(incoming, ("Location",))
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    """Fixture pointing data_pipeline at a one-event dataset."""
+    pd.DataFrame({'ID': [1], 'Name': ['Venue A'], 'Address': ['1 Main St'], 'Bio': [''], 'Type': ['']}) \
+        .to_csv(tmp_path / 'venues.csv', index=False)
+    pd.DataFrame({'ID': [1], 'Name': ['Host A']}).to_csv(tmp_path / 'hosts.csv', index=False)
+    pd.DataFrame({
+        'ID': ['abc'], 'Title': ['Class'], 'StartDate': ['2024-01-01'], 'StartTime': ['19:00:00'],
+        'EndDate': ['2024-01-01'], 'EndTime': ['20:00:00'], 'Location': [1.0], 'Description': [None],
+        'Price': [None], 'PhotoURL': [None], 'ExternalURLs': ['[]'], 'Hosts': ['[1]'], 'Tags': ['[]'],
+    }).to_csv(tmp_path / 'events.csv', index=False)
+    data_pipeline.configure(tmp_path)
+    yield tmp_path
+    data_pipeline.configure(DEFAULT_DATA_DIR)
+
+
+def test_update_event_writes_changed_columns(pipeline):
+    """Test that a rescheduled event only rewrites the columns that moved."""
+    event = Event(id='abc', title='Class', start_date=datetime.date(2024, 1, 1), start_time=datetime.time(19),
+                  end_date=datetime.date(2024, 1, 1), end_time=datetime.time(20), location='Venue A',
+                  address='1 Main St', hosts='Host A')
+    assert data_pipeline.update_event(event) == {}
+    event.start_time, event.end_time = datetime.time(18), datetime.time(19)
+    assert set(data_pipeline.update_event(event)) == {'StartTime', 'EndTime'}
+    data_pipeline.STORE.invalidate()
+    stored = pd.read_csv(pipeline / 'events.csv')
+    assert list(stored['StartTime']) == ['18:00:00']
+    assert list(stored['Title']) == ['Class']
+
+
+def test_update_event_never_prompts(pipeline, monkeypatch):
+    """Test that an unmatched venue or host on an update keeps the stored value instead of prompting."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("update prompted"))
+    event = Event(id='abc', title='Renamed', start_date=datetime.date(2024, 1, 1), start_time=datetime.time(19),
+                  end_date=datetime.date(2024, 1, 1), end_time=datetime.time(20), location='Somewhere New',
+                  address='99 Unknown Rd', hosts='Host A, Nobody Known')
+    assert set(data_pipeline.update_event(event)) == {'Title'}
+    row = data_pipeline.STORE.catalog.get_row('events', 'abc')
+    assert row['Location'] == 1 and list(row['Hosts']) == [1]
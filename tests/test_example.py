@@ -2,6 +2,8 @@ import pytest
 import os
 import csv
 import sys
+import threading
+import time
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -12,6 +14,15 @@ from src.utils import (
     update_csv,
     delete_csv_row,
     format_user_input,
+    CsvTable,
+    iter_csv,
+    add_column_csv,
+    delete_column_csv,
+    migrate_columns,
+    parse_column_operations,
+    CsvJournal,
+    file_lock,
+    recover,
 )
 
 
@@ -106,6 +117,14 @@ def test_delete_csv_row(temp_csv_file, sample_data):
     assert ["Bob", "25", "Los Angeles"] not in data
 
 
+def test_delete_last_csv_row(temp_csv_file, sample_data, capsys):
+    """Test deleting the last row of the file."""
+    write_csv(temp_csv_file, sample_data)
+    delete_csv_row(temp_csv_file, row_index=3)
+    assert read_csv(temp_csv_file) == sample_data[:3]
+    assert "not found" not in capsys.readouterr().out
+
+
 def test_delete_csv_row_invalid_index(temp_csv_file, sample_data):
     """Test deleting with invalid row index."""
     write_csv(temp_csv_file, sample_data)
@@ -132,4 +151,225 @@ def test_append_multiple_rows(temp_csv_file, sample_data):
     
     data = read_csv(temp_csv_file)
     assert len(data) == len(sample_data) + len(new_rows)
-    assert data[-2:] == new_rows
\ No newline at end of file
+    assert data[-2:] == new_rows
+
+
+def test_csv_table_update_in_place(temp_csv_file, sample_data):
+    """Test that an update that fits is written over the old row without changing the file size."""
+    write_csv(temp_csv_file, sample_data)
+    size = os.path.getsize(temp_csv_file)
+    table = CsvTable(temp_csv_file)
+    table.update(1, ["Al", "31", "NYC"])
+
+    assert os.path.getsize(temp_csv_file) == size
+    assert table.row(1) == ["Al", "31", "NYC"]
+    assert read_csv(temp_csv_file)[1:3] == [["Al", "31", "NYC"], ["Bob", "25", "Los Angeles"]]
+
+
+def test_csv_table_update_that_grows(temp_csv_file, sample_data):
+    """Test that an update longer than the old row rewrites the file compactly."""
+    write_csv(temp_csv_file, sample_data)
+    table = CsvTable(temp_csv_file)
+    table.update(1, ["Al", "31", "NYC"])
+    table.update(2, ["Bob", "25", "Los Angeles, California"])
+
+    assert read_csv(temp_csv_file)[2] == ["Bob", "25", "Los Angeles, California"]
+    assert b"\n\n" not in temp_csv_file.read_bytes()
+    assert table.dead == 0
+
+
+def test_csv_table_delete_tombstones(temp_csv_file, sample_data):
+    """Test that deletes blank the row until enough dead space builds up to compact."""
+    write_csv(temp_csv_file, sample_data + [[f"Name{i}", str(i), "Somewhere"] for i in range(20)])
+    table = CsvTable(temp_csv_file)
+    size = os.path.getsize(temp_csv_file)
+    table.delete(2)
+
+    assert os.path.getsize(temp_csv_file) == size
+    assert table.row(2) == ["Charlie", "35", "Chicago"]
+    assert len(read_csv(temp_csv_file)) == len(table) == 23
+    for _ in range(6):
+        table.delete(3)
+    assert os.path.getsize(temp_csv_file) < size and b"\n\n" not in temp_csv_file.read_bytes()
+    assert read_csv(temp_csv_file)[3] == ["Name6", "6", "Somewhere"]
+
+
+def test_csv_table_index_reused_and_rebuilt(temp_csv_file, sample_data):
+    """Test that the sidecar index is reused while the file is unchanged and rebuilt after other writes."""
+    sample_data[2] = ["Bob", "25", "Line one\nline two"]
+    write_csv(temp_csv_file, sample_data)
+    CsvTable(temp_csv_file).update(1, ["Al", "31", "NYC"])
+    table = CsvTable(temp_csv_file)
+    assert table.row(2) == ["Bob", "25", "Line one\nline two"]
+    assert table.row(3) == ["Charlie", "35", "Chicago"]
+
+    with open(temp_csv_file, "a", newline="") as f:
+        csv.writer(f).writerow(["Dana", "41", "Denver"])
+    assert CsvTable(temp_csv_file).row(-1) == ["Dana", "41", "Denver"]
+
+
+def test_read_csv_does_not_print(temp_csv_file, sample_data, capsys):
+    """Test that reading returns the rows without echoing them."""
+    write_csv(temp_csv_file, sample_data)
+    capsys.readouterr()
+    assert read_csv(temp_csv_file) == sample_data
+    assert capsys.readouterr().out == ""
+
+
+def test_iter_csv_columns_and_filter(temp_csv_file, sample_data):
+    """Test column projection by name or index and filtering on column values."""
+    write_csv(temp_csv_file, sample_data)
+    rows = iter_csv(temp_csv_file, columns=["City", 0], where=lambda row: int(row["Age"]) >= 30)
+    assert list(rows) == [["City", "Name"], ["New York", "Alice"], ["Chicago", "Charlie"]]
+    with pytest.raises(KeyError):
+        list(iter_csv(temp_csv_file, columns=["Zip"]))
+
+
+def test_iter_csv_ranges(temp_csv_file, sample_data):
+    """Test head, slice and tail ranges over the data rows."""
+    write_csv(temp_csv_file, sample_data + [[f"Name{i}", str(i), "X"] for i in range(10)])
+    assert list(iter_csv(temp_csv_file, stop=1, header=False)) == [sample_data[1]]
+    assert list(iter_csv(temp_csv_file, start=2, stop=4, header=False)) == [sample_data[3], ["Name0", "0", "X"]]
+    assert list(iter_csv(temp_csv_file, start=50, header=False)) == []
+    assert list(iter_csv(temp_csv_file, tail=2, columns=[0])) == [["Name"], ["Name8"], ["Name9"]]
+
+
+def test_migrate_columns_one_pass(temp_csv_file, sample_data):
+    """Test several column operations applied together, each to the result of the one before."""
+    write_csv(temp_csv_file, sample_data)
+    migrate_columns(temp_csv_file, [
+        ("add", "Zip", "00000", 1),
+        ("drop", "Age"),
+        ("rename", "City", "Town"),
+        ("reorder", ["Town", 0]),
+    ])
+    assert read_csv(temp_csv_file) == [
+        ["Town", "Name", "Zip"],
+        ["New York", "Alice", "00000"],
+        ["Los Angeles", "Bob", "00000"],
+        ["Chicago", "Charlie", "00000"],
+    ]
+
+
+def test_add_and_delete_column(temp_csv_file, sample_data):
+    """Test the single-column helpers, including an out-of-range index."""
+    write_csv(temp_csv_file, sample_data)
+    add_column_csv(temp_csv_file, "Zip", position=1)
+    assert read_csv(temp_csv_file)[:2] == [["Name", "Zip", "Age", "City"], ["Alice", "", "30", "New York"]]
+    delete_column_csv(temp_csv_file, 9)
+    delete_column_csv(temp_csv_file, -1)
+    assert read_csv(temp_csv_file)[0] == ["Name", "Zip", "Age"]
+
+
+def test_parse_column_operations():
+    """Test parsing operations typed at the menu."""
+    assert parse_column_operations("add Zip=10001@2; drop 1; rename City Town; reorder Name, 0") == [
+        ("add", "Zip", "10001", 2), ("drop", 1), ("rename", "City", "Town"), ("reorder", ["Name", 0]),
+    ]
+
+
+@pytest.fixture
+def keyed_csv(tmp_path):
+    """Fixture with a CSV keyed by an ID column."""
+    path = tmp_path / "events.csv"
+    path.write_text("ID,Title\nabc,Event 1\ndef,Event 2\n")
+    return path
+
+
+def test_journal_inserts_are_appended(keyed_csv):
+    """Test that a checkpoint of inserts alone appends them and clears the journal."""
+    journal = CsvJournal(keyed_csv)
+    inode, before = os.stat(keyed_csv).st_ino, keyed_csv.read_bytes()
+    journal.insert({"ID": "ghi", "Title": "Event 3"})
+    assert read_csv(keyed_csv)[-1] == ["def", "Event 2"]
+    assert journal.checkpoint_due()
+    assert journal.checkpoint() == 1
+    assert read_csv(keyed_csv)[-1] == ["ghi", "Event 3"]
+    assert os.stat(keyed_csv).st_ino == inode and keyed_csv.read_bytes().startswith(before)
+    assert not journal.journal_path.exists()
+
+
+def test_journal_updates_wait_for_threshold(keyed_csv):
+    """Test that updates are only checkpointed once the journal is big enough or the CSV is stale."""
+    journal = CsvJournal(keyed_csv)
+    journal.update("abc", {"Title": "Renamed"})
+    assert journal.checkpoint_if_due() == 0
+    assert read_csv(keyed_csv)[1] == ["abc", "Event 1"]
+    stat = os.stat(keyed_csv)
+    os.utime(keyed_csv, (stat.st_atime, stat.st_mtime - CsvJournal.CHECKPOINT_SECONDS))
+    assert journal.checkpoint_if_due() == 1
+    assert read_csv(keyed_csv)[1] == ["abc", "Renamed"]
+
+
+def test_journal_replay_after_rewrite_keeps_one_copy(keyed_csv):
+    """Test that replaying inserts already applied by an interrupted rewrite doesn't duplicate them."""
+    journal = CsvJournal(keyed_csv)
+    entries = [{"op": "update", "key": "abc", "values": {"Title": "Renamed"}},
+               {"op": "insert", "row": {"ID": "ghi", "Title": "Event 3"}}]
+    journal.record(entries)
+    journal.checkpoint()
+    journal.record(entries)
+    journal.checkpoint()
+    assert [row[0] for row in read_csv(keyed_csv)] == ["ID", "abc", "def", "ghi"]
+
+
+def test_journal_rewrite_keeps_other_writers_rows(keyed_csv):
+    """Test that updates and deletes apply to the rows on disk, including ones this writer never saw."""
+    journal = CsvJournal(keyed_csv)
+    journal.update("abc", {"Title": "Renamed", "Price": "10"})
+    journal.delete("def")
+    with open(keyed_csv, "a") as f:
+        f.write("xyz,Someone Else's\n")
+    journal.checkpoint()
+    assert read_csv(keyed_csv) == [["ID", "Title", "Price"], ["abc", "Renamed", "10"], ["xyz", "Someone Else's", ""]]
+
+
+def test_recover_torn_append(keyed_csv):
+    """Test that recovery cuts off a half-written append and redoes it from the journal."""
+    journal = CsvJournal(keyed_csv)
+    journal.insert({"ID": "ghi", "Title": "Event 3"})
+    size = os.path.getsize(keyed_csv)
+    with open(journal.journal_path, "a") as f:
+        f.write('{"op": "append_at", "size": %d}\n{"op": "upd' % size)
+    with open(keyed_csv, "a") as f:
+        f.write("ghi,Eve")
+    recover(keyed_csv)
+    assert read_csv(keyed_csv) == [["ID", "Title"], ["abc", "Event 1"], ["def", "Event 2"], ["ghi", "Event 3"]]
+
+
+def test_row_journal_replays_helper_writes(temp_csv_file, sample_data):
+    """Test that update_csv/delete_csv_row changes left in the journal are replayed, and only once."""
+    write_csv(temp_csv_file, sample_data)
+    journal = CsvJournal(temp_csv_file)
+    journal.record([
+        {"op": "set_row", "index": 1, "row": ["Alicia", "31", "Boston"]},
+        {"op": "append_rows", "rows": [["Dana", "40", "Denver"]]},
+    ])
+    recover(temp_csv_file)
+    assert read_csv(temp_csv_file)[1] == ["Alicia", "31", "Boston"]
+    assert read_csv(temp_csv_file)[-1] == ["Dana", "40", "Denver"]
+
+    delete = {"op": "delete_row", "index": 2, "count": 5, "row": ["Bob", "25", "Los Angeles"]}
+    journal.record([delete])
+    recover(temp_csv_file)
+    journal.record([delete])
+    recover(temp_csv_file)
+    assert [row[0] for row in read_csv(temp_csv_file)] == ["Name", "Alicia", "Charlie", "Dana"]
+
+
+def test_file_lock_excludes_other_writers(keyed_csv):
+    """Test that a second writer waits for the lock while the first can re-enter it."""
+    order = []
+
+    def other_writer():
+        with file_lock(keyed_csv):
+            order.append("other")
+
+    with file_lock(keyed_csv):
+        with file_lock(keyed_csv):
+            thread = threading.Thread(target=other_writer)
+            thread.start()
+            time.sleep(0.1)
+            order.append("first")
+    thread.join()
+    assert order == ["first", "other"]
@@ -0,0 +1,47 @@
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from fuzzy_match import FuzzyIndex, choose, normalize
+
+
+@pytest.fixture
+def venues():
+    """Fixture with an index over a few venue names and addresses."""
+    return FuzzyIndex([
+        (1, "Brickhouse NYC"), (1, "156 W 44th St 3rd floor, New York, NY 10036, USA"),
+        (2, "Peridance Center"), (2, "126 E 13th St, New York, NY 10003, USA"),
+        (3, "Nowadays"), (3, "56-06 Cooper Ave, Brooklyn, NY 11385"),
+    ])
+
+
+def test_normalize():
+    """Test that punctuation, noise words and spelled-out address words are folded."""
+    assert normalize("The Brickhouse, NYC") == "brickhouse"
+    assert normalize("156 West 44th Street") == "156 w 44th st"
+    assert normalize(None) == ""
+    assert normalize(float("nan")) == ""
+
+
+def test_search_ranks_best_first(venues):
+    """Test that near misses find the right entity and rank it first."""
+    assert venues.search("Brickhouse")[0].id == 1
+    assert venues.search("Peridance")[0].id == 2
+    assert venues.search("156 West 44th Street 3rd Floor, New York")[0].id == 1
+    assert venues.search("Something Else Entirely") == []
+
+
+def test_best_respects_accept_score(venues):
+    """Test that auto-accept only applies above the configured score."""
+    assert venues.best("Brickhouse", accept=0.9).id == 1
+    assert venues.best("Peridance", accept=0.95) is None
+    assert venues.best("Unknown", "126 East 13th Street, New York", accept=0.8).id == 2
+
+
+def test_suggest_merges_texts(venues):
+    """Test that matches on name and address collapse to one candidate per id."""
+    candidates = venues.suggest("Nowadays", "56-06 Cooper Avenue")
+    assert [match.id for match in candidates] == [3]
+    assert choose("1", candidates) == 3
+    assert choose("2", candidates) is None
+    assert choose("Nowadays", candidates) is None
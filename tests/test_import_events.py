@@ -0,0 +1,127 @@
+import json
+import pandas as pd
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import data_pipeline
+from catalog import DEFAULT_DATA_DIR
+from resolution_rules import ResolutionRules
+
+
+@pytest.fixture
+def rules(tmp_path):
+    """Fixture with batch rules: unknown venues go to review, unknown hosts are created."""
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "venue_aliases": {"Brickhouse": "Brickhouse NYC"},
+        "unknown_venue": "review",
+        "unknown_host": "create",
+        "review_queue": "queue.jsonl",
+    }))
+    return ResolutionRules.from_file(path)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Fixture pointing data_pipeline at a small copy of the catalog CSVs."""
+    pd.DataFrame({'ID': [1], 'Name': ['Brickhouse NYC'], 'Address': ['156 W 44th St'], 'Bio': [''], 'Type': ['']}).to_csv(tmp_path / 'venues.csv', index=False)
+    pd.DataFrame({'ID': [1], 'Name': ['Huu Rock'], 'Bio': [''], 'Tags': [''], 'ExternalLinks': [''], 'PhotoURLs': ['']}).to_csv(tmp_path / 'hosts.csv', index=False)
+    (tmp_path / 'events.csv').write_text(
+        "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+        "old,Old Title,2025-01-01,19:00:00,2025-01-01,21:00:00,1,,,,[],[1],[]\n"
+    )
+    data_pipeline.configure(tmp_path)
+    yield tmp_path
+    data_pipeline.STORE.invalidate()
+    data_pipeline.configure(DEFAULT_DATA_DIR)
+
+
+def _rows(*rows):
+    return pd.DataFrame([{'start_date': '2025-02-01', 'start_time': '20:00:00', 'address': '', **row} for row in rows])
+
+
+def test_import_resolves_in_bulk(rules, data_dir, monkeypatch):
+    """Test that venues/hosts resolve through the indexes and new rows are appended in one write."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("batch mode prompted"))
+    writes = []
+    original = data_pipeline.STORE.catalog.flush
+    monkeypatch.setattr(data_pipeline.STORE.catalog, 'flush', lambda: writes.append(1) or original())
+
+    counts = data_pipeline.import_events(_rows(
+        {'id': 'a', 'title': 'Jam', 'location': 'brickhouse', 'hosts': 'Huu Rock, Sekou'},
+        {'id': 'b', 'title': 'Class', 'location': '', 'address': '156 W 44th St', 'hosts': 'sekou'},
+        {'id': 'c', 'title': 'Party', 'location': '', 'hosts': ''},
+    ), rules)
+
+    assert counts == {'added': 3, 'updated': 0, 'duplicates': 0, 'review': 0}
+    assert len(writes) == 1
+    events = data_pipeline.STORE.reload().events.set_index('ID')
+    assert events.loc['a', 'Location'] == 1 and events.loc['b', 'Location'] == 1
+    assert pd.isna(events.loc['c', 'Location'])
+    assert events.loc['a', 'Hosts'] == [1, 2] and events.loc['b', 'Hosts'] == [2]
+    assert events.loc['c', 'Hosts'] == []
+    assert len(data_pipeline.STORE.catalog.hosts) == 2
+
+
+def test_import_dedupes_and_updates(rules, data_dir):
+    """Test that repeated IDs keep the last row and IDs already stored are updated, not appended."""
+    counts = data_pipeline.import_events(_rows(
+        {'id': 'x', 'title': 'First', 'location': 'Brickhouse NYC', 'hosts': ''},
+        {'id': 'x', 'title': 'Second', 'location': 'Brickhouse NYC', 'hosts': ''},
+        {'id': 'old', 'title': 'New Title', 'location': 'Brickhouse NYC', 'hosts': 'Huu Rock',
+         'start_date': '2025-01-01', 'start_time': '19:00:00'},
+    ), rules)
+
+    assert counts['added'] == 1 and counts['updated'] == 1 and counts['duplicates'] == 1
+    events = data_pipeline.STORE.reload().events.set_index('ID')
+    assert len(events) == 2
+    assert events.loc['x', 'Title'] == 'Second'
+    assert events.loc['old', 'Title'] == 'New Title'
+
+
+def test_import_leaves_out_review_rows(rules, data_dir):
+    """Test that rows with a venue needing review are skipped and counted."""
+    counts = data_pipeline.import_events(_rows(
+        {'id': 'a', 'title': 'Jam', 'location': 'Somewhere New', 'hosts': ''},
+        {'id': 'b', 'title': 'Jam 2', 'location': 'Somewhere New', 'hosts': ''},
+        {'id': 'c', 'title': 'Class', 'location': 'Brickhouse NYC', 'hosts': ''},
+    ), rules)
+
+    assert counts['review'] == 2 and counts['added'] == 1
+    assert not data_pipeline.STORE.catalog.has_event('a')
+    assert data_pipeline.STORE.catalog.has_event('c')
+
+
+def test_reimport_unchanged_rows_writes_nothing(rules, data_dir, monkeypatch):
+    """Test that existing rows are compared in bulk and only changed ones are updated."""
+    rows = _rows(
+        {'id': 'old', 'title': 'Old Title', 'location': 'Brickhouse NYC', 'hosts': 'Huu Rock',
+         'start_date': '2025-01-01', 'start_time': '19:00:00', 'end_date': '2025-01-01', 'end_time': '21:00:00'},
+    )
+    monkeypatch.setattr(data_pipeline.STORE.catalog, 'update_row', lambda *args: pytest.fail("unchanged row written"))
+    assert data_pipeline.import_events(rows, rules)['updated'] == 0
+    monkeypatch.undo()
+
+    rows.loc[0, 'end_time'] = '22:00:00'
+    assert data_pipeline.import_events(rows, rules)['updated'] == 1
+    assert data_pipeline.STORE.reload().get_row('events', 'old')['EndTime'] == '22:00:00'
+
+
+def test_reimport_keeps_unmatched_venue_and_hosts(data_dir, monkeypatch):
+    """Test that an existing event whose venue/hosts don't match keeps the stored Location and Hosts."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("import prompted"))
+    rules = ResolutionRules(unknown_venue='skip', unknown_host='skip')
+    rows = _rows(
+        {'id': 'old', 'title': 'Old Title', 'location': 'Somewhere New', 'address': '99 Unknown Rd',
+         'hosts': 'Nobody Known', 'start_date': '2025-01-01', 'start_time': '19:00:00',
+         'end_date': '2025-01-01', 'end_time': '21:00:00'},
+    )
+    assert data_pipeline.import_events(rows, rules)['updated'] == 0
+
+    rows.loc[0, 'title'] = 'New Title'
+    assert data_pipeline.import_events(rows, rules)['updated'] == 1
+    stored = data_pipeline.STORE.reload().get_row('events', 'old')
+    assert stored['Title'] == 'New Title'
+    assert stored['Location'] == 1 and list(stored['Hosts']) == [1]
+    assert len(data_pipeline.STORE.catalog.venues) == 1 and len(data_pipeline.STORE.catalog.hosts) == 1
@@ -0,0 +1,482 @@
+import pytest
+import httpx
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from supabase import create_client
+import migrate_supabase
+from migrate_supabase import EntityResolver, ExistingIdCache, SupabaseClientHolder, _execute_with_retry
+
+
+class StubPostgrest:
+    """Just enough of the PostgREST API, served locally, to exercise migrate_supabase."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.requests = []
+        self.connections = 0
+        # drop the connection instead of answering the next N requests
+        self.resets = 0
+        # seconds to sleep before answering a GET, to simulate network latency
+        self.delay = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                stub.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                if stub.resets:
+                    stub.resets -= 1
+                    self.close_connection = True
+                    return
+                time.sleep(stub.delay)
+                table, params = stub._parse(self.path)
+                stub.requests.append(("GET", table, params))
+                self._reply(stub._select(table, params))
+
+            def do_POST(self):
+                table, params = stub._parse(self.path)
+                stub.requests.append(("POST", table, params))
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                ignore = "ignore-duplicates" in self.headers.get("Prefer", "")
+                written = stub._insert(table, payload, params.get("on_conflict"), ignore)
+                if stub.resets:
+                    # the rows are stored but the connection drops before the reply
+                    stub.resets -= 1
+                    self.close_connection = True
+                    return
+                self._reply(written, status=201)
+
+            def do_PATCH(self):
+                table, params = stub._parse(self.path)
+                stub.requests.append(("PATCH", table, params))
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                rows = stub._select(table, {k: v for k, v in params.items() if k != "select"})
+                for row in rows:
+                    row.update(payload)
+                self._reply(rows)
+
+            def _reply(self, rows, status=200):
+                body = json.dumps(rows).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def _parse(path):
+        parts = urlsplit(path)
+        return parts.path.rsplit("/", 1)[-1], dict(parse_qsl(parts.query))
+
+    def _select(self, table, params):
+        rows = list(self.tables.get(table, []))
+        for column, condition in params.items():
+            if column in ("select", "order", "offset", "limit"):
+                continue
+            if column == "or":
+                filters = [f.split(".", 1) for f in self._split_list(condition)]
+                rows = [r for r in rows if any(self._matches(r, c, cond) for c, cond in filters)]
+            else:
+                rows = [r for r in rows if self._matches(r, column, condition)]
+        if "order" in params:
+            column = params["order"].split(".")[0]
+            rows.sort(key=lambda r: r[column])
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        columns = params.get("select", "*")
+        if columns != "*":
+            rows = [{c: r.get(c) for c in columns.split(",")} for r in rows]
+        return rows
+
+    @staticmethod
+    def _split_list(text):
+        """Split "(a,"b,c",d)" on commas outside quotes and nested parens."""
+        items, current, depth, quoted, escaped = [], "", 0, False, False
+        for char in text[1:-1]:
+            if escaped:
+                current, escaped = current + char, False
+            elif char == "\\" and quoted:
+                current, escaped = current + char, True
+            elif char == '"':
+                current, quoted = current + char, not quoted
+            elif char in "()" and not quoted:
+                depth += 1 if char == "(" else -1
+                current += char
+            elif char == "," and not quoted and depth == 0:
+                items.append(current)
+                current = ""
+            else:
+                current += char
+        return items + [current] if current else items
+
+    @staticmethod
+    def _unquote(value):
+        if value.startswith('"') and value.endswith('"'):
+            return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        return value
+
+    def _matches(self, row, column, condition):
+        op, _, value = condition.partition(".")
+        if op == "eq":
+            return str(row.get(column)) == self._unquote(value)
+        if op == "in":
+            return str(row.get(column)) in {self._unquote(v) for v in self._split_list(value)}
+        if op == "gt":
+            return row.get(column) is not None and row[column] > type(row[column])(value)
+        return True
+
+    def _insert(self, table, payload, on_conflict=None, ignore_duplicates=False):
+        rows = self.tables.setdefault(table, [])
+        keys = on_conflict.split(",") if on_conflict else []
+        written = []
+        for row in payload if isinstance(payload, list) else [payload]:
+            match = next((r for r in rows if keys and all(str(r.get(k)) == str(row.get(k)) for k in keys)), None)
+            if match is not None:
+                if not ignore_duplicates:
+                    match.update(row)
+                    written.append(match)
+                continue
+            row = {"id": len(rows) + 1, **row}
+            rows.append(row)
+            written.append(row)
+        return written
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    """Fixture with a stub PostgREST server holding a few events."""
+    server = StubPostgrest({
+        "Events": [
+            {"id": 1, "google_cal_id": "abc"},
+            {"id": 2, "google_cal_id": "def"},
+        ],
+    })
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(stub):
+    return create_client(stub.url, "sb_publishable_test")
+
+
+def test_id_cache_loads_once(stub, client):
+    """Test that repeated existence checks only page through the table once."""
+    cache = ExistingIdCache("Events", "google_cal_id", ttl=None)
+    assert cache.contains("abc", client)
+    assert not cache.contains("ghi", client)
+    assert cache.contains("def", client)
+    assert len(stub.requests) == 1
+
+
+def test_id_cache_add_after_insert(stub, client):
+    """Test that locally recorded inserts are seen without a refetch."""
+    cache = ExistingIdCache("Events", "google_cal_id", ttl=None)
+    assert not cache.contains("ghi", client)
+    cache.add("ghi")
+    assert cache.contains("ghi", client)
+    assert len(stub.requests) == 1
+
+
+def test_id_cache_incremental_refresh(stub, client):
+    """Test that a stale cache only fetches rows past the watermark."""
+    cache = ExistingIdCache("Events", "google_cal_id", ttl=0)
+    cache.refresh(client)
+    assert cache.watermark == 2
+
+    stub.tables["Events"].append({"id": 3, "google_cal_id": "ghi"})
+    assert cache.contains("ghi", client)
+    _, _, params = stub.requests[-1]
+    assert params["id"] == "gt.2"
+    assert cache.watermark == 3
+    assert cache.ids == {"abc", "def", "ghi"}
+
+
+def test_check_if_event_exists_uses_cache(stub, client, monkeypatch):
+    """Test that check_if_event_exists goes through the shared cache."""
+    cache = ExistingIdCache("Events", "google_cal_id", ttl=None)
+    cache.refresh(client)
+    monkeypatch.setattr(migrate_supabase, "EVENT_ID_CACHE", cache)
+    assert migrate_supabase.check_if_event_exists(migrate_supabase.Event(id="abc"))
+    assert not migrate_supabase.check_if_event_exists(migrate_supabase.Event(id="zzz"))
+    assert len(stub.requests) == 1
+
+
+def test_shared_client_reuses_connection(stub):
+    """Test that hundreds of queries through the shared client use one connection."""
+    holder = SupabaseClientHolder(stub.url, "sb_publishable_test")
+    for _ in range(300):
+        response = holder.get().table("Events").select("id").eq("google_cal_id", "abc").execute()
+        assert response.data == [{"id": 1}]
+    assert stub.connections == 1
+    holder.close()
+
+
+def test_shared_client_recycles_reset_connection(stub):
+    """Test that a dropped connection is replaced without rebuilding the client."""
+    holder = SupabaseClientHolder(stub.url, "sb_publishable_test")
+    client = holder.get()
+    client.table("Events").select("id").execute()
+
+    stub.resets = 1
+    response = _execute_with_retry(lambda: holder.get().table("Events").select("id").execute())
+    assert len(response.data) == 2
+    assert holder.get() is client
+    for _ in range(50):
+        holder.get().table("Events").select("id").execute()
+    assert stub.connections == 2
+    holder.close()
+
+
+def test_insert_not_retried_after_lost_reply(stub, client):
+    """Test that an insert whose reply was lost isn't sent again, which would duplicate the row."""
+    stub.resets = 1
+    with pytest.raises(migrate_supabase.CONNECTION_ERRORS):
+        _execute_with_retry(lambda: client.table("Hosts").insert({"name": "Host A"}).execute(), idempotent=False)
+    assert len(stub.tables["Hosts"]) == 1
+
+
+def test_retry_backs_off(monkeypatch):
+    """Test that an insert that never reached the server is retried with growing waits."""
+    waits = []
+    monkeypatch.setattr(migrate_supabase.time, "sleep", waits.append)
+    attempts = iter([httpx.ConnectError("refused"), httpx.WriteError("broken pipe")])
+
+    def insert():
+        error = next(attempts, None)
+        if error is not None:
+            raise error
+        return "ok"
+
+    assert _execute_with_retry(insert, idempotent=False) == "ok"
+    assert waits == [0.5, 1.0]
+
+
+def test_migrate_csv_files_round_trips(stub, tmp_path, monkeypatch):
+    """Test that a migration prefetches lookups and inserts in bulk."""
+    stub.tables["Venues"] = [{"id": 10, "temp_id": 1}, {"id": 11, "temp_id": 2}]
+    stub.tables["Hosts"] = [{"id": 20, "temp_id": 1}, {"id": 21, "temp_id": 3}]
+    header = "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+    rows = [
+        "abc,Existing,2025-01-01,10:00:00,2025-01-01,11:00:00,1.0,,,,[],[],\n",
+        "new1,New 1,2025-01-02,10:00:00,2025-01-02,11:00:00,1.0,,10.0,,[],\"[np.int64(1), np.int64(3)]\",\n",
+        "new2,New 2,2025-01-03,10:00:00,2025-01-03,11:00:00,,,,,[],[3],\n",
+        "new3,New 3,2025-01-04,10:00:00,2025-01-04,11:00:00,2.0,,,,[],[99],\n",
+    ]
+    (tmp_path / "events.csv").write_text(header + "".join(rows))
+    monkeypatch.setattr(migrate_supabase, "CSV_DIR", tmp_path)
+    monkeypatch.setattr(migrate_supabase, "SUPABASE", SupabaseClientHolder(stub.url, "sb_publishable_test"))
+
+    summary = migrate_supabase.migrate_csv_files(batch_size=2)
+
+    assert summary == {"inserted": 3, "event_hosts": 3}
+    events = {row["google_cal_id"]: row for row in stub.tables["Events"]}
+    assert events["new1"]["location"] == 10
+    assert events["new2"]["location"] is None
+    assert events["new3"]["location"] == 11
+    links = {(row["event_id"], row["host_id"]) for row in stub.tables["event_hosts"]}
+    assert links == {
+        (events["new1"]["id"], 20), (events["new1"]["id"], 21), (events["new2"]["id"], 21),
+    }
+    # venues, hosts and events reads, two event chunks, one event_hosts insert
+    assert len(stub.requests) == 6
+
+
+def test_sync_events_streams_batches(stub, tmp_path, monkeypatch):
+    """Test that the sync inserts fixed-size batches and reports their timing."""
+    rows = ["ID,Title"] + ["abc,Existing", ",No ID"] + [f"e{i},Event {i}" for i in range(5)]
+    csv_file = tmp_path / "events.csv"
+    csv_file.write_text("\n".join(rows) + "\n")
+    stub.tables["events"] = [{"id": "abc", "Title": "Existing"}]
+    monkeypatch.setattr(migrate_supabase, "SUPABASE", SupabaseClientHolder(stub.url, "sb_publishable_test"))
+
+    summary = migrate_supabase.sync_events_csv_to_supabase(csv_file, batch_size=2, workers=2)
+
+    assert {k: summary[k] for k in ("read", "inserted", "skipped_existing", "skipped_missing_id")} == {
+        "read": 7, "inserted": 5, "skipped_existing": 1, "skipped_missing_id": 1,
+    }
+    assert [t["batch"] for t in summary["batches"]] == [0, 1, 2]
+    assert [t["rows"] for t in summary["batches"]] == [2, 2, 1]
+    assert {row["id"] for row in stub.tables["events"]} == {"abc", "e0", "e1", "e2", "e3", "e4"}
+
+
+def test_sync_events_upsert_skips_prescan(stub, tmp_path, monkeypatch):
+    """Test that upsert mode doesn't download existing IDs and updates changed rows."""
+    csv_file = tmp_path / "events.csv"
+    csv_file.write_text("ID,Title\nabc,Renamed\nxyz,New\n")
+    stub.tables["events"] = [{"id": "abc", "Title": "Existing"}]
+    monkeypatch.setattr(migrate_supabase, "SUPABASE", SupabaseClientHolder(stub.url, "sb_publishable_test"))
+
+    summary = migrate_supabase.sync_events_csv_to_supabase(csv_file, upsert=True)
+
+    assert summary["inserted"] == 2
+    assert [method for method, _, _ in stub.requests] == ["POST"]
+    assert stub.requests[0][2]["on_conflict"] == "id"
+    assert {row["id"]: row["Title"] for row in stub.tables["events"]} == {"abc": "Renamed", "xyz": "New"}
+
+
+def test_migrate_csv_files_upsert_is_idempotent(stub, tmp_path, monkeypatch):
+    """Test that re-running an upsert migration doesn't duplicate anything."""
+    (tmp_path / "venues.csv").write_text('ID,Name,Address,Bio,Type\n1,Venue A,"1 Main St",,Studio\n')
+    (tmp_path / "hosts.csv").write_text("ID,Name,Bio,Tags,ExternalLinks,PhotoURLs\n1,Host A,,\"['house']\",,\n")
+    (tmp_path / "events.csv").write_text(
+        "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+        "abc,Event,2025-01-01,10:00:00,2025-01-01,11:00:00,1.0,,,,[],[1],\n"
+    )
+    stub.tables["Events"] = []
+    monkeypatch.setattr(migrate_supabase, "CSV_DIR", tmp_path)
+    monkeypatch.setattr(migrate_supabase, "SUPABASE", SupabaseClientHolder(stub.url, "sb_publishable_test"))
+
+    for _ in range(2):
+        migrate_supabase.migrate_csv_files(upsert=True, venues_and_hosts=True)
+
+    assert len(stub.tables["Venues"]) == 1
+    assert stub.tables["Hosts"][0]["tags"] == "{house}"
+    assert len(stub.tables["Events"]) == 1
+    assert stub.tables["Events"][0]["location"] == stub.tables["Venues"][0]["id"]
+    assert len(stub.tables["event_hosts"]) == 1
+
+
+@pytest.fixture
+def catalog_stub(stub, monkeypatch):
+    """Fixture with venues and hosts on the stub, used as the shared client."""
+    stub.tables["Venues"] = [{"id": 10, "name": "Venue A", "address": "1 Main St"}]
+    stub.tables["Hosts"] = [
+        {"id": 20, "name": "Host A"}, {"id": 21, "name": "Host B"}, {"id": 22, "name": "Host C"},
+    ]
+    monkeypatch.setattr(migrate_supabase, "SUPABASE", SupabaseClientHolder(stub.url, "sb_publishable_test"))
+    return stub
+
+
+def test_resolver_runs_lookups_concurrently(catalog_stub):
+    """Test that venue and host lookups overlap instead of running back to back."""
+    catalog_stub.delay = 0.3
+    event = migrate_supabase.Event(id="new", location="Unknown", address="1 Main St", hosts="Host A, Host B, Host C")
+    with EntityResolver() as resolver:
+        started = time.perf_counter()
+        venue_id, host_ids = resolver.resolve(event)
+        elapsed = time.perf_counter() - started
+    assert (venue_id, host_ids) == (10, [20, 21, 22])
+    # four lookups at 0.3s each would take 1.2s one after another
+    assert elapsed < 1.0
+
+
+def test_resolver_shares_lookups_across_events(catalog_stub):
+    """Test that repeated venues and hosts in a batch are only queried once."""
+    events = [
+        migrate_supabase.Event(id=str(i), location="Venue A", address="1 Main St", hosts="[Host A, Host B]")
+        for i in range(5)
+    ]
+    with EntityResolver() as resolver:
+        results = [resolver.resolve(event) for event in events]
+    assert results == [(10, [20, 21])] * 5
+    # one venue query, two hosts
+    assert len(catalog_stub.requests) == 3
+
+
+def test_find_venue_single_query(catalog_stub):
+    """Test that a venue is found by name or address with one request."""
+    assert migrate_supabase._find_venue("Unknown", "1 Main St") == 10
+    assert migrate_supabase._find_venue("Venue A", "Elsewhere") == 10
+    assert migrate_supabase._find_venue("Unknown", "Elsewhere") is None
+    assert len(catalog_stub.requests) == 3
+
+
+def test_find_venue_ids_bulk(catalog_stub):
+    """Test that a batch of venues resolves in one query, with quoting for commas."""
+    catalog_stub.tables["Venues"].append({"id": 11, "name": 'The "Loft", Upstairs', "address": "2 Side St"})
+    pairs = [("Venue A", "x"), ("Unknown", "2 Side St"), ('The "Loft", Upstairs', None), ("Missing", "Nowhere")]
+    assert migrate_supabase.find_venue_ids(pairs) == {
+        ("Venue A", "x"): 10, ("Unknown", "2 Side St"): 11, ('The "Loft", Upstairs', None): 11,
+    }
+    assert len(catalog_stub.requests) == 1
+
+
+def test_resolver_prefetch_memoizes_venues(catalog_stub):
+    """Test that prefetched venues aren't looked up again when events are resolved."""
+    events = [
+        migrate_supabase.Event(id=str(i), location=name, address="1 Main St")
+        for i, name in enumerate(["Venue A", "Venue A", "Other"])
+    ]
+    with EntityResolver() as resolver:
+        resolver.prefetch_venues(events)
+        resolver.prefetch_venues(events)
+        assert [resolver.resolve(event)[0] for event in events] == [10, 10, 10]
+    assert len(catalog_stub.requests) == 1
+
+
+def test_resolver_accepts_close_matches(catalog_stub):
+    """Test that a near miss above the accept score reuses the row instead of inserting."""
+    rules = migrate_supabase.ResolutionRules(unknown_venue="create", unknown_host="create", fuzzy_accept=0.8)
+    event = migrate_supabase.Event(id="new", location="The Venue A", address="Elsewhere", hosts="Host A.")
+    with EntityResolver() as resolver:
+        assert resolver.resolve(event, rules) == (10, [20])
+    assert not [request for request in catalog_stub.requests if request[0] == "POST"]
+
+
+def test_resolver_asks_about_close_matches_without_rules(catalog_stub, monkeypatch):
+    """Test that an interactive run lists a near miss to pick instead of accepting it."""
+    answers = iter(["1"])
+    monkeypatch.setattr("builtins.input", lambda *args: next(answers))
+    event = migrate_supabase.Event(id="new", location="The Venue A", address="Elsewhere")
+    with EntityResolver() as resolver:
+        assert resolver.resolve(event) == (10, [])
+    assert next(answers, None) is None
+    assert not [request for request in catalog_stub.requests if request[0] == "POST"]
+
+
+def test_event_updater_patches_changed_columns(stub, client):
+    """Test that unchanged events are skipped and shared changes go out as one PATCH."""
+    base = {"title": "Class", "start": "2024-01-01T19:00:00+00:00", "end": "2024-01-01T20:00:00+00:00",
+            "location": 1, "description": "", "flyer_url": None, "price": 20.0, "external_url": []}
+    stub.tables["Events"] = [{"id": i, "google_cal_id": cal_id, **base} for i, cal_id in enumerate("abc", 1)]
+    incoming = {**base, "start": "2024-01-01T19:00:00", "end": "2024-01-01T20:00:00", "price": 20}
+    with migrate_supabase.EventUpdater(client=client) as updater:
+        updater.stage("a", incoming)
+        updater.stage("b", {**incoming, "location": 2})
+        updater.stage("c", {**incoming, "location": 2})
+    assert updater.updated == 2
+    patches = [request for request in stub.requests if request[0] == "PATCH"]
+    assert len(patches) == 1
+    assert [row["location"] for row in stub.tables["Events"]] == [1, 2, 2]
+
+
+def test_update_keeps_unmatched_venue(catalog_stub, monkeypatch):
+    """Test that refreshing an existing event never prompts for or adds an unknown venue."""
+    catalog_stub.tables["Events"] = [{"id": 1, "google_cal_id": "abc", "title": "Class", "start": "2024-01-01T19:00:00",
+                                      "end": "2024-01-01T20:00:00", "location": 10, "description": "",
+                                      "flyer_url": None, "price": None, "external_url": []}]
+    monkeypatch.setattr(migrate_supabase, "EVENT_ID_CACHE", ExistingIdCache("Events", "google_cal_id", ttl=None))
+    monkeypatch.setattr("builtins.input", lambda *args: pytest.fail("update prompted"))
+    event = migrate_supabase.Event(id="abc", title="Renamed", start_date="2024-01-01", start_time="19:00:00",
+                                   end_date="2024-01-01", end_time="20:00:00", location="Nowhere Known",
+                                   address="99 Unknown Rd", hosts="Somebody New", description="")
+    with EntityResolver() as resolver, migrate_supabase.EventUpdater() as updater:
+        migrate_supabase.handle_event_entry(event, resolver=resolver, updater=updater)
+    assert updater.updated == 1
+    assert catalog_stub.tables["Events"][0]["title"] == "Renamed"
+    assert catalog_stub.tables["Events"][0]["location"] == 10
+    assert not [request for request in catalog_stub.requests if request[0] == "POST"]
@@ -0,0 +1,86 @@
+import importlib
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+pytest.importorskip("flask_sqlalchemy")
+pytest.importorskip("flask_marshmallow")
+
+# read_from_csv imports its models from an event_entry module on sys.path
+EVENT_ENTRY = '''
+from flask import Flask
+from flask_marshmallow import Marshmallow
+from flask_sqlalchemy import SQLAlchemy
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+db = SQLAlchemy(app)
+ma = Marshmallow(app)
+
+
+class Event(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String, nullable=False)
+
+
+class EventSchema(ma.Schema):
+    id = ma.Integer(required=True)
+    title = ma.String(required=True)
+
+
+def create_app():
+    return app
+'''
+
+
+@pytest.fixture
+def importer(tmp_path, monkeypatch):
+    """Fixture importing read_from_csv against an in-memory SQLite event_entry."""
+    (tmp_path / "event_entry.py").write_text(EVENT_ENTRY)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("event_entry", "read_from_csv"):
+        sys.modules.pop(name, None)
+    module = importlib.import_module("read_from_csv")
+    with module.create_app().app_context():
+        module.db.create_all()
+    yield module
+    for name in ("event_entry", "read_from_csv"):
+        sys.modules.pop(name, None)
+
+
+def stored(module):
+    with module.create_app().app_context():
+        return sorted((event.id, event.title) for event in module.db.session.query(module.Event))
+
+
+def test_bad_row_only_loses_itself(importer, tmp_path):
+    """Test that a row failing in a bulk chunk is reported and the rest of its chunk is committed."""
+    path = tmp_path / "events.csv"
+    path.write_text("id,title\n1,Class\n2,Jam\n1,Duplicate\n4,Social\n")
+    importer.process_csv(path, commit_every=3)
+    assert stored(importer) == [(1, "Class"), (2, "Jam"), (4, "Social")]
+    assert not importer.offset_path(path).exists()
+
+
+def test_resume_after_failed_chunk(importer, tmp_path):
+    """Test that a stopped import resumes after the last committed chunk without duplicating rows."""
+    path = tmp_path / "events.csv"
+    path.write_text("id,title\n1,Class\n2,Jam\n1,Duplicate\n4,Social\n5,Late\n")
+    importer.process_csv(path, stop_on_error=True, commit_every=2)
+    assert stored(importer) == [(1, "Class"), (2, "Jam")]
+    assert importer.read_offset(path) == 2
+
+    path.write_text("id,title\n1,Class\n2,Jam\n3,Fixed\n4,Social\n5,Late\n")
+    importer.process_csv(path, commit_every=2, resume=True)
+    assert stored(importer) == [(1, "Class"), (2, "Jam"), (3, "Fixed"), (4, "Social"), (5, "Late")]
+    assert not importer.offset_path(path).exists()
+
+
+def test_offset_temp_file_is_its_own(importer, tmp_path):
+    """Test that saving the offset doesn't touch the CSV's own events.csv.tmp."""
+    path = tmp_path / "events.csv"
+    (tmp_path / "events.csv.tmp").write_text("being rewritten")
+    importer.save_offset(path, 7)
+    assert importer.read_offset(path) == 7
+    assert (tmp_path / "events.csv.tmp").read_text() == "being rewritten"
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import httplib2
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from googleapiclient.errors import HttpError
+import read_from_googlecal
+from sync_state import SyncState
+
+
+class FakeCalendar:
+    """Stands in for the Calendar API service: pages of events keyed by page token."""
+
+    def __init__(self, pages, expired_token=None):
+        self.pages = pages
+        self.expired_token = expired_token
+        self.calls = []
+        self.fetching = {token: threading.Event() for token in pages}
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, pageToken=None, syncToken=None):
+        self.calls.append((pageToken, syncToken))
+        return _Request(self, pageToken, syncToken)
+
+
+class _Request:
+    def __init__(self, calendar, page_token, sync_token):
+        self.calendar, self.page_token, self.sync_token = calendar, page_token, sync_token
+
+    def execute(self):
+        if self.sync_token is not None and self.sync_token == self.calendar.expired_token:
+            raise HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid")
+        self.calendar.fetching[self.page_token].set()
+        return self.calendar.pages[self.page_token]
+
+
+@pytest.fixture
+def state(tmp_path):
+    """Fixture with a sync state database in a temp directory."""
+    store = SyncState("calendar", tmp_path / "sync_state.db")
+    yield store
+    store.close()
+
+
+def _pages():
+    return {
+        None: {"items": [{"id": "a"}], "nextPageToken": "p2"},
+        "p2": {"items": [{"id": "b"}], "nextPageToken": "p3"},
+        "p3": {"items": [{"id": "c"}], "nextSyncToken": "sync-2"},
+    }
+
+
+def test_next_page_fetched_while_page_is_processed(state):
+    """Test that the next page downloads while the caller is still busy with the current one."""
+    calendar = FakeCalendar(_pages())
+
+    async def consume():
+        seen = []
+        async for page in read_from_googlecal.iter_synced_event_pages("sync-1", calendar, state):
+            following = {"a": "p2", "b": "p3"}.get(page[0]["id"])
+            # blocking the event loop like sync_events' page processing does
+            if following is not None:
+                assert calendar.fetching[following].wait(timeout=5), "next page not fetched during processing"
+            seen.extend(event["id"] for event in page)
+        return seen
+
+    assert asyncio.run(consume()) == ["a", "b", "c"]
+    assert state.sync_token == "sync-2"
+
+
+def test_expired_sync_token_falls_back_to_full_sync(state):
+    """Test that a 410 for the sync token clears it and lists every event from the first page."""
+    state.save_sync_token("stale")
+    calendar = FakeCalendar(_pages(), expired_token="stale")
+
+    async def consume():
+        return [event["id"] async for page in read_from_googlecal.iter_synced_event_pages("stale", calendar, state)
+                for event in page]
+
+    assert asyncio.run(consume()) == ["a", "b", "c"]
+    assert calendar.calls[0] == (None, "stale")
+    assert all(sync_token is None for _, sync_token in calendar.calls[1:])
+    assert state.sync_token == "sync-2"
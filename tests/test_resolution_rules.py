@@ -0,0 +1,83 @@
+import pytest
+import json
+import pandas as pd
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import data_pipeline
+from catalog import DEFAULT_DATA_DIR
+from data_objects import Event
+from resolution_rules import ResolutionRules, UnresolvedEntity, read_review_queue
+
+
+@pytest.fixture
+def rules(tmp_path):
+    """Fixture with a rules file in a temp directory."""
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "venue_aliases": {"Brickhouse": "Brickhouse NYC"},
+        "host_aliases": {"Huu": "Huu Rock"},
+        "unknown_venue": "review",
+        "unknown_host": "create",
+        "host_pattern": r"\((?P<hosts>[^)]+)\)\s*$",
+        "review_queue": "queue.jsonl",
+    }))
+    return ResolutionRules.from_file(path)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Fixture pointing data_pipeline at a small copy of the catalog CSVs."""
+    pd.DataFrame({'ID': [1], 'Name': ['Brickhouse NYC'], 'Address': ['156 W 44th St'], 'Bio': [''], 'Type': ['']}).to_csv(tmp_path / 'venues.csv', index=False)
+    pd.DataFrame({'ID': [1], 'Name': ['Huu Rock'], 'Bio': [''], 'Tags': [''], 'ExternalLinks': [''], 'PhotoURLs': ['']}).to_csv(tmp_path / 'hosts.csv', index=False)
+    (tmp_path / 'events.csv').write_text("ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n")
+    data_pipeline.configure(tmp_path)
+    yield tmp_path
+    data_pipeline.STORE.invalidate()
+    data_pipeline.configure(DEFAULT_DATA_DIR)
+
+
+def test_rules_from_file(rules, tmp_path):
+    """Test aliases, title parsing and the queue path from a rules file."""
+    assert rules.venue_name("  brickhouse ") == "Brickhouse NYC"
+    assert rules.venue_name("Nowadays") == "Nowadays"
+    assert rules.host_name("HUU") == "Huu Rock"
+    assert rules.hosts_from_title("Open House (Sekou, Cebo)") == "Sekou, Cebo"
+    assert rules.hosts_from_title("Open House") is None
+    assert rules.review_queue == tmp_path / "queue.jsonl"
+
+
+def test_rules_reject_unknown_policy():
+    """Test that a typo in a policy is caught when the rules load."""
+    with pytest.raises(ValueError):
+        ResolutionRules(unknown_venue="maybe")
+
+
+def test_review_queue_round_trip(rules):
+    """Test that queued events can be read back for review."""
+    rules.queue_for_review({"id": "abc", "summary": "Open House"}, "Unresolved venue")
+    assert list(read_review_queue(rules.review_queue)) == [("Unresolved venue", {"id": "abc", "summary": "Open House"})]
+
+
+def test_batch_handle_event_entry(rules, data_dir, monkeypatch):
+    """Test that batch mode resolves aliases and creates hosts without prompting."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("batch mode prompted"))
+    event = Event(id="abc", title="Open House (Huu, Sekou)", location="Brickhouse", address="")
+    event.hosts = rules.hosts_from_title(event.title)
+
+    data_pipeline.handle_event_entry(event, rules)
+
+    events = data_pipeline.STORE.reload().events
+    assert events.loc[0, 'Location'] == 1
+    assert events.loc[0, 'Hosts'] == [1, 2]
+    assert data_pipeline.STORE.catalog.find_host("Sekou") == 2
+
+
+def test_batch_unknown_venue_goes_to_review(rules, data_dir, monkeypatch):
+    """Test that an unknown venue raises instead of prompting."""
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("batch mode prompted"))
+    event = Event(id="abc", title="Open House", location="Somewhere New", address="1 Unknown St")
+    with pytest.raises(UnresolvedEntity) as exc:
+        data_pipeline.handle_event_entry(event, rules)
+    assert exc.value.kind == "venue"
+    assert not data_pipeline.STORE.catalog.has_event("abc")
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from schema import apply_column, format_frame, parse_list_column, read_table
+
+EVENTS_HEADER = "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+
+
+@pytest.fixture
+def events_csv(tmp_path):
+    """Fixture with an events CSV written the way the pipeline writes it."""
+    path = tmp_path / "events.csv"
+    path.write_text(
+        EVENTS_HEADER
+        + "abc,Class,2025-01-01,19:00:00,2025-01-01,20:30:00,1.0,,25.0,,['https://x.test'],\"[np.int64(3), np.int64(4)]\",\n"
+        + "def,Jam,2025-01-02,21:00:00,2025-01-03,02:00:00,,Late,,,[],[],\"['house']\"\n"
+    )
+    return path
+
+
+def test_read_table_types(events_csv):
+    """Test that each column gets its schema type instead of a guessed one."""
+    frame, report = read_table(events_csv, "events")
+    assert report.ok, str(report)
+    assert str(frame["Location"].dtype) == "Int64"
+    assert frame.loc[0, "Location"] == 1 and pd.isna(frame.loc[1, "Location"])
+    assert pd.api.types.is_datetime64_dtype(frame["StartDate"])
+    assert frame.loc[1, "EndDate"] == pd.Timestamp("2025-01-03")
+    assert frame.loc[0, "Hosts"] == [3, 4]
+    assert frame.loc[1, "Tags"] == ["house"]
+    assert frame.loc[0, "Description"] == ""
+
+
+def test_parse_list_column_mixed():
+    """Test that odd list cells fall back to the per-cell parser."""
+    values = pd.Series(["[1, 2.0]", "[np.int64(5)]", "", None, "3, 4", [6]], dtype=object)
+    assert parse_list_column(values, "list[int]").tolist() == [[1, 2], [5], [], [], [3, 4], [6]]
+    strings = pd.Series(["['a', 'b c']", "[]", "x, y"], dtype=object)
+    assert parse_list_column(strings, "list[string]").tolist() == [["a", "b c"], [], ["x", "y"]]
+
+
+def test_apply_column_category_and_bool():
+    """Test that categories and booleans convert, with blanks as missing."""
+    category = apply_column(pd.Series(["club", "", "club"]), "category")
+    assert str(category.dtype) == "category" and list(category.cat.categories) == ["club"]
+    flags = apply_column(pd.Series(["True", "false", ""]), "bool")
+    assert flags.tolist()[:2] == [True, False] and pd.isna(flags[2])
+
+
+def test_report_flags_bad_cells_and_duplicates(tmp_path):
+    """Test that unreadable cells and duplicate IDs end up in the report, not as exceptions."""
+    path = tmp_path / "venues.csv"
+    path.write_text("ID,Name,Address,Bio,Type\n1,A,,,\ntwo,B,,,\n1,C,,,\n")
+    frame, report = read_table(path, "venues")
+    assert not report.ok
+    assert any("can't read 'two' as int" in problem for problem in report.problems)
+    assert any("duplicate IDs: 1" in problem for problem in report.problems)
+    assert len(frame) == 3
+
+
+def test_report_missing_columns(tmp_path):
+    """Test that a CSV missing a schema column is reported."""
+    path = tmp_path / "tags.csv"
+    path.write_text("ID,Name\n1,house\n")
+    _, report = read_table(path, "tags")
+    assert "missing columns: Category" in report.problems
+
+
+def test_format_frame_round_trip(events_csv, tmp_path):
+    """Test that writing a typed frame back out and reading it again gives the same values."""
+    frame, _ = read_table(events_csv, "events")
+    out = tmp_path / "out.csv"
+    format_frame(frame, "events").to_csv(out, index=False)
+    assert "[np." not in out.read_text()
+    again, report = read_table(out, "events")
+    assert report.ok
+    pd.testing.assert_frame_equal(frame, again)
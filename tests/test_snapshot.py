@@ -0,0 +1,69 @@
+import datetime
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import snapshot
+from schema import parse_list
+from snapshot import read_records
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Fixture with an events CSV written the way the pipeline writes it."""
+    (tmp_path / "events.csv").write_text(
+        "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+        "abc,Class,2025-01-01,19:00:00,2025-01-01,20:30:00,1.0,,25.0,,['https://x.test'],\"[np.int64(3), np.int64(4)]\",\n"
+        "def,Jam,2025-01-02,21:00:00,2025-01-03,02:00:00,,Late,,,[],[],\"['house']\"\n"
+    )
+    return tmp_path
+
+
+def test_parse_list():
+    """Test that list cells parse whatever way they were written."""
+    assert parse_list("[np.int64(3), np.int64(4)]") == [3, 4]
+    assert parse_list("['a', 'b']") == ["a", "b"]
+    assert parse_list("[]") == []
+    assert parse_list(float("nan")) == []
+    assert parse_list("a, b") == ["a", "b"]
+
+
+def test_read_records_types(data_dir, monkeypatch):
+    """Test that records come back typed, with or without pyarrow."""
+    monkeypatch.setattr(snapshot, "pa", None)
+    first, second = read_records("events", data_dir)
+    assert first["StartDate"] == datetime.date(2025, 1, 1)
+    assert first["EndTime"] == datetime.time(20, 30)
+    assert (first["Location"], first["Price"]) == (1, 25.0)
+    assert first["Hosts"] == [3, 4]
+    assert first["ExternalURLs"] == ["https://x.test"]
+    assert (second["Location"], second["Price"], second["Tags"]) == (None, None, ["house"])
+
+
+def test_snapshot_matches_csv_and_tracks_changes(data_dir, monkeypatch):
+    """Test that the Arrow snapshot gives the same records and is rebuilt when the CSV changes."""
+    pytest.importorskip("pyarrow")
+    records = read_records("events", data_dir)
+    assert snapshot.snapshot_path("events", data_dir).exists()
+    assert snapshot.load_snapshot("events", data_dir) is not None
+    with monkeypatch.context() as m:
+        m.setattr(snapshot, "pa", None)
+        assert read_records("events", data_dir) == records
+
+    with open(data_dir / "events.csv", "a") as f:
+        f.write("ghi,New,2025-01-04,10:00:00,2025-01-04,11:00:00,2.0,,,,[],[5],\n")
+    assert snapshot.load_snapshot("events", data_dir) is None
+    assert [record["Hosts"] for record in read_records("events", data_dir)] == [[3, 4], [], [5]]
+
+
+def test_read_records_reports_bad_cells(tmp_path, monkeypatch, capsys):
+    """Test that padded headers are stripped and an unreadable number is reported, not raised."""
+    monkeypatch.setattr(snapshot, "pa", None)
+    (tmp_path / "events.csv").write_text(
+        "ID, Title, StartDate, StartTime, EndDate, EndTime, Location, Description, Price, PhotoURL, ExternalURLs, Hosts, Tags\n"
+        "abc, Class, 2025-01-01, 19:00:00, 2025-01-01, 20:30:00, 1, , Free, , [], [3], []\n"
+    )
+    (record,) = read_records("events", tmp_path)
+    assert record["Title"] == "Class" and record["Location"] == 1 and record["Hosts"] == [3]
+    assert record["Price"] is None
+    assert "row 2, Price: can't read 'Free' as float" in capsys.readouterr().out
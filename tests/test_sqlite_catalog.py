@@ -0,0 +1,97 @@
+import json
+import pandas as pd
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import data_pipeline
+from resolution_rules import ResolutionRules
+from schema import read_table
+from sqlite_catalog import SqliteCatalog
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    """Fixture with a small set of catalog CSVs."""
+    path = tmp_path / "csv"
+    path.mkdir()
+    pd.DataFrame({'ID': [1, 2], 'Name': ['Brickhouse NYC', 'Dance Hall'], 'Address': ['156 W 44th St', '1 Main St'],
+                  'Bio': ['', ''], 'Type': ['club', '']}).to_csv(path / 'venues.csv', index=False)
+    pd.DataFrame({'ID': [1], 'Name': ['Huu Rock'], 'Bio': [''], 'Tags': ["['house']"], 'ExternalLinks': [''],
+                  'PhotoURLs': ['']}).to_csv(path / 'hosts.csv', index=False)
+    (path / 'events.csv').write_text(
+        "ID,Title,StartDate,StartTime,EndDate,EndTime,Location,Description,Price,PhotoURL,ExternalURLs,Hosts,Tags\n"
+        "old,Old Title,2025-01-01,19:00:00,2025-01-01,21:00:00,1,,25.0,,[],[1],['house']\n"
+        "late,Late,2025-03-01,22:00:00,2025-03-02,02:00:00,2,,,,[],[],[]\n"
+    )
+    return path
+
+
+@pytest.fixture
+def catalog(tmp_path, csv_dir):
+    """Fixture with a SQLite catalog imported from csv_dir."""
+    catalog = SqliteCatalog(tmp_path / "catalog.db")
+    catalog.import_csv(csv_dir)
+    yield catalog
+    catalog.close()
+
+
+def test_import_and_lookups(catalog):
+    """Test that imported rows come back typed and lookups go by normalized name/address."""
+    assert catalog.event_count() == 2
+    assert catalog.find_venue('brickhouse nyc ', '') == 1
+    assert catalog.find_venue('Nowhere', '1 MAIN ST') == 2
+    assert catalog.find_host('HUU ROCK') == 1 and catalog.find_host('Sekou') is None
+    assert catalog.max_start_date() == pd.Timestamp('2025-03-01')
+    row = catalog.get_row('events', 'old')
+    assert row['Hosts'] == [1] and row['Price'] == 25.0 and row['Location'] == 1
+    ids = catalog.match_venues(pd.Series(['Dance Hall', 'x', '']), pd.Series(['', '156 W 44th St', '']))
+    assert ids.tolist()[:2] == [2, 1] and pd.isna(ids[2])
+    assert catalog.has_events(pd.Series(['late', 'new'])).tolist() == [True, False]
+    assert catalog.hosts.loc[0, 'Tags'] == ['house']
+
+
+def test_update_row_changes_lookups(catalog):
+    """Test that renaming a venue moves its name key and unchanged values aren't written."""
+    assert not catalog.update_row('venues', 2, {'Name': 'Dance Hall'})
+    assert catalog.update_row('venues', 2, {'Name': 'The Ballroom'})
+    assert catalog.find_venue('the ballroom', '') == 2
+    assert catalog.find_venue('dance hall', '') is None
+
+
+def test_pipeline_against_database(tmp_path, catalog, monkeypatch):
+    """Test that import_events and handle_event_entry write through the SQLite catalog."""
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"unknown_venue": "review", "unknown_host": "create",
+                                      "review_queue": str(tmp_path / "queue.jsonl")}))
+    rules = ResolutionRules.from_file(rules_path)
+    monkeypatch.setattr('builtins.input', lambda *args: pytest.fail("batch mode prompted"))
+    catalog.close()
+    data_pipeline.configure(db_path=catalog.path)
+    try:
+        counts = data_pipeline.import_events(pd.DataFrame([
+            {'id': 'a', 'title': 'Jam', 'location': 'brickhouse nyc', 'address': '', 'hosts': 'Huu Rock, Sekou',
+             'start_date': '2025-04-01', 'start_time': '20:00:00'},
+            {'id': 'old', 'title': 'New Title', 'location': 'Brickhouse NYC', 'address': '', 'hosts': 'Huu Rock',
+             'start_date': '2025-01-01', 'start_time': '19:00:00'},
+        ]), rules)
+        assert counts == {'added': 1, 'updated': 1, 'duplicates': 0, 'review': 0}
+        stored = data_pipeline.STORE.catalog
+        assert stored.get_row('events', 'a')['Hosts'] == [1, 2]
+        assert stored.get_row('events', 'old')['Title'] == 'New Title'
+        assert stored.has_event('a') and stored.event_count() == 3
+        assert data_pipeline.get_max_date_for_events().startswith('2025-04-01T00:00:00')
+    finally:
+        data_pipeline.STORE.invalidate()
+        data_pipeline.configure()
+
+
+def test_export_round_trip(tmp_path, csv_dir, catalog):
+    """Test that exporting the database writes CSVs that read back the same as the originals."""
+    out = tmp_path / "out"
+    catalog.export_csv(out)
+    for table in ('venues', 'hosts', 'events'):
+        original, _ = read_table(csv_dir / f'{table}.csv', table)
+        exported, report = read_table(out / f'{table}.csv', table)
+        assert report.ok
+        pd.testing.assert_frame_equal(original, exported)
@@ -0,0 +1,57 @@
+import pytest
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from sync_state import SyncState
+
+
+@pytest.fixture
+def state(tmp_path):
+    """Fixture with a sync state database in a temp directory."""
+    store = SyncState("calendar", tmp_path / "sync_state.db")
+    yield store
+    store.close()
+
+
+def test_token_survives_reopen(state):
+    """Test that the sync token is persisted and the page cursor cleared with it."""
+    assert state.sync_token is None
+    state.save_page_cursor("old", "page-2")
+    state.save_sync_token("new")
+    state.close()
+    reopened = SyncState("calendar", state.path)
+    assert reopened.sync_token == "new"
+    assert reopened.page_cursor("old") is None
+    reopened.close()
+
+
+def test_page_cursor_matches_sync_token(state):
+    """Test that a saved page is only resumed by a sync started from the same token."""
+    state.save_page_cursor(None, "page-3")
+    assert state.page_cursor(None) == "page-3"
+    assert state.page_cursor("token") is None
+    state.save_page_cursor("token", "page-2")
+    assert state.page_cursor("token") == "page-2"
+
+
+def test_event_skipped_until_etag_changes(state):
+    """Test that handled events are skipped unless they changed or failed."""
+    event = {"id": "abc", "etag": '"1"', "updated": "2024-01-01T00:00:00Z"}
+    assert not state.is_processed(event)
+    state.record(event, "done")
+    assert state.is_processed(event)
+    assert not state.is_processed({**event, "etag": '"2"'})
+    state.record(event, "failed")
+    assert not state.is_processed(event)
+    assert state.status("abc") == "failed"
+
+
+def test_import_token_file(state, tmp_path):
+    """Test that the old nextSyncToken file seeds an empty store only."""
+    token_file = tmp_path / "nextSyncToken"
+    token_file.write_text("legacy\n")
+    assert state.import_token_file(token_file)
+    assert state.sync_token == "legacy"
+    token_file.write_text("other")
+    assert not state.import_token_file(token_file)
+    assert state.sync_token == "legacy"